@@ -56,6 +56,11 @@ class ProductivityHeatmap(QWidget):
         
         layout.addLayout(header_layout)
         
+        # Итоги выбранного периода из сводок (год читается несколькими записями)
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("color: #CCCCCC; margin: 0 10px;")
+        layout.addWidget(self.summary_label)
+        
         # Matplotlib canvas для тепловой карты
         self.figure = Figure(figsize=(12, 6), facecolor='#2b2b2b')
         self.canvas = FigureCanvas(self.figure)
@@ -65,10 +70,34 @@ class ProductivityHeatmap(QWidget):
     
     def load_data(self):
         """Загрузка данных продуктивности"""
-        # Здесь будет загрузка реальных данных из task_manager
-        self.productivity_data = self.generate_sample_data()
+        # Дневные сводки читаются из хранилища агрегатов одним файлом,
+        # без загрузки расписания каждого дня за год
+        self.productivity_data = self.load_rollup_data() or self.generate_sample_data()
         self.update_heatmap()
     
+    def load_rollup_data(self) -> Dict:
+        """Загрузка дневных сводок за последний год"""
+        try:
+            from rollup_store import get_rollup_store
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=365)
+            series = get_rollup_store().series("day", start_date, end_date)
+        except Exception as e:
+            print(f"Ошибка загрузки сводок продуктивности: {e}")
+            return {}
+        
+        data = {}
+        for date_str, record in series.items():
+            productivity = record['productivity_score'] / 100
+            data[date_str] = {
+                'productivity_score': productivity,
+                'completed_tasks': record['completed_tasks'],
+                'total_focus_time': record['minutes'],
+                'breaks_taken': 0,
+                'efficiency_rating': record['completion_rate'] / 100
+            }
+        return data
+    
     def generate_sample_data(self) -> Dict:
         """Генерация примерных данных для демонстрации"""
         data = {}
@@ -109,6 +138,7 @@ class ProductivityHeatmap(QWidget):
         
         # Получаем данные за выбранный период
         period = self.period_combo.currentText()
+        self.update_period_summary(*self.period_range(period))
         filtered_data = self.filter_data_by_period(period)
         
         if not filtered_data:
@@ -210,8 +240,8 @@ class ProductivityHeatmap(QWidget):
                                  color="white" if matrix[i, j] < 0.5 else "black",
                                  fontsize=8, fontweight='bold')
     
-    def filter_data_by_period(self, period: str) -> Dict:
-        """Фильтрация данных по выбранному периоду"""
+    def period_range(self, period: str) -> Tuple[date, date]:
+        """Первый и последний день выбранного периода"""
         end_date = datetime.now().date()
         
         if period == "Последние 7 дней":
@@ -223,6 +253,37 @@ class ProductivityHeatmap(QWidget):
         else:  # Весь год
             start_date = end_date - timedelta(days=365)
         
+        return start_date, end_date
+    
+    def update_period_summary(self, start_date: date, end_date: date):
+        """Итоги периода по сводкам недель, месяцев и лет"""
+        try:
+            from rollup_store import get_rollup_store
+            totals = get_rollup_store().query(start_date, end_date)
+        except Exception as e:
+            print(f"Ошибка загрузки итогов периода: {e}")
+            self.summary_label.clear()
+            return
+        
+        self.summary_label.setText(
+            f"📅 Активных дней: {int(totals['active_days'])}   "
+            f"⏱️ Запланировано: {totals['hours']:.1f} ч   "
+            f"✅ Задач выполнено: {int(totals['completed_tasks'])} из {int(totals['tasks'])} "
+            f"({totals['completion_rate']:.0f}%)   "
+            f"📈 Средняя продуктивность: {totals['productivity_score']:.0f}%"
+        )
+    
+    def filter_data_by_period(self, period: str) -> Dict:
+        """Фильтрация данных по выбранному периоду"""
+        start_date, end_date = self.period_range(period)
+        
+        # Статистика предыдущего периода готовится в фоне к переключению периода
+        try:
+            from prefetcher import get_prefetcher
+            get_prefetcher().view_period(start_date, end_date)
+        except Exception as e:
+            print(f"Предзагрузка периода недоступна: {e}")
+        
         filtered = {}
         for date_str, data in self.productivity_data.items():
             date_obj = datetime.fromisoformat(date_str).date()
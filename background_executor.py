@@ -0,0 +1,243 @@
+"""
+⚙️ Пул фоновых потоков с приоритетами
+Интерактивные задачи выполняются раньше предзагрузки, а предзагрузка -
+раньше обслуживания. Каждая задача возвращает Future с отменой и
+ожиданием результата по таймауту.
+"""
+
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from cache_manager import LatencyHistogram
+
+
+class TaskPriority(Enum):
+    """Полосы приоритета фоновых задач (меньше - важнее)"""
+    INTERACTIVE = 0
+    PREFETCH = 1
+    MAINTENANCE = 2
+
+
+class _WorkItem:
+    """Задача в очереди пула"""
+    __slots__ = ("future", "func", "args", "kwargs", "priority", "task_id", "submitted_at", "deadline")
+
+    def __init__(self, future: Future, func: Callable, args: tuple, kwargs: dict,
+                 priority: TaskPriority, task_id: Optional[str], deadline: Optional[float]):
+        self.future = future
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.task_id = task_id
+        self.submitted_at = time.perf_counter()
+        self.deadline = deadline
+
+
+class _LaneStats:
+    """Счетчики и задержки одной полосы"""
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.wait = LatencyHistogram()
+        self.run = LatencyHistogram()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'expired': self.expired,
+            'wait': self.wait.snapshot(),
+            'run': self.run.snapshot()
+        }
+
+
+class PriorityExecutor:
+    """Пул потоков с очередью по приоритетам
+
+    Потоки создаются по мере надобности, но не больше max_workers. Задачи
+    предзагрузки и обслуживания занимают не больше max_workers - 1 потоков,
+    поэтому интерактивной задаче всегда остается свободный поток.
+    """
+
+    def __init__(self, max_workers: int = 4, name: str = "Background"):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self._condition = threading.Condition()
+        # Куча (приоритет, номер, задача): при равном приоритете - по порядку постановки
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+        self._background_running = 0
+        self._background_limit = max(1, max_workers - 1)
+        self._shutdown = False
+        self._lanes = {priority: _LaneStats() for priority in TaskPriority}
+
+    def submit(self, func: Callable, *args, priority: TaskPriority = TaskPriority.INTERACTIVE,
+               task_id: Optional[str] = None, timeout: Optional[float] = None, **kwargs) -> Future:
+        """Постановка задачи в очередь
+
+        Args:
+            priority: Полоса приоритета
+            task_id: Имя задачи для журнала ошибок
+            timeout: Сколько секунд задача может ждать в очереди; не начатая
+                вовремя задача завершается с TimeoutError
+
+        Returns:
+            Future с результатом функции
+        """
+        future = Future()
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        item = _WorkItem(future, func, args, kwargs, priority, task_id, deadline)
+        future.add_done_callback(lambda done: self._on_done(done, priority))
+
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            lane = self._lanes[priority]
+            lane.submitted += 1
+            lane.depth += 1
+            lane.max_depth = max(lane.max_depth, lane.depth)
+            heapq.heappush(self._heap, (priority.value, next(self._order), item))
+
+            if self._idle == 0 and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, daemon=True,
+                                          name=f"{self.name}Worker-{len(self._threads) + 1}")
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._condition.notify()
+        return future
+
+    def _on_done(self, future: Future, priority: TaskPriority) -> None:
+        """Отмененная в очереди задача сразу уходит из глубины очереди"""
+        if future.cancelled():
+            with self._condition:
+                lane = self._lanes[priority]
+                lane.depth -= 1
+                lane.cancelled += 1
+
+    def _next_item(self) -> Optional[_WorkItem]:
+        """Следующая задача для потока (под блокировкой); None - поток завершается"""
+        while True:
+            if self._heap:
+                _, _, item = self._heap[0]
+                background = item.priority is not TaskPriority.INTERACTIVE
+                if not background or self._background_running < self._background_limit:
+                    heapq.heappop(self._heap)
+                    if item.deadline is not None and time.perf_counter() > item.deadline:
+                        if item.future.set_running_or_notify_cancel():
+                            lane = self._lanes[item.priority]
+                            lane.depth -= 1
+                            lane.expired += 1
+                            item.future.set_exception(TimeoutError(
+                                f"Task {item.task_id or item.func!r} was not started in time"))
+                        continue
+                    if not item.future.set_running_or_notify_cancel():
+                        # Задача отменена, глубина уже уменьшена
+                        continue
+                    self._lanes[item.priority].depth -= 1
+                    if background:
+                        self._background_running += 1
+                    return item
+            elif self._shutdown:
+                return None
+
+            self._idle += 1
+            self._condition.wait()
+            self._idle -= 1
+
+    def _worker(self) -> None:
+        while True:
+            with self._condition:
+                item = self._next_item()
+            if item is None:
+                return
+            self._run(item)
+
+    def _run(self, item: _WorkItem) -> None:
+        lane = self._lanes[item.priority]
+        started = time.perf_counter()
+        lane.wait.record(started - item.submitted_at)
+        try:
+            result = item.func(*item.args, **item.kwargs)
+        except BaseException as e:
+            self.logger.error(f"Ошибка фоновой задачи {item.task_id or item.func!r}: {e}", exc_info=True)
+            item.future.set_exception(e)
+            failed = True
+        else:
+            item.future.set_result(result)
+            failed = False
+
+        with self._condition:
+            lane.run.record(time.perf_counter() - started)
+            if failed:
+                lane.failed += 1
+            else:
+                lane.completed += 1
+            if item.priority is not TaskPriority.INTERACTIVE:
+                self._background_running -= 1
+                self._condition.notify()
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """Остановка пула: новые задачи не принимаются, очередь дорабатывается или отменяется"""
+        with self._condition:
+            self._shutdown = True
+            pending = []
+            if cancel_pending:
+                pending = [item for _, _, item in self._heap]
+                self._heap = []
+            self._condition.notify_all()
+        for item in pending:
+            item.future.cancel()
+        if wait:
+            for thread in list(self._threads):
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очередей, счетчики и задержки по полосам"""
+        with self._condition:
+            return {
+                'workers': len(self._threads),
+                'max_workers': self.max_workers,
+                'idle': self._idle,
+                'lanes': {priority.name.lower(): lane.snapshot() for priority, lane in self._lanes.items()}
+            }
+
+
+# Глобальный пул (ленивая инициализация: импорт модуля не запускает потоков)
+_background_executor = None
+_background_executor_lock = threading.Lock()
+
+def get_background_executor() -> PriorityExecutor:
+    """Получение глобального пула с размером из PerformanceConfig.max_concurrent_tasks"""
+    global _background_executor
+    with _background_executor_lock:
+        if _background_executor is None:
+            from config_manager import get_config
+            _background_executor = PriorityExecutor(get_config().performance.max_concurrent_tasks)
+            # Незапущенные задачи при выходе не нужны
+            atexit.register(_background_executor.shutdown, wait=False, cancel_pending=True)
+        return _background_executor
@@ -3,23 +3,82 @@
 Обеспечивает быстрый доступ к часто используемым данным
 """
 
+import atexit
+import bisect
 import json
+import mmap
+import os
 import pickle
 import hashlib
+import heapq
+import itertools
+import struct
+import sys
 import time
-from typing import Any, Optional, Dict, Callable, Union
+import uuid
+import zlib
+from typing import Any, Optional, Dict, Callable, List, Tuple, Union
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timedelta
 import threading
 import logging
+import marshal
 from functools import wraps
 import weakref
 
+# Сколько элементов контейнера просматривать при оценке размера
+SIZE_SAMPLE = 32
+SIZE_DEPTH = 4
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Приблизительный размер значения в байтах
+    
+    bytes, str и массивы NumPy оцениваются за O(1); контейнеры - по первым
+    SIZE_SAMPLE элементам с экстраполяцией на всю длину.
+    """
+    if isinstance(value, (bytes, bytearray, str, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        # numpy.ndarray, memoryview: размер буфера без обхода элементов
+        return nbytes
+    
+    size = sys.getsizeof(value)
+    if _depth >= SIZE_DEPTH:
+        return size
+    if isinstance(value, dict):
+        count = len(value)
+        if count:
+            sample = 0
+            for index, (key, item) in enumerate(value.items()):
+                if index == SIZE_SAMPLE:
+                    break
+                sample += estimate_size(key, _depth + 1) + estimate_size(item, _depth + 1)
+            size += sample * count // min(count, SIZE_SAMPLE)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        count = len(value)
+        if count:
+            sample = 0
+            for index, item in enumerate(value):
+                if index == SIZE_SAMPLE:
+                    break
+                sample += estimate_size(item, _depth + 1)
+            size += sample * count // min(count, SIZE_SAMPLE)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _depth + 1)
+    return size
+
+# Номера записей: по номеру отложенное истечение отличает запись от ее замены
+_entry_seq = itertools.count()
+
 class CacheEntry:
     """Запись в кэше"""
     
-    def __init__(self, value: Any, ttl: Optional[float] = None):
+    def __init__(self, value: Any, ttl: Optional[float] = None, size: int = 0):
         self.value = value
+        self.size = size
+        self.seq = next(_entry_seq)
         self.created_at = time.time()
         self.ttl = ttl
         self.access_count = 0
@@ -37,13 +96,369 @@ class CacheEntry:
         self.last_accessed = time.time()
         return self.value
 
+class EvictionPolicy:
+    """Политика вытеснения: порядок ключей, находящихся в кэше
+    
+    Все операции выполняются за O(1) (LFU - амортизированно) под блокировкой кэша.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+    
+    def touch(self, key: str) -> None:
+        """Попадание по ключу, находящемуся в кэше"""
+        raise NotImplementedError
+    
+    def admit(self, key: str) -> List[str]:
+        """Добавление нового ключа; возвращает ключи, которые нужно вытеснить"""
+        raise NotImplementedError
+    
+    def evict(self) -> Optional[str]:
+        """Выбор и удаление одной жертвы (вытеснение по бюджету байтов)"""
+        raise NotImplementedError
+    
+    def remove(self, key: str) -> None:
+        """Удаление ключа из кэша (не вытеснение: удаление, истечение TTL)"""
+        raise NotImplementedError
+    
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """Вытеснение давно не использовавшихся записей"""
+    
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+    
+    def touch(self, key: str) -> None:
+        self._order.move_to_end(key)
+    
+    def admit(self, key: str) -> List[str]:
+        evicted = []
+        if self._order and len(self._order) >= self.capacity:
+            evicted.append(self._order.popitem(last=False)[0])
+        self._order[key] = None
+        return evicted
+    
+    def evict(self) -> Optional[str]:
+        return self._order.popitem(last=False)[0] if self._order else None
+    
+    def remove(self, key: str) -> None:
+        self._order.pop(key, None)
+    
+    def clear(self) -> None:
+        self._order.clear()
+
+
+class LFUPolicy(EvictionPolicy):
+    """Вытеснение редко используемых записей со старением счетчиков
+    
+    Записи хранятся в корзинах по частоте обращений (внутри корзины - порядок LRU).
+    Каждые aging_period обращений счетчики делятся пополам, чтобы записи,
+    популярные в прошлом, не занимали кэш вечно.
+    """
+    
+    def __init__(self, capacity: int, aging_period: Optional[int] = None):
+        super().__init__(capacity)
+        self.aging_period = aging_period or capacity * 8
+        self._frequency: Dict[str, int] = {}
+        self._buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_frequency = 0
+        self._operations = 0
+    
+    def _add(self, key: str, frequency: int) -> None:
+        self._frequency[key] = frequency
+        self._buckets.setdefault(frequency, OrderedDict())[key] = None
+    
+    def _discard(self, key: str) -> int:
+        frequency = self._frequency.pop(key)
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+        return frequency
+    
+    def touch(self, key: str) -> None:
+        frequency = self._discard(key)
+        if frequency == self._min_frequency and frequency not in self._buckets:
+            self._min_frequency = frequency + 1
+        self._add(key, frequency + 1)
+        
+        self._operations += 1
+        if self._operations >= self.aging_period:
+            self._age()
+    
+    def admit(self, key: str) -> List[str]:
+        evicted = []
+        if self._frequency and len(self._frequency) >= self.capacity:
+            victim = next(iter(self._buckets[self._min_frequency]))
+            self._discard(victim)
+            evicted.append(victim)
+        self._add(key, 1)
+        self._min_frequency = 1
+        return evicted
+    
+    def evict(self) -> Optional[str]:
+        if not self._frequency:
+            return None
+        victim = next(iter(self._buckets[self._min_frequency]))
+        self.remove(victim)
+        return victim
+    
+    def remove(self, key: str) -> None:
+        if key not in self._frequency:
+            return
+        frequency = self._discard(key)
+        if frequency == self._min_frequency and self._buckets:
+            self._min_frequency = min(self._buckets)
+    
+    def clear(self) -> None:
+        self._frequency.clear()
+        self._buckets.clear()
+        self._min_frequency = 0
+        self._operations = 0
+    
+    def _age(self) -> None:
+        """Деление счетчиков пополам с сохранением порядка внутри частот"""
+        buckets = self._buckets
+        self._frequency = {}
+        self._buckets = {}
+        for frequency in sorted(buckets):
+            for key in buckets[frequency]:
+                self._add(key, max(1, frequency // 2))
+        self._min_frequency = min(self._buckets) if self._buckets else 0
+        self._operations = 0
+
+
+class ARCPolicy(EvictionPolicy):
+    """Adaptive Replacement Cache (Megiddo, Modha)
+    
+    T1 - записи, к которым обращались один раз, T2 - повторно. B1/B2 - "призраки"
+    недавно вытесненных ключей: попадание в призрак сдвигает целевой размер T1,
+    поэтому однократный проход по большому набору ключей не вымывает горячие записи.
+    """
+    
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self._t1: "OrderedDict[str, None]" = OrderedDict()
+        self._t2: "OrderedDict[str, None]" = OrderedDict()
+        self._b1: "OrderedDict[str, None]" = OrderedDict()
+        self._b2: "OrderedDict[str, None]" = OrderedDict()
+        self._target_t1 = 0.0
+    
+    def touch(self, key: str) -> None:
+        if key in self._t1:
+            del self._t1[key]
+            self._t2[key] = None
+        else:
+            self._t2.move_to_end(key)
+    
+    def _replace(self, key_in_b2: bool) -> str:
+        """Вытеснение из T1 или T2 в соответствующий список призраков"""
+        t1_size = len(self._t1)
+        if self._t1 and (not self._t2 or t1_size > self._target_t1
+                         or (key_in_b2 and t1_size == self._target_t1)):
+            victim = self._t1.popitem(last=False)[0]
+            self._b1[victim] = None
+        else:
+            victim = self._t2.popitem(last=False)[0]
+            self._b2[victim] = None
+        return victim
+    
+    def admit(self, key: str) -> List[str]:
+        capacity = self.capacity
+        resident = len(self._t1) + len(self._t2)
+        evicted = []
+        
+        if key in self._b1:
+            self._target_t1 = min(capacity, self._target_t1 + max(len(self._b2) / len(self._b1), 1))
+            del self._b1[key]
+            if resident >= capacity:
+                evicted.append(self._replace(False))
+            self._t2[key] = None
+            return evicted
+        
+        if key in self._b2:
+            self._target_t1 = max(0.0, self._target_t1 - max(len(self._b1) / len(self._b2), 1))
+            del self._b2[key]
+            if resident >= capacity:
+                evicted.append(self._replace(True))
+            self._t2[key] = None
+            return evicted
+        
+        if len(self._t1) + len(self._b1) >= capacity:
+            if len(self._t1) < capacity:
+                self._b1.popitem(last=False)
+                if resident >= capacity:
+                    evicted.append(self._replace(False))
+            else:
+                evicted.append(self._t1.popitem(last=False)[0])
+        else:
+            total = resident + len(self._b1) + len(self._b2)
+            if total >= capacity:
+                if total >= 2 * capacity and self._b2:
+                    self._b2.popitem(last=False)
+                if resident >= capacity:
+                    evicted.append(self._replace(False))
+        
+        self._t1[key] = None
+        return evicted
+    
+    def evict(self) -> Optional[str]:
+        if not self._t1 and not self._t2:
+            return None
+        victim = self._replace(False)
+        # Призраков не больше емкости, сколько бы записей ни вытеснял бюджет
+        while len(self._b1) + len(self._b2) > self.capacity:
+            ghosts = self._b1 if len(self._b1) >= len(self._b2) else self._b2
+            ghosts.popitem(last=False)
+        return victim
+    
+    def remove(self, key: str) -> None:
+        self._t1.pop(key, None)
+        self._t2.pop(key, None)
+    
+    def clear(self) -> None:
+        self._t1.clear()
+        self._t2.clear()
+        self._b1.clear()
+        self._b2.clear()
+        self._target_t1 = 0.0
+
+
+EVICTION_POLICIES = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "arc": ARCPolicy
+}
+
+
+def create_eviction_policy(policy: Union[str, EvictionPolicy], capacity: int) -> EvictionPolicy:
+    """Политика вытеснения по имени ("lru", "lfu", "arc") или готовый экземпляр"""
+    if isinstance(policy, EvictionPolicy):
+        return policy
+    if policy not in EVICTION_POLICIES:
+        raise ValueError(f"Unknown eviction policy: {policy}")
+    return EVICTION_POLICIES[policy](capacity)
+
+
+class ExpiryReaper:
+    """Общий для всех кэшей поток удаления истекших записей
+    
+    Каждый кэш держит собственную кучу сроков истечения и сообщает жнецу
+    только ближайший срок. Поток спит до ближайшего срока среди всех кэшей
+    и удаляет истекшие записи порциями, поэтому записи освобождают место
+    вскоре после истечения без полного обхода кэша.
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        # (срок, номер, слабая ссылка на кэш)
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self.reaped = 0
+    
+    def schedule(self, cache: "MemoryCache", deadline: float) -> None:
+        """Разбудить кэш не позже deadline"""
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._order), weakref.ref(cache)))
+            self._stopped = False
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="CacheExpiryReaper", daemon=True)
+                self._worker.start()
+            elif self._heap[0][0] == deadline:
+                # Новый срок раньше всех остальных
+                self._condition.notify()
+    
+    def stop(self, timeout: Optional[float] = 5) -> None:
+        """Остановка потока; сроки сохраняются, следующее планирование запустит его снова"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout=timeout)
+        with self._condition:
+            if self._worker is worker and self._stopped:
+                self._worker = None
+    
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+    
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._heap:
+                        delay = self._heap[0][0] - time.time()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                _, _, cache_ref = heapq.heappop(self._heap)
+            
+            cache = cache_ref()
+            if cache is None:
+                continue
+            try:
+                # Кэш сам планирует следующий срок
+                self.reaped += cache.reap_expired()
+            except Exception as e:
+                self.logger.error(f"Ошибка удаления истекших записей кэша: {e}")
+
+_expiry_reaper = None
+_expiry_reaper_lock = threading.Lock()
+
+def get_expiry_reaper() -> ExpiryReaper:
+    """Общий поток удаления истекших записей"""
+    global _expiry_reaper
+    with _expiry_reaper_lock:
+        if _expiry_reaper is None:
+            _expiry_reaper = ExpiryReaper()
+        return _expiry_reaper
+
 class MemoryCache:
-    """Кэш в памяти с поддержкой TTL и LRU"""
+    """Кэш в памяти с поддержкой TTL и выбираемой политикой вытеснения
+    
+    Кроме числа записей кэш может ограничиваться бюджетом байтов: размер
+    записи оценивается функцией sizer (по умолчанию estimate_size), а при
+    превышении max_bytes политика вытесняет записи, пока кэш не уложится.
+    
+    Истекшие записи удаляет общий ExpiryReaper по куче сроков этого кэша.
+    """
     
-    def __init__(self, max_size: int = 1000, default_ttl: Optional[float] = None):
+    # Сколько истекших записей удалять за один захват блокировки
+    REAP_BATCH = 256
+    
+    def __init__(self, max_size: int = 1000, default_ttl: Optional[float] = None,
+                 policy: Union[str, EvictionPolicy] = "lru",
+                 max_bytes: Optional[int] = None,
+                 sizer: Optional[Callable[[Any], int]] = estimate_size,
+                 reaper: Optional[ExpiryReaper] = None,
+                 on_evict: Optional[Callable[[Any], None]] = None):
         self.max_size = max_size
         self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self._bytes = 0
         self._cache: Dict[str, CacheEntry] = {}
+        # Куча (срок, номер записи, ключ); записи замененных ключей отбрасываются при извлечении
+        self._expiry: List[tuple] = []
+        # Срок, на который кэш записан у жнеца (None - не записан)
+        self._scheduled: Optional[float] = None
+        self._reaper = reaper
+        # Вызывается с ключом каждой вытесненной записи (под блокировкой кэша)
+        self.on_evict = on_evict
+        self._policy = create_eviction_policy(policy, max_size)
         self._lock = threading.RLock()
         self.logger = logging.getLogger(__name__)
         
@@ -52,62 +467,180 @@ class MemoryCache:
         self.misses = 0
         self.evictions = 0
     
+    @property
+    def policy_name(self) -> str:
+        return type(self._policy).__name__.replace("Policy", "").lower()
+    
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+    
     def get(self, key: str) -> Optional[Any]:
         """Получение значения из кэша"""
         with self._lock:
-            if key not in self._cache:
+            entry = self._cache.get(key)
+            if entry is None:
                 self.misses += 1
                 return None
             
-            entry = self._cache[key]
-            
             if entry.is_expired():
-                del self._cache[key]
+                self._remove(key)
                 self.misses += 1
                 return None
             
             self.hits += 1
+            self._policy.touch(key)
             return entry.access()
     
     def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
         """Установка значения в кэш"""
+        # Размер оценивается до блокировки: другие потоки не ждут обхода значения
+        size = self.sizer(value) if self.sizer is not None else 0
+        
         with self._lock:
             if ttl is None:
                 ttl = self.default_ttl
             
-            # Проверяем размер кэша
-            if len(self._cache) >= self.max_size and key not in self._cache:
-                self._evict_lru()
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Запись больше всего бюджета не кэшируется, старое значение ключа удаляется
+                self._remove(key)
+                return
+            
+            old = self._cache.get(key)
+            if old is not None:
+                self._policy.touch(key)
+                self._bytes -= old.size
+            else:
+                # Политика сама решает, что вытеснить при переполнении
+                for victim in self._policy.admit(key):
+                    self._bytes -= self._cache.pop(victim).size
+                    self.evictions += 1
+                    if self.on_evict is not None:
+                        self.on_evict(victim)
+            
+            entry = CacheEntry(value, ttl, size)
+            self._cache[key] = entry
+            self._bytes += size
+            if ttl is not None:
+                self._schedule_expiry(key, entry)
             
-            self._cache[key] = CacheEntry(value, ttl)
+            if self.max_bytes is not None:
+                while self._bytes > self.max_bytes:
+                    victim = self._policy.evict()
+                    if victim is None:
+                        break
+                    self._bytes -= self._cache.pop(victim).size
+                    self.evictions += 1
+                    if self.on_evict is not None:
+                        self.on_evict(victim)
+    
+    def __contains__(self, key: str) -> bool:
+        """Наличие неистекшей записи без учета в статистике и порядке вытеснения"""
+        with self._lock:
+            entry = self._cache.get(key)
+            return entry is not None and not entry.is_expired()
     
     def delete(self, key: str) -> bool:
         """Удаление значения из кэша"""
         with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-                return True
+            return self._remove(key)
+    
+    def _schedule_expiry(self, key: str, entry: CacheEntry) -> None:
+        """Постановка срока записи в кучу (под блокировкой)"""
+        deadline = entry.created_at + entry.ttl
+        # Пересборка кучи, когда в ней в основном замененные записи: O(1) амортизированно
+        if len(self._expiry) > 2 * len(self._cache) + 64:
+            self._expiry = [(item.created_at + item.ttl, item.seq, item_key)
+                            for item_key, item in self._cache.items() if item.ttl is not None]
+            heapq.heapify(self._expiry)
+        else:
+            heapq.heappush(self._expiry, (deadline, entry.seq, key))
+        
+        if self._scheduled is None or deadline < self._scheduled:
+            self._scheduled = deadline
+            if self._reaper is None:
+                self._reaper = get_expiry_reaper()
+            self._reaper.schedule(self, deadline)
+    
+    def reap_expired(self) -> int:
+        """Удаление записей, чей срок наступил (вызывается жнецом)
+        
+        Returns:
+            Количество удаленных записей
+        """
+        removed = 0
+        with self._lock:
+            now = time.time()
+            expiry = self._expiry
+            while expiry and expiry[0][0] <= now and removed < self.REAP_BATCH:
+                _, seq, key = heapq.heappop(expiry)
+                entry = self._cache.get(key)
+                if entry is not None and entry.seq == seq:
+                    self._remove(key)
+                    removed += 1
+            
+            self._scheduled = expiry[0][0] if expiry else None
+            if self._scheduled is not None:
+                self._reaper.schedule(self, self._scheduled)
+        return removed
+    
+    def close(self) -> None:
+        """Отказ от планирования истечения (записи жнеца для кэша становятся пустыми)"""
+        with self._lock:
+            self._expiry = []
+            self._scheduled = None
+    
+    def _remove(self, key: str) -> bool:
+        """Удаление записи с учетом размера (под блокировкой)"""
+        entry = self._cache.pop(key, None)
+        if entry is None:
             return False
+        self._bytes -= entry.size
+        self._policy.remove(key)
+        return True
     
     def clear(self) -> None:
         """Очистка кэша"""
         with self._lock:
             self._cache.clear()
+            self._policy.clear()
+            self._expiry = []
+            self._bytes = 0
             self.hits = 0
             self.misses = 0
             self.evictions = 0
     
-    def _evict_lru(self) -> None:
-        """Удаление наименее используемого элемента"""
-        if not self._cache:
-            return
+    def trim(self, nbytes: int) -> int:
+        """Вытеснение записей по политике, пока не освободится nbytes байт
         
-        # Находим элемент с наименьшим временем последнего доступа
-        lru_key = min(self._cache.keys(), 
-                     key=lambda k: self._cache[k].last_accessed)
+        Returns:
+            Освобождено байт
+        """
+        freed = 0
+        with self._lock:
+            while freed < nbytes:
+                victim = self._policy.evict()
+                if victim is None:
+                    break
+                size = self._cache.pop(victim).size
+                self._bytes -= size
+                freed += size
+                self.evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(victim)
+        return freed
+    
+    def hot_keys(self, limit: int, half_life: float = 3600.0) -> List[Tuple[Any, float]]:
+        """Самые востребованные ключи: число обращений, затухающее со временем
         
-        del self._cache[lru_key]
-        self.evictions += 1
+        Returns:
+            Пары (ключ, оценка) по убыванию оценки
+        """
+        now = time.time()
+        with self._lock:
+            scored = [(key, (entry.access_count + 1) * 0.5 ** ((now - entry.last_accessed) / half_life))
+                      for key, entry in self._cache.items() if not entry.is_expired()]
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
     
     def cleanup_expired(self) -> int:
         """Очистка истекших записей"""
@@ -116,7 +649,7 @@ class MemoryCache:
                           if entry.is_expired()]
             
             for key in expired_keys:
-                del self._cache[key]
+                self._remove(key)
             
             return len(expired_keys)
     
@@ -129,20 +662,389 @@ class MemoryCache:
             return {
                 'size': len(self._cache),
                 'max_size': self.max_size,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'policy': self.policy_name,
                 'hits': self.hits,
                 'misses': self.misses,
                 'evictions': self.evictions,
                 'hit_rate': hit_rate
             }
 
+class ShardedMemoryCache:
+    """Кэш в памяти из независимых сегментов с собственными блокировками
+    
+    Сегмент выбирается по хэшу ключа, поэтому потоки, работающие с разными
+    ключами, не ждут друг друга. Вытеснение выполняется внутри сегмента
+    (приближение глобальной политики), статистика суммируется по сегментам.
+    Бюджет байтов, как и емкость, делится между сегментами поровну.
+    """
+    
+    def __init__(self, max_size: int = 1000, default_ttl: Optional[float] = None,
+                 policy: str = "lru", shards: int = 16,
+                 max_bytes: Optional[int] = None,
+                 sizer: Optional[Callable[[Any], int]] = estimate_size,
+                 on_evict: Optional[Callable[[Any], None]] = None):
+        if isinstance(policy, EvictionPolicy):
+            raise ValueError("Sharded cache needs a policy name: one policy instance cannot serve all shards")
+        
+        shards = max(1, min(shards, max_size))
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        # Емкость делится между сегментами, остаток - по одной записи первым сегментам
+        base_size, remainder = divmod(max_size, shards)
+        shard_bytes = max_bytes // shards if max_bytes is not None else None
+        self._shards = [MemoryCache(base_size + (1 if index < remainder else 0), default_ttl, policy,
+                                    shard_bytes, sizer, on_evict=on_evict)
+                        for index in range(shards)]
+        self._shard_count = shards
+    
+    @property
+    def shards(self) -> List[MemoryCache]:
+        return list(self._shards)
+    
+    @property
+    def policy_name(self) -> str:
+        return self._shards[0].policy_name
+    
+    @property
+    def hits(self) -> int:
+        return sum(shard.hits for shard in self._shards)
+    
+    @property
+    def misses(self) -> int:
+        return sum(shard.misses for shard in self._shards)
+    
+    @property
+    def evictions(self) -> int:
+        return sum(shard.evictions for shard in self._shards)
+    
+    @property
+    def bytes(self) -> int:
+        return sum(shard.bytes for shard in self._shards)
+    
+    def _shard_for(self, key: str) -> MemoryCache:
+        return self._shards[hash(key) % self._shard_count]
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Получение значения из кэша"""
+        return self._shards[hash(key) % self._shard_count].get(key)
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Установка значения в кэш"""
+        self._shards[hash(key) % self._shard_count].set(key, value, ttl)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._shard_for(key)
+    
+    def delete(self, key: str) -> bool:
+        """Удаление значения из кэша"""
+        return self._shard_for(key).delete(key)
+    
+    def clear(self) -> None:
+        """Очистка кэша"""
+        for shard in self._shards:
+            shard.clear()
+    
+    def cleanup_expired(self) -> int:
+        """Очистка истекших записей (сегменты блокируются по очереди)"""
+        return sum(shard.cleanup_expired() for shard in self._shards)
+    
+    def trim(self, nbytes: int) -> int:
+        """Вытеснение из сегментов пропорционально их размеру"""
+        total = self.bytes
+        if total <= 0:
+            return 0
+        freed = 0
+        for shard in self._shards:
+            freed += shard.trim(-(-nbytes * shard.bytes // total))
+        return freed
+    
+    def hot_keys(self, limit: int, half_life: float = 3600.0) -> List[Tuple[Any, float]]:
+        """Самые востребованные ключи всех сегментов"""
+        scored = itertools.chain.from_iterable(shard.hot_keys(limit, half_life) for shard in self._shards)
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
+    
+    def close(self) -> None:
+        for shard in self._shards:
+            shard.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Получение статистики кэша, суммированной по сегментам"""
+        shard_stats = [shard.get_stats() for shard in self._shards]
+        hits = sum(stats['hits'] for stats in shard_stats)
+        misses = sum(stats['misses'] for stats in shard_stats)
+        total_requests = hits + misses
+        
+        return {
+            'size': sum(stats['size'] for stats in shard_stats),
+            'max_size': self.max_size,
+            'bytes': sum(stats['bytes'] for stats in shard_stats),
+            'max_bytes': self.max_bytes,
+            'policy': self.policy_name,
+            'shards': len(self._shards),
+            'hits': hits,
+            'misses': misses,
+            'evictions': sum(stats['evictions'] for stats in shard_stats),
+            'hit_rate': (hits / total_requests * 100) if total_requests > 0 else 0
+        }
+
+class Serializer:
+    """Сериализатор значений файлового кэша"""
+    
+    name = ""
+    
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+    
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+class PickleSerializer(Serializer):
+    """pickle протокола 5: буферы (массивы NumPy) пишутся вне потока pickle без копирования"""
+    
+    name = "pickle"
+    _COUNT = struct.Struct("<I")
+    _LENGTH = struct.Struct("<Q")
+    
+    def dumps(self, value: Any) -> bytes:
+        buffers = []
+        body = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+        views = [buffer.raw() for buffer in buffers]
+        parts = [self._COUNT.pack(len(views))]
+        parts.extend(self._LENGTH.pack(view.nbytes) for view in views)
+        parts.append(body)
+        parts.extend(views)
+        return b"".join(parts)
+    
+    def loads(self, data: bytes) -> Any:
+        view = memoryview(data)
+        count = self._COUNT.unpack_from(view)[0]
+        offset = self._COUNT.size
+        lengths = []
+        for _ in range(count):
+            lengths.append(self._LENGTH.unpack_from(view, offset)[0])
+            offset += self._LENGTH.size
+        
+        body_end = len(view) - sum(lengths)
+        body = view[offset:body_end]
+        buffers = []
+        position = body_end
+        for length in lengths:
+            # Копия в bytearray: восстановленные массивы остаются изменяемыми
+            buffers.append(bytearray(view[position:position + length]))
+            position += length
+        return pickle.loads(body, buffers=buffers)
+
+class MarshalSerializer(Serializer):
+    """marshal для деревьев из примитивов: быстрее pickle, но формат зависит от версии Python"""
+    
+    name = "marshal"
+    
+    def dumps(self, value: Any) -> bytes:
+        return marshal.dumps(value, 4)
+    
+    def loads(self, data: bytes) -> Any:
+        return marshal.loads(data)
+
+class JSONSerializer(Serializer):
+    """Компактный JSON для данных, которые читают и другие программы"""
+    
+    name = "json"
+    
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode('utf-8')
+    
+    def loads(self, data: bytes) -> Any:
+        return json.loads(bytes(data).decode('utf-8'))
+
+SERIALIZERS: Dict[str, Serializer] = {
+    serializer.name: serializer
+    for serializer in (PickleSerializer(), MarshalSerializer(), JSONSerializer())
+}
+
+class SerializerRegistry:
+    """Выбор сериализатора по пространству имен ключа и сжатие больших значений
+    
+    Запись начинается с заголовка: сериализатор, флаги, размер до сжатия и
+    служебные поля оберток CacheManager. Значение, которое выбранный
+    сериализатор не умеет записать, сохраняется через pickle. Записи без
+    заголовка (прежний формат) читаются как pickle.
+    """
+    
+    MAGIC = b"TBS1"
+    # магия, номер сериализатора, флаги, размер до сжатия, длина служебных полей
+    _HEADER = struct.Struct("<4sBBQH")
+    _IDS = {"pickle": 1, "marshal": 2, "json": 3}
+    _NAMES = {number: name for name, number in _IDS.items()}
+    COMPRESSED = 1
+    
+    def __init__(self, default: str = "pickle", compress_threshold: Optional[int] = 16 * 1024,
+                 compress_level: int = 1):
+        self._check(default)
+        self.default = default
+        # None - без сжатия
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self._namespaces: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+    
+    def _check(self, name: str) -> None:
+        if name not in SERIALIZERS:
+            raise ValueError(f"Unknown serializer: {name}")
+    
+    def register(self, namespace: str, name: str) -> None:
+        """Сериализатор для ключей пространства имен"""
+        self._check(name)
+        self._namespaces[namespace] = name
+    
+    def serializer_for(self, key: Any) -> str:
+        if not self._namespaces:
+            return self.default
+        return self._namespaces.get(key_namespace(key), self.default)
+    
+    def encode(self, key: Any, value: Any) -> bytes:
+        value, meta = _peel_cache_wrappers(value)
+        name = self.serializer_for(key)
+        fallback = False
+        try:
+            payload = SERIALIZERS[name].dumps(value)
+        except (TypeError, ValueError, OverflowError):
+            name, fallback = "pickle", True
+            payload = SERIALIZERS[name].dumps(value)
+        
+        raw_size = len(payload)
+        flags = 0
+        if self.compress_threshold is not None and raw_size > self.compress_threshold:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < raw_size:
+                payload = compressed
+                flags |= self.COMPRESSED
+        
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode('utf-8') if meta else b""
+        header = self._HEADER.pack(self.MAGIC, self._IDS[name], flags, raw_size, len(meta_bytes))
+        
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {'entries': 0, 'bytes': 0, 'raw_bytes': 0,
+                                             'compressed': 0, 'fallbacks': 0}
+            stats['entries'] += 1
+            stats['bytes'] += len(payload)
+            stats['raw_bytes'] += raw_size
+            stats['compressed'] += flags & self.COMPRESSED
+            stats['fallbacks'] += fallback
+        return header + meta_bytes + payload
+    
+    def decode(self, data: bytes) -> Any:
+        if data[:4] != self.MAGIC:
+            return pickle.loads(data)
+        _, number, flags, _, meta_length = self._HEADER.unpack_from(data)
+        start = self._HEADER.size
+        meta = json.loads(bytes(data[start:start + meta_length])) if meta_length else None
+        payload = data[start + meta_length:]
+        if flags & self.COMPRESSED:
+            payload = zlib.decompress(payload)
+        value = SERIALIZERS[self._NAMES[number]].loads(payload)
+        return _wrap_cache_value(value, meta) if meta else value
+    
+    @classmethod
+    def describe(cls, data: bytes) -> Optional[Dict[str, Any]]:
+        """Метаданные записи из заголовка: сериализатор, размеры, сжатие"""
+        if data[:4] != cls.MAGIC:
+            return None
+        _, number, flags, raw_size, meta_length = cls._HEADER.unpack_from(data)
+        return {
+            'serializer': cls._NAMES[number],
+            'compressed': bool(flags & cls.COMPRESSED),
+            'raw_size': raw_size,
+            'stored_size': len(data) - cls._HEADER.size - meta_length
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Записанные значения по сериализаторам"""
+        with self._lock:
+            return {
+                'default': self.default,
+                'namespaces': dict(self._namespaces),
+                'written': {name: dict(stats) for name, stats in self._stats.items()}
+            }
+
+# Подкаталог служебных JSON кэша (статистика, горячие ключи, теги): их запись
+# не меняет время изменения каталога записей, по которому проверяется индекс
+STATE_DIR = "state"
+
+def cache_state_path(cache_dir: Union[str, Path], name: str, for_reading: bool = False) -> Path:
+    """Путь к служебному файлу кэша
+    
+    Для чтения, пока файла нет в подкаталоге состояния, возвращается его
+    прежнее расположение в каталоге записей (если там есть файл).
+    """
+    path = Path(cache_dir) / STATE_DIR / name
+    if for_reading and not path.exists():
+        legacy = Path(cache_dir) / name
+        if legacy.exists():
+            return legacy
+    return path
+
 class FileCache:
-    """Файловый кэш для долговременного хранения"""
+    """Файловый кэш для долговременного хранения
+    
+    Размеры, время доступа и записи и срок действия файлов хранятся в индексе в памяти
+    (порядок LRU), который читается с диска один раз при запуске. Запись
+    выполняет постоянный объем работы с файловой системой, а вытеснение при
+    превышении лимита идет небольшими порциями в фоновом потоке.
+    """
+    
+    INDEX_FILE = "index.json"
+    INDEX_VERSION = 2
+    # Заголовок файла: магия, время записи, момент истечения (0 - бессрочно)
+    _FILE_HEADER = struct.Struct("<4sdd")
+    FILE_MAGIC = b"TBF2"
+    # Сколько файлов удалять за один проход фонового вытеснения
+    EVICTION_BATCH = 32
+    # Как часто фоновый поток сохраняет измененный индекс (секунды)
+    INDEX_SAVE_INTERVAL = 30.0
     
-    def __init__(self, cache_dir: str = "cache", max_size_mb: int = 100):
-        self.cache_dir = Path(cache_dir) if isinstance(cache_dir, str) else cache_dir
-        self.cache_dir.mkdir(exist_ok=True)
+    def __init__(self, cache_dir: str = "cache", max_size_mb: int = 100,
+                 serializers: Optional[SerializerRegistry] = None):
         self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.serializers = serializers or SerializerRegistry()
         self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # имя файла -> [размер, время доступа, момент истечения или None, время записи]
+        self._index: "OrderedDict[str, List]" = OrderedDict()
+        self._total_size = 0
+        self._index_dirty = False
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.evictions = 0
+        self.cache_dir = cache_dir
+    
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+    
+    @cache_dir.setter
+    def cache_dir(self, cache_dir: Union[str, Path]) -> None:
+        """Смена каталога кэша перечитывает индекс"""
+        self._cache_dir = Path(cache_dir) if isinstance(cache_dir, str) else cache_dir
+        self._cache_dir.mkdir(exist_ok=True)
+        self._load_index()
+        state_dir = self._cache_dir / STATE_DIR
+        if not state_dir.exists():
+            state_dir.mkdir()
+            # Создание подкаталога изменило каталог: сохраненный индекс перезаписывается после него
+            if (self._cache_dir / self.INDEX_FILE).exists():
+                with self._lock:
+                    self._index_dirty = True
+    
+    @property
+    def total_size(self) -> int:
+        return self._total_size
     
     def _get_file_path(self, key: str) -> Path:
         """Получение пути к файлу кэша"""
@@ -154,23 +1056,55 @@ class FileCache:
         """Получение значения из файлового кэша"""
         try:
             file_path = self._get_file_path(key)
+            name = file_path.name
+            now = time.time()
+            
+            with self._lock:
+                entry = self._index.get(name)
+                if entry is not None and entry[2] is not None and now > entry[2]:
+                    # Истекший файл удаляется без чтения
+                    self._forget(name)
+                    file_path.unlink(missing_ok=True)
+                    return None
             
-            if not file_path.exists():
+            try:
+                with open(file_path, 'rb') as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                if entry is not None:
+                    with self._lock:
+                        self._forget(name)
                 return None
             
-            with open(file_path, 'rb') as f:
-                data = pickle.load(f)
+            if raw[:4] == self.FILE_MAGIC:
+                _, created_at, expires_at = self._FILE_HEADER.unpack_from(raw)
+                expires_at = expires_at or None
+                payload = memoryview(raw)[self._FILE_HEADER.size:]
+            else:
+                # Прежний формат: pickle словаря со значением и TTL
+                data = pickle.loads(raw)
+                created_at = data['created_at']
+                expires_at = created_at + data['ttl'] if data.get('ttl') is not None else None
+                payload = None
             
             # Проверяем TTL
-            if 'ttl' in data and data['ttl'] is not None:
-                if time.time() - data['created_at'] > data['ttl']:
-                    file_path.unlink()  # Удаляем истекший файл
-                    return None
+            if expires_at is not None and now > expires_at:
+                with self._lock:
+                    self._forget(name)
+                file_path.unlink(missing_ok=True)  # Удаляем истекший файл
+                return None
             
-            # Обновляем время доступа
-            file_path.touch()
+            # Обновляем время доступа (в индексе, без обращения к диску)
+            with self._lock:
+                entry = self._index.get(name)
+                if entry is None:
+                    self._remember(name, len(raw), expires_at, created_at)
+                else:
+                    entry[1] = now
+                    self._index.move_to_end(name)
+                self._index_dirty = True
             
-            return data['value']
+            return data['value'] if payload is None else self.serializers.decode(payload)
             
         except Exception as e:
             self.logger.error(f"Ошибка чтения из файлового кэша: {e}")
@@ -179,19 +1113,24 @@ class FileCache:
     def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
         """Установка значения в файловый кэш"""
         try:
-            # Проверяем размер кэша
-            self._cleanup_if_needed()
-            
             file_path = self._get_file_path(key)
+            created_at = time.time()
+            expires_at = created_at + ttl if ttl is not None else None
             
-            data = {
-                'value': value,
-                'created_at': time.time(),
-                'ttl': ttl
-            }
-            
+            payload = self.serializers.encode(key, value)
             with open(file_path, 'wb') as f:
-                pickle.dump(data, f)
+                f.write(self._FILE_HEADER.pack(self.FILE_MAGIC, created_at, expires_at or 0.0))
+                f.write(payload)
+                size = f.tell()
+            
+            with self._lock:
+                self._remember(file_path.name, size, expires_at, created_at)
+                over_budget = self._total_size > self.max_size_bytes
+            
+            # Проверяем размер кэша: вытеснение выполняет фоновый поток
+            self._ensure_worker()
+            if over_budget:
+                self._wakeup.set()
             
             return True
             
@@ -203,10 +1142,13 @@ class FileCache:
         """Удаление значения из файлового кэша"""
         try:
             file_path = self._get_file_path(key)
-            if file_path.exists():
+            with self._lock:
+                self._forget(file_path.name)
+            try:
                 file_path.unlink()
                 return True
-            return False
+            except FileNotFoundError:
+                return False
         except Exception as e:
             self.logger.error(f"Ошибка удаления из файлового кэша: {e}")
             return False
@@ -214,147 +1156,2010 @@ class FileCache:
     def clear(self) -> None:
         """Очистка файлового кэша"""
         try:
+            with self._lock:
+                self._index.clear()
+                self._total_size = 0
+                self._index_dirty = True
             for file_path in self.cache_dir.glob("*.cache"):
-                file_path.unlink()
+                file_path.unlink(missing_ok=True)
         except Exception as e:
             self.logger.error(f"Ошибка очистки файлового кэша: {e}")
     
-    def _cleanup_if_needed(self) -> None:
-        """Очистка кэша при превышении размера"""
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика файлового кэша по индексу"""
+        with self._lock:
+            return {
+                'entries': len(self._index),
+                'size_bytes': self._total_size,
+                'max_size_bytes': self.max_size_bytes,
+                'evictions': self.evictions
+            }
+    
+    def oldest_write_time(self) -> float:
+        """Время записи самого старого файла (для пустого кэша - текущее время)"""
+        with self._lock:
+            return min((entry[3] for entry in self._index.values()), default=time.time())
+    
+    def close(self) -> None:
+        """Остановка фонового потока и сохранение индекса"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+        self._save_index()
+    
+    # ------------------------------------------------------------------
+    # Индекс
+    # ------------------------------------------------------------------
+    
+    def _remember(self, name: str, size: int, expires_at: Optional[float], written_at: float) -> None:
+        """Добавление или обновление записи индекса (под блокировкой)"""
+        old = self._index.pop(name, None)
+        if old is not None:
+            self._total_size -= old[0]
+        self._index[name] = [size, time.time(), expires_at, written_at]
+        self._total_size += size
+        self._index_dirty = True
+    
+    def _forget(self, name: str) -> Optional[List]:
+        """Удаление записи индекса (под блокировкой)"""
+        entry = self._index.pop(name, None)
+        if entry is not None:
+            self._total_size -= entry[0]
+            self._index_dirty = True
+        return entry
+    
+    def _load_index(self) -> None:
+        """Чтение индекса с диска; при отсутствии или устаревании - один проход по каталогу"""
+        index_path = self.cache_dir / self.INDEX_FILE
+        entries = None
         try:
-            total_size = sum(f.stat().st_size for f in self.cache_dir.glob("*.cache"))
-            
-            if total_size > self.max_size_bytes:
-                # Удаляем самые старые файлы
-                files = list(self.cache_dir.glob("*.cache"))
-                files.sort(key=lambda f: f.stat().st_atime)
-                
-                while total_size > self.max_size_bytes * 0.8 and files:
-                    file_to_remove = files.pop(0)
-                    total_size -= file_to_remove.stat().st_size
-                    file_to_remove.unlink()
-                    
+            # Каталог, измененный после сохранения индекса, означает записи мимо индекса
+            if index_path.exists() and self.cache_dir.stat().st_mtime <= index_path.stat().st_mtime + 1.0:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == self.INDEX_VERSION:
+                    entries = data["entries"]
         except Exception as e:
-            self.logger.error(f"Ошибка очистки файлового кэша: {e}")
-
-class CacheManager:
-    """Менеджер кэширования с поддержкой многоуровневого кэша"""
-    
-    def __init__(self, memory_cache_size: int = 1000, 
-                 file_cache_size_mb: int = 100,
-                 default_ttl: Optional[float] = None):
+            self.logger.warning(f"Индекс файлового кэша не прочитан, выполняется пересканирование: {e}")
         
-        self.memory_cache = MemoryCache(memory_cache_size, default_ttl)
-        self.file_cache = FileCache(max_size_mb=file_cache_size_mb)
-        self.logger = logging.getLogger(__name__)
+        if entries is None:
+            entries = []
+            for file_path in self.cache_dir.glob("*.cache"):
+                stat = file_path.stat()
+                entries.append([file_path.name, stat.st_size, stat.st_atime, None, stat.st_mtime])
+            entries.sort(key=lambda entry: entry[2])
         
-        # Запускаем фоновую очистку
-        self._start_cleanup_thread()
+        with self._lock:
+            self._index = OrderedDict((name, [size, accessed, expires_at, written_at])
+                                      for name, size, accessed, expires_at, written_at in entries)
+            self._total_size = sum(entry[0] for entry in self._index.values())
+            self._index_dirty = False
     
-    def get(self, key: str, use_file_cache: bool = True) -> Optional[Any]:
-        """Получение значения из кэша (сначала память, потом файл)"""
-        # Сначала проверяем память
-        value = self.memory_cache.get(key)
-        if value is not None:
-            return value
+    def _save_index(self) -> None:
+        """Атомарная запись индекса на диск"""
+        try:
+            with self._lock:
+                if not self._index_dirty:
+                    return
+                payload = json.dumps({
+                    "version": self.INDEX_VERSION,
+                    "entries": [[name] + entry for name, entry in self._index.items()]
+                }, separators=(",", ":"))
+                self._index_dirty = False
+            
+            index_path = self.cache_dir / self.INDEX_FILE
+            tmp_path = index_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, index_path)
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения индекса файлового кэша: {e}")
+    
+    # ------------------------------------------------------------------
+    # Фоновое вытеснение
+    # ------------------------------------------------------------------
+    
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="FileCacheEvictor", daemon=True)
+            self._worker.start()
+    
+    def _run(self) -> None:
+        last_saved = time.time()
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self.INDEX_SAVE_INTERVAL)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            
+            # Порциями, отпуская блокировку между ними
+            while self._evict_batch():
+                if self._stop.is_set():
+                    break
+            
+            if time.time() - last_saved >= self.INDEX_SAVE_INTERVAL:
+                self._evict_expired()
+                self._save_index()
+                last_saved = time.time()
+    
+    def _evict_batch(self) -> bool:
+        """Удаление порции давно не использовавшихся файлов до 80% лимита
         
-        # Затем проверяем файловый кэш
-        if use_file_cache:
-            value = self.file_cache.get(key)
-            if value is not None:
-                # Загружаем в память для быстрого доступа
-                self.memory_cache.set(key, value)
-                return value
+        Returns:
+            True если нужна еще одна порция
+        """
+        target = self.max_size_bytes * 0.8
+        victims = []
+        with self._lock:
+            for name, entry in self._index.items():
+                if len(victims) >= self.EVICTION_BATCH or self._total_size <= target:
+                    break
+                victims.append(name)
+                self._total_size -= entry[0]
+            for name in victims:
+                del self._index[name]
+            if victims:
+                self.evictions += len(victims)
+                self._index_dirty = True
+            more = bool(victims) and self._total_size > target
         
-        return None
+        self._unlink(victims)
+        return more
     
-    def set(self, key: str, value: Any, ttl: Optional[float] = None,
-            use_file_cache: bool = True) -> None:
-        """Установка значения в кэш"""
-        # Всегда сохраняем в память
-        self.memory_cache.set(key, value, ttl)
+    def _evict_expired(self) -> int:
+        """Удаление файлов с истекшим сроком действия по индексу"""
+        now = time.time()
+        with self._lock:
+            expired = [name for name, entry in self._index.items()
+                       if entry[2] is not None and now > entry[2]]
+            for name in expired:
+                self._forget(name)
         
-        # Опционально сохраняем в файл
-        if use_file_cache:
-            self.file_cache.set(key, value, ttl)
+        self._unlink(expired)
+        return len(expired)
+    
+    def _unlink(self, names: List[str]) -> None:
+        for name in names:
+            try:
+                (self.cache_dir / name).unlink(missing_ok=True)
+            except Exception as e:
+                self.logger.error(f"Ошибка удаления файла кэша: {e}")
+
+class SegmentFileCache:
+    """Файловый кэш в сегментах с дозаписью
+    
+    Записи дописываются в небольшое число файлов-сегментов
+    (cache/segments/segment_NNNNNN.seg), чтение - через индекс смещений в памяти
+    и mmap, без открытия файла на каждый ключ. Запись сегмента:
+    crc32, флаги, длина ключа, длина значения, номер записи, момент истечения,
+    ключ, pickle значения. Удаление дописывает "надгробие".
+    
+    При открытии сегменты сканируются, для каждого ключа побеждает запись с
+    наибольшим номером, оборванная запись в конце сегмента отрезается.
+    Место мертвых записей возвращается слиянием всех закрытых сегментов в новые
+    в фоновом потоке; активный сегмент при каждом запуске создается заново.
+    """
+    
+    SEGMENTS_DIR = "segments"
+    SEGMENT_PREFIX = "segment_"
+    SEGMENT_SUFFIX = ".seg"
+    MERGE_MANIFEST = "merge.json"
+    # crc32, флаги, длина ключа, длина значения, номер записи, момент истечения (0 - бессрочно)
+    _RECORD = struct.Struct("<IBHIQd")
+    _TOMBSTONE = 0x01
+    # Сколько записей переносить при слиянии за одно взятие блокировки
+    MERGE_BATCH = 64
+    EVICTION_BATCH = 32
+    
+    def __init__(self, cache_dir: str = "cache", max_size_mb: int = 100,
+                 segment_size_mb: float = 4, merge_threshold: float = 0.5,
+                 serializers: Optional[SerializerRegistry] = None):
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.serializers = serializers or SerializerRegistry()
+        self.segment_size_bytes = int(segment_size_mb * 1024 * 1024)
+        # Доля мертвых данных в закрытых сегментах, при которой запускается слияние
+        self.merge_threshold = merge_threshold
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        # Слияние может идти и из фонового потока, и по явному вызову merge()
+        self._merge_lock = threading.Lock()
+        # ключ -> [сегмент, смещение записи, длина записи, номер, момент истечения, длина ключа]
+        self._index: "OrderedDict[str, List]" = OrderedDict()
+        # сегмент -> {"size": байт в файле, "live": байт живых записей}
+        self._segments: Dict[int, Dict[str, int]] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._active_id = 0
+        self._active_file = None
+        self._seq = 0
+        self._live_bytes = 0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._evicting = False
+        self.evictions = 0
+        self.merges = 0
+        self._cache_dir = None
+        self.cache_dir = cache_dir
+    
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+    
+    @cache_dir.setter
+    def cache_dir(self, cache_dir: Union[str, Path]) -> None:
+        """Смена каталога кэша закрывает текущие сегменты и открывает новые"""
+        with self._lock:
+            if self._cache_dir is not None:
+                self._close_files()
+            self._cache_dir = Path(cache_dir) if isinstance(cache_dir, str) else cache_dir
+            self._segments_dir = self._cache_dir / self.SEGMENTS_DIR
+            self._segments_dir.mkdir(parents=True, exist_ok=True)
+            self._recover()
+    
+    @property
+    def total_size(self) -> int:
+        return self._live_bytes
+    
+    # ------------------------------------------------------------------
+    # Интерфейс FileCache
+    # ------------------------------------------------------------------
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Получение значения из кэша"""
+        try:
+            with self._lock:
+                entry = self._index.get(key)
+                if entry is None:
+                    return None
+                if entry[4] and time.time() > entry[4]:
+                    self._drop(key)
+                    return None
+                self._index.move_to_end(key)
+                segment_id, offset, length, _, _, key_length = entry
+                value_start = offset + self._RECORD.size + key_length
+                payload = self._read(segment_id, value_start, offset + length)
+            return self.serializers.decode(payload)
+        except Exception as e:
+            self.logger.error(f"Ошибка чтения из сегментного кэша: {e}")
+            return None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Установка значения в кэш"""
+        try:
+            payload = self.serializers.encode(key, value)
+            expires_at = time.time() + ttl if ttl is not None else 0.0
+            with self._lock:
+                offset, length, seq = self._append(key, payload, 0, expires_at)
+                self._drop(key)
+                self._index[key] = [self._active_id, offset, length, seq, expires_at,
+                                    len(key.encode('utf-8'))]
+                self._segments[self._active_id]["live"] += length
+                self._live_bytes += length
+                maintenance = self._needs_maintenance()
+            
+            if maintenance:
+                self._ensure_worker()
+                self._wakeup.set()
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка записи в сегментный кэш: {e}")
+            return False
+    
+    def delete(self, key: str) -> bool:
+        """Удаление значения из кэша"""
+        try:
+            with self._lock:
+                if key not in self._index:
+                    return False
+                self._append(key, b"", self._TOMBSTONE, 0.0)
+                self._drop(key)
+                return True
+        except Exception as e:
+            self.logger.error(f"Ошибка удаления из сегментного кэша: {e}")
+            return False
+    
+    def clear(self) -> None:
+        """Очистка кэша: удаление всех сегментов"""
+        try:
+            with self._lock:
+                self._close_files()
+                for path in self._segments_dir.glob(f"{self.SEGMENT_PREFIX}*{self.SEGMENT_SUFFIX}"):
+                    path.unlink(missing_ok=True)
+                self._recover()
+        except Exception as e:
+            self.logger.error(f"Ошибка очистки сегментного кэша: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика сегментного кэша"""
+        with self._lock:
+            disk_bytes = sum(segment["size"] for segment in self._segments.values())
+            return {
+                'entries': len(self._index),
+                'size_bytes': self._live_bytes,
+                'disk_bytes': disk_bytes,
+                'segments': len(self._segments),
+                'max_size_bytes': self.max_size_bytes,
+                'dead_ratio': self._dead_ratio(),
+                'evictions': self.evictions,
+                'merges': self.merges
+            }
+    
+    def oldest_write_time(self) -> float:
+        """Нижняя граница времени записи хранимых записей
+        
+        Время записи в сегментах не хранится, а слияние переносит старые записи
+        в новые файлы, поэтому граница неизвестна.
+        """
+        return 0.0
+    
+    def close(self) -> None:
+        """Остановка фонового потока и закрытие файлов сегментов"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+        with self._lock:
+            self._close_files()
+    
+    # ------------------------------------------------------------------
+    # Сегменты
+    # ------------------------------------------------------------------
+    
+    def _segment_path(self, segment_id: int) -> Path:
+        return self._segments_dir / f"{self.SEGMENT_PREFIX}{segment_id:06d}{self.SEGMENT_SUFFIX}"
+    
+    def _encode_record(self, key: str, payload: bytes, flags: int, seq: int, expires_at: float) -> bytes:
+        key_bytes = key.encode('utf-8')
+        body = self._RECORD.pack(0, flags, len(key_bytes), len(payload), seq, expires_at)[4:] + key_bytes + payload
+        return struct.pack("<I", zlib.crc32(body)) + body
+    
+    def _append(self, key: str, payload: bytes, flags: int, expires_at: float):
+        """Дозапись в активный сегмент (под блокировкой): (смещение, длина, номер)"""
+        self._seq += 1
+        record = self._encode_record(key, payload, flags, self._seq, expires_at)
+        active = self._segments[self._active_id]
+        if active["size"] and active["size"] + len(record) > self.segment_size_bytes:
+            self._open_active(self._next_segment_id())
+            active = self._segments[self._active_id]
+        
+        offset = active["size"]
+        self._active_file.write(record)
+        self._active_file.flush()
+        active["size"] += len(record)
+        return offset, len(record), self._seq
+    
+    def _drop(self, key: str) -> None:
+        """Удаление ключа из индекса (запись в сегменте становится мертвой)"""
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            segment = self._segments.get(entry[0])
+            if segment is not None:
+                segment["live"] -= entry[2]
+            self._live_bytes -= entry[2]
+    
+    def _read(self, segment_id: int, start: int, end: int) -> bytes:
+        """Чтение диапазона сегмента через mmap (под блокировкой)"""
+        mapped = self._maps.get(segment_id)
+        if mapped is None or len(mapped) < end:
+            # Активный сегмент растет - отображение пересоздается при чтении за его концом
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment_id), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment_id] = mapped
+        return mapped[start:end]
+    
+    def _next_segment_id(self) -> int:
+        return max(self._segments, default=0) + 1
+    
+    def _open_active(self, segment_id: int) -> None:
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active_id = segment_id
+        self._active_file = open(self._segment_path(segment_id), 'ab')
+        self._segments[segment_id] = {"size": 0, "live": 0}
+    
+    def _close_files(self) -> None:
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+    
+    def _scan_segment(self, path: Path):
+        """Записи сегмента; оборванный или поврежденный хвост отрезается"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        header_size = self._RECORD.size
+        offset = 0
+        records = []
+        while offset + header_size <= len(data):
+            crc, flags, key_length, value_length, seq, expires_at = self._RECORD.unpack_from(data, offset)
+            end = offset + header_size + key_length + value_length
+            if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+                break
+            key = data[offset + header_size:offset + header_size + key_length].decode('utf-8')
+            records.append((key, flags, offset, end - offset, seq, expires_at, key_length))
+            offset = end
+        
+        if offset < len(data):
+            self.logger.warning(f"Сегмент кэша {path.name} обрезан до {offset} байт после сбоя")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        return records, offset
+    
+    def _recover(self) -> None:
+        """Восстановление индекса по сегментам (под блокировкой)"""
+        self._index.clear()
+        self._segments.clear()
+        self._live_bytes = 0
+        self._seq = 0
+        
+        # Незавершенное слияние: новые сегменты уже записаны, старые не успели удалиться
+        manifest = self._segments_dir / self.MERGE_MANIFEST
+        if manifest.exists():
+            try:
+                with open(manifest, 'r', encoding='utf-8') as f:
+                    for segment_id in json.load(f).get("remove", []):
+                        self._segment_path(segment_id).unlink(missing_ok=True)
+            except Exception as e:
+                self.logger.error(f"Ошибка завершения слияния сегментов: {e}")
+            manifest.unlink(missing_ok=True)
+        
+        winners = {}
+        prefix_length = len(self.SEGMENT_PREFIX)
+        for path in sorted(self._segments_dir.glob(f"{self.SEGMENT_PREFIX}*{self.SEGMENT_SUFFIX}")):
+            segment_id = int(path.stem[prefix_length:])
+            records, size = self._scan_segment(path)
+            if not size:
+                path.unlink(missing_ok=True)
+                continue
+            self._segments[segment_id] = {"size": size, "live": 0}
+            for key, flags, offset, length, seq, expires_at, key_length in records:
+                self._seq = max(self._seq, seq)
+                current = winners.get(key)
+                if current is None or seq > current[4]:
+                    winners[key] = (segment_id, flags, offset, length, seq, expires_at, key_length)
+        
+        now = time.time()
+        # Порядок LRU после запуска - по порядку записи
+        for key, (segment_id, flags, offset, length, seq, expires_at, key_length) in sorted(
+                winners.items(), key=lambda item: item[1][4]):
+            if flags & self._TOMBSTONE or (expires_at and now > expires_at):
+                continue
+            self._index[key] = [segment_id, offset, length, seq, expires_at, key_length]
+            self._segments[segment_id]["live"] += length
+            self._live_bytes += length
+        
+        self._open_active(self._next_segment_id())
+    
+    # ------------------------------------------------------------------
+    # Фоновое обслуживание: вытеснение и слияние
+    # ------------------------------------------------------------------
+    
+    def _dead_ratio(self) -> float:
+        sealed = [segment for segment_id, segment in self._segments.items() if segment_id != self._active_id]
+        total = sum(segment["size"] for segment in sealed)
+        if total < self.segment_size_bytes:
+            return 0.0
+        return 1 - sum(segment["live"] for segment in sealed) / total
+    
+    def _needs_maintenance(self) -> bool:
+        return self._live_bytes > self.max_size_bytes or self._dead_ratio() > self.merge_threshold
+    
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="SegmentCacheMaintenance", daemon=True)
+            self._worker.start()
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                while self._evict_batch():
+                    if self._stop.is_set():
+                        return
+                with self._lock:
+                    merge_needed = self._dead_ratio() > self.merge_threshold
+                if merge_needed:
+                    self.merge()
+            except Exception as e:
+                self.logger.error(f"Ошибка обслуживания сегментного кэша: {e}")
+    
+    def _evict_batch(self) -> bool:
+        """Вытеснение порции давно не использовавшихся ключей до 80% лимита
+        
+        Returns:
+            True если нужна еще одна порция
+        """
+        with self._lock:
+            if not self._evicting and self._live_bytes <= self.max_size_bytes:
+                return False
+            target = self.max_size_bytes * 0.8
+            evicted = 0
+            while self._index and evicted < self.EVICTION_BATCH and self._live_bytes > target:
+                key = next(iter(self._index))
+                # Надгробие не дает ключу вернуться при восстановлении до слияния
+                self._append(key, b"", self._TOMBSTONE, 0.0)
+                self._drop(key)
+                evicted += 1
+            self.evictions += evicted
+            self._evicting = self._live_bytes > target
+            return self._evicting
+    
+    def merge(self) -> int:
+        """Слияние закрытых сегментов: живые записи переносятся в новые сегменты
+        
+        Returns:
+            Количество освобожденных байт
+        """
+        with self._merge_lock:
+            return self._merge()
+    
+    def _merge(self) -> int:
+        with self._lock:
+            sealed = [segment_id for segment_id in self._segments if segment_id != self._active_id]
+            if not sealed:
+                return 0
+            sealed_set = set(sealed)
+            disk_before = sum(self._segments[segment_id]["size"] for segment_id in sealed)
+            candidates = [(key, entry[0], entry[1]) for key, entry in self._index.items()
+                          if entry[0] in sealed_set]
+            output_id = None
+            output_file = None
+            outputs = []
+        
+        def open_output():
+            nonlocal output_id, output_file
+            if output_file is not None:
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                output_file.close()
+            output_id = self._next_segment_id()
+            output_file = open(self._segment_path(output_id), 'wb')
+            self._segments[output_id] = {"size": 0, "live": 0}
+            outputs.append(output_id)
+        
+        try:
+            for start in range(0, len(candidates), self.MERGE_BATCH):
+                if self._stop.is_set():
+                    # Слияние прервано: старые сегменты остаются, перенесенные записи - дубли
+                    # с теми же номерами, поэтому восстановление выберет любую из копий
+                    if output_file is not None:
+                        output_file.close()
+                    return 0
+                with self._lock:
+                    for key, segment_id, offset in candidates[start:start + self.MERGE_BATCH]:
+                        entry = self._index.get(key)
+                        # Ключ перезаписан или удален во время слияния
+                        if entry is None or entry[0] != segment_id or entry[1] != offset:
+                            continue
+                        record = self._read(segment_id, offset, offset + entry[2])
+                        if output_file is None or (self._segments[output_id]["size"]
+                                                   and self._segments[output_id]["size"] + len(record)
+                                                   > self.segment_size_bytes):
+                            open_output()
+                        output = self._segments[output_id]
+                        new_offset = output["size"]
+                        output_file.write(record)
+                        output["size"] += len(record)
+                        output["live"] += len(record)
+                        self._segments[segment_id]["live"] -= len(record)
+                        entry[0], entry[1] = output_id, new_offset
+                    if output_file is not None:
+                        output_file.flush()
+            
+            with self._lock:
+                if output_file is not None:
+                    output_file.flush()
+                    os.fsync(output_file.fileno())
+                    output_file.close()
+                
+                manifest = self._segments_dir / self.MERGE_MANIFEST
+                with open(manifest, 'w', encoding='utf-8') as f:
+                    json.dump({"remove": sealed}, f)
+                for segment_id in sealed:
+                    mapped = self._maps.pop(segment_id, None)
+                    if mapped is not None:
+                        mapped.close()
+                    self._segment_path(segment_id).unlink(missing_ok=True)
+                    del self._segments[segment_id]
+                manifest.unlink()
+                
+                self.merges += 1
+                disk_after = sum(self._segments[segment_id]["size"] for segment_id in outputs)
+                return disk_before - disk_after
+        except Exception:
+            if output_file is not None and not output_file.closed:
+                output_file.close()
+            raise
+
+class WriteBehindQueue:
+    """Отложенная запись в файловый кэш из фонового потока
+    
+    Запись в очередь не ждет диска; повторные записи одного ключа, еще не
+    дошедшие до диска, объединяются. Очередь ограничена: при переполнении
+    вызывающий поток ждет не дольше block_seconds, после чего пишет сам.
+    """
+    
+    def __init__(self, file_cache, max_pending: int = 1000, block_seconds: float = 0.05):
+        self.file_cache = file_cache
+        self.max_pending = max_pending
+        self.block_seconds = block_seconds
+        self.logger = logging.getLogger(__name__)
+        # ключ -> (значение, момент истечения или None)
+        self._pending: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Optional[str] = None
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        
+        # Статистика
+        self.enqueued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failures = 0
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+        self.sync_writes = 0
+        self.max_depth = 0
+    
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Постановка записи в очередь"""
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._condition:
+            if not self._stopped:
+                if key in self._pending:
+                    self._pending[key] = (value, expires_at)
+                    self.coalesced += 1
+                    return
+                
+                if len(self._pending) >= self.max_pending:
+                    # Очередь полна: ждем писателя, затем пишем сами
+                    self.backpressure_waits += 1
+                    started = time.perf_counter()
+                    self._condition.wait_for(lambda: len(self._pending) < self.max_pending,
+                                             timeout=self.block_seconds)
+                    self.backpressure_seconds += time.perf_counter() - started
+                
+                if len(self._pending) < self.max_pending:
+                    self._pending[key] = (value, expires_at)
+                    self.enqueued += 1
+                    self.max_depth = max(self.max_depth, len(self._pending))
+                    self._ensure_worker()
+                    self._condition.notify_all()
+                    return
+                
+                self.sync_writes += 1
+            
+            # Запись в вызывающем потоке (переполнение или остановленная очередь);
+            # под условием, чтобы не обогнать запись этого ключа писателем
+            self._wait_not_in_flight(key)
+        self.file_cache.set(key, value, ttl)
+    
+    def get_pending(self, key: str) -> Optional[Any]:
+        """Значение, еще не записанное на диск (чтение своих записей)"""
+        with self._condition:
+            item = self._pending.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.time() > expires_at:
+            return None
+        return value
+    
+    def discard(self, key: str) -> bool:
+        """Отмена ожидающей записи; дожидается записи ключа, уже идущей на диск"""
+        with self._condition:
+            removed = self._pending.pop(key, None) is not None
+            self._wait_not_in_flight(key)
+            self._condition.notify_all()
+            return removed
+    
+    def clear(self) -> None:
+        """Отмена всех ожидающих записей"""
+        with self._condition:
+            self._pending.clear()
+            self._condition.wait_for(lambda: self._in_flight is None)
+            self._condition.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание записи всей очереди на диск
+        
+        Returns:
+            True если очередь опустела до истечения таймаута
+        """
+        with self._condition:
+            if self._pending:
+                self._ensure_worker()
+                self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: not self._pending and self._in_flight is None, timeout=timeout)
+    
+    def stop(self, flush: bool = True, timeout: Optional[float] = 10) -> None:
+        """Остановка писателя (по умолчанию после записи очереди)"""
+        if flush:
+            self.flush(timeout)
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+            self._worker = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика очереди и обратного давления"""
+        with self._condition:
+            return {
+                'depth': len(self._pending),
+                'max_depth': self.max_depth,
+                'max_pending': self.max_pending,
+                'enqueued': self.enqueued,
+                'coalesced': self.coalesced,
+                'written': self.written,
+                'failures': self.failures,
+                'backpressure_waits': self.backpressure_waits,
+                'backpressure_seconds': self.backpressure_seconds,
+                'sync_writes': self.sync_writes
+            }
+    
+    def _wait_not_in_flight(self, key: str) -> None:
+        """Ожидание записи ключа писателем (под условием)"""
+        self._condition.wait_for(lambda: self._in_flight != key)
+    
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="CacheWriteBehind", daemon=True)
+            self._worker.start()
+    
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopped)
+                if self._stopped:
+                    return
+                key, (value, expires_at) = self._pending.popitem(last=False)
+                self._in_flight = key
+                # Место в очереди освободилось
+                self._condition.notify_all()
+            
+            try:
+                ttl = None
+                if expires_at is not None:
+                    ttl = expires_at - time.time()
+                if ttl is None or ttl > 0:
+                    if self.file_cache.set(key, value, ttl) is False:
+                        self.failures += 1
+                    else:
+                        self.written += 1
+            except Exception as e:
+                self.failures += 1
+                self.logger.error(f"Ошибка отложенной записи в файловый кэш: {e}")
+            finally:
+                with self._condition:
+                    self._in_flight = None
+                    self._condition.notify_all()
+
+class _TaggedValue:
+    """Значение в файловом кэше вместе с метками и временем записи
+    
+    Метки хранятся рядом со значением, чтобы запись, оставшаяся от прошлого
+    запуска, проверялась по времени последней инвалидации ее меток.
+    """
+    __slots__ = ("value", "labels", "written_at")
+    
+    def __init__(self, value: Any, labels: tuple, written_at: float):
+        self.value = value
+        self.labels = labels
+        self.written_at = written_at
+    
+    def __getstate__(self):
+        return (self.value, self.labels, self.written_at)
+    
+    def __setstate__(self, state):
+        self.value, self.labels, self.written_at = state
+
+def _peel_cache_wrappers(value: Any):
+    """Значение без оберток CacheManager и служебные поля оберток"""
+    meta = {}
+    if isinstance(value, _TaggedValue):
+        meta["t"] = [list(value.labels), value.written_at]
+        value = value.value
+    if isinstance(value, _CachedResult):
+        meta["c"] = [value.fresh_until, value.cost]
+        value = value.value
+    return value, meta
+
+def _wrap_cache_value(value: Any, meta: Dict[str, Any]) -> Any:
+    """Восстановление оберток по служебным полям"""
+    if "c" in meta:
+        value = _CachedResult(value, *meta["c"])
+    if "t" in meta:
+        labels, written_at = meta["t"]
+        value = _TaggedValue(value, tuple(labels), written_at)
+    return value
+
+def cache_labels(namespace: Optional[str] = None, tags=None) -> tuple:
+    """Метки записи: пространство имен и теги"""
+    labels = []
+    if namespace:
+        labels.append(f"ns:{namespace}")
+    if tags:
+        labels.extend(f"tag:{tag}" for tag in sorted(tags))
+    return tuple(labels)
+
+class CacheTagIndex:
+    """Индекс ключей по пространствам имен и тегам
+    
+    Инвалидация метки удаляет только ее ключи. Время инвалидации сохраняется
+    в state/tags.json: так записи файлового кэша прошлых запусков, которых нет
+    в индексе, отбрасываются при чтении. Запись состояния откладывается в полосу
+    обслуживания фонового пула, серия инвалидаций дает одну запись.
+    """
+    
+    STATE_FILE = "tags.json"
+    # Запас на отложенную запись: файл может лечь на диск позже, чем значение было задано
+    PRUNE_MARGIN = 60.0
+    
+    def __init__(self, oldest_entry: Optional[Callable[[], float]] = None, executor=None):
+        """
+        Args:
+            oldest_entry: Нижняя граница времени записи хранимых файлов; более ранние
+                инвалидации ничего не отбрасывают и при сохранении удаляются
+            executor: Пул для записи состояния (по умолчанию общий фоновый пул)
+        """
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # метка -> ключи
+        self._members: Dict[str, set] = {}
+        # ключ -> (метки, лежит ли в файловом кэше)
+        self._keys: Dict[str, tuple] = {}
+        self._path: Optional[Path] = None
+        # метка -> время последней инвалидации
+        self._invalidated: Dict[str, float] = {}
+        self._oldest_entry = oldest_entry
+        self._executor = executor
+        self._dirty = False
+        self._save_pending = False
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def bind(self, cache_dir: Path) -> None:
+        """Привязка к каталогу файлового кэша (читает сохраненное состояние)"""
+        path = cache_state_path(cache_dir, self.STATE_FILE)
+        with self._lock:
+            if path == self._path:
+                return
+        # Несохраненное состояние прежнего каталога записывается до смены
+        self.flush()
+        with self._lock:
+            self._path = path
+            self._invalidated = {}
+            self._dirty = False
+            try:
+                saved = cache_state_path(cache_dir, self.STATE_FILE, for_reading=True)
+                if saved.exists():
+                    with open(saved, 'r', encoding='utf-8') as f:
+                        self._invalidated = json.load(f).get("invalidated", {})
+            except Exception as e:
+                self.logger.warning(f"Состояние тегов кэша не прочитано: {e}")
+    
+    def add(self, key: str, labels: tuple, in_file: bool) -> None:
+        """Регистрация ключа с метками"""
+        with self._lock:
+            self._discard(key)
+            if not labels:
+                return
+            self._keys[key] = (labels, in_file)
+            for label in labels:
+                self._members.setdefault(label, set()).add(key)
+    
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._discard(key)
+    
+    def pop(self, label: str) -> set:
+        """Ключи метки с удалением их из индекса и запоминанием времени инвалидации"""
+        with self._lock:
+            keys = self._members.pop(label, set())
+            for key in keys:
+                self._discard(key)
+            # Записи метки из прошлых запусков могут лежать в файлах и не быть в индексе
+            self._invalidated[label] = time.time()
+            bound = self._path is not None
+        if bound:
+            self._schedule_save()
+        return keys
+    
+    def is_stale(self, labels: tuple, written_at: float) -> bool:
+        """Была ли какая-то метка записи инвалидирована после ее записи"""
+        with self._lock:
+            return any(self._invalidated.get(label, 0.0) >= written_at for label in labels)
+    
+    def prune(self, alive: Callable[[str], bool]) -> int:
+        """Удаление из индекса ключей только памяти, которых там уже нет"""
+        with self._lock:
+            dead = [key for key, (_, in_file) in self._keys.items() if not in_file and not alive(key)]
+            for key in dead:
+                self._discard(key)
+            return len(dead)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._members.clear()
+            self._keys.clear()
+    
+    def _discard(self, key: str) -> None:
+        entry = self._keys.pop(key, None)
+        if entry is None:
+            return
+        for label in entry[0]:
+            members = self._members.get(label)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._members[label]
+    
+    def _schedule_save(self) -> None:
+        """Отложенная запись: инвалидации до начала записи попадают в одну запись"""
+        with self._lock:
+            self._dirty = True
+            if self._save_pending:
+                return
+            self._save_pending = True
+        try:
+            from background_executor import TaskPriority, get_background_executor
+            executor = self._executor or get_background_executor()
+            executor.submit(self.flush, priority=TaskPriority.MAINTENANCE, task_id="cache_tags_save")
+        except RuntimeError:
+            # Пул уже остановлен (выход из приложения)
+            self.flush()
+    
+    def flush(self) -> bool:
+        """Запись несохраненного состояния в текущем потоке"""
+        with self._lock:
+            self._save_pending = False
+            if not self._dirty or self._path is None:
+                return True
+            self._dirty = False
+        if self._save():
+            return True
+        with self._lock:
+            self._dirty = True
+        return False
+    
+    def _save(self) -> bool:
+        """Атомарная запись времени инвалидации меток без уже ненужных"""
+        try:
+            oldest = self._oldest_entry() if self._oldest_entry is not None else 0.0
+            with self._save_lock:
+                # Снимок под блокировкой записи: более старый снимок не перезапишет новый
+                with self._lock:
+                    cutoff = oldest - self.PRUNE_MARGIN
+                    for label in [label for label, invalidated_at in self._invalidated.items()
+                                  if invalidated_at < cutoff]:
+                        del self._invalidated[label]
+                    path = self._path
+                    payload = json.dumps({"invalidated": self._invalidated}, separators=(",", ":"))
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения состояния тегов кэша: {e}")
+            return False
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами"""
+    
+    # Верхние границы корзин в микросекундах; последняя корзина - все, что дольше
+    BOUNDS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                 10000, 20000, 50000, 100000, 200000, 500000, 1000000)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BOUNDS_US) + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+    
+    def record(self, seconds: float) -> None:
+        index = bisect.bisect_left(self.BOUNDS_US, seconds * 1e6)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+    
+    def percentile(self, fraction: float) -> float:
+        """Верхняя граница корзины, в которую попадает доля fraction замеров (мс)"""
+        with self._lock:
+            counts = list(self._counts)
+            count = self.count
+            max_seconds = self.max_seconds
+        if not count:
+            return 0.0
+        threshold = fraction * count
+        seen = 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= threshold:
+                if index < len(self.BOUNDS_US):
+                    return min(self.BOUNDS_US[index] / 1000, max_seconds * 1000)
+                break
+        return max_seconds * 1000
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count = self.count
+            total = self.total_seconds
+            max_seconds = self.max_seconds
+        buckets = {f"le_{bound}us": counts[index] for index, bound in enumerate(self.BOUNDS_US) if counts[index]}
+        if counts[-1]:
+            buckets["inf"] = counts[-1]
+        return {
+            'count': count,
+            'mean_ms': total / count * 1000 if count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': max_seconds * 1000,
+            'buckets': buckets
+        }
+
+def key_namespace(key: Any) -> str:
+    """Пространство имен ключа: первый элемент ключа-кортежа или префикс до двоеточия"""
+    if type(key) is tuple and key:
+        return str(key[0])
+    if isinstance(key, str) and ":" in key:
+        return key.split(":", 1)[0]
+    return "default"
+
+class CacheMetrics:
+    """Счетчики по пространствам имен и гистограммы задержек по уровням кэша"""
+    
+    LATENCY_OPERATIONS = ("memory.get", "memory.set", "file.get", "file.set")
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, Dict[str, float]] = {}
+        self.latency = {operation: LatencyHistogram() for operation in self.LATENCY_OPERATIONS}
+    
+    def _counters(self, namespace: str) -> Dict[str, float]:
+        counters = self._namespaces.get(namespace)
+        if counters is None:
+            counters = self._namespaces[namespace] = {
+                'hits': 0, 'misses': 0, 'evictions': 0,
+                'load_seconds': 0.0, 'saved_seconds': 0.0
+            }
+        return counters
+    
+    def hit(self, namespace: str) -> None:
+        with self._lock:
+            self._counters(namespace)['hits'] += 1
+    
+    def miss(self, namespace: str) -> None:
+        with self._lock:
+            self._counters(namespace)['misses'] += 1
+    
+    def eviction(self, key: Any) -> None:
+        with self._lock:
+            self._counters(key_namespace(key))['evictions'] += 1
+    
+    def loaded(self, namespace: str, seconds: float) -> None:
+        """Время вычисления значения при промахе"""
+        with self._lock:
+            self._counters(namespace)['load_seconds'] += seconds
+    
+    def saved(self, namespace: str, seconds: float) -> None:
+        """Время вычисления, сэкономленное попаданием"""
+        with self._lock:
+            self._counters(namespace)['saved_seconds'] += seconds
+    
+    def namespaces(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {namespace: dict(counters) for namespace, counters in self._namespaces.items()}
+        for counters in result.values():
+            requests = counters['hits'] + counters['misses']
+            counters['hit_rate'] = counters['hits'] / requests * 100 if requests else 0.0
+        return result
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'namespaces': self.namespaces(),
+            'latency': {operation: histogram.snapshot() for operation, histogram in self.latency.items()}
+        }
+
+class CacheWarmup:
+    """Фоновая загрузка горячих ключей из файлового уровня в память
+    
+    Ключи загружаются по убыванию важности. Поток стартует после задержки и
+    делает паузу после каждого ключа, чтобы не конкурировать с интерфейсом
+    за диск и GIL; cancel() останавливает загрузку после текущего ключа.
+    """
+    
+    def __init__(self, manager: "CacheManager", keys: List[Any],
+                 delay: float = 0.0, pause: float = 0.001):
+        self.manager = manager
+        self.keys = keys
+        self.delay = delay
+        self.pause = pause
+        self.loaded = 0
+        self.missing = 0
+        self._position = 0
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> "CacheWarmup":
+        self._thread = threading.Thread(target=self._run, name="CacheWarmup", daemon=True)
+        self._thread.start()
+        return self
+    
+    def _run(self) -> None:
+        try:
+            if self._cancel.wait(self.delay):
+                return
+            for key in self.keys:
+                if self._cancel.is_set():
+                    return
+                if self.manager.warm(key):
+                    self.loaded += 1
+                else:
+                    self.missing += 1
+                self._position += 1
+                if self.pause:
+                    time.sleep(self.pause)
+        except Exception as e:
+            self.manager.logger.error(f"Ошибка прогрева кэша: {e}")
+        finally:
+            self._done.set()
+    
+    def cancel(self) -> None:
+        """Остановка прогрева"""
+        self._cancel.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+    
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание завершения; False, если прогрев еще идет"""
+        return self._done.wait(timeout)
+    
+    def remaining(self) -> List[Any]:
+        """Ключи, до которых прогрев не дошел"""
+        return self.keys[self._position:]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        if self.done:
+            state = "cancelled" if self.cancelled and self._position < len(self.keys) else "done"
+        else:
+            state = "running"
+        return {
+            'state': state,
+            'total': len(self.keys),
+            'loaded': self.loaded,
+            'missing': self.missing
+        }
+
+class CacheManager:
+    """Менеджер кэширования с поддержкой многоуровневого кэша"""
+    
+    # Список горячих ключей в подкаталоге состояния файлового кэша
+    HOT_SET_FILE = "hotset.json"
+    HOT_SET_VERSION = 1
+    
+    def __init__(self, memory_cache_size: int = 1000, 
+                 file_cache_size_mb: int = 100,
+                 default_ttl: Optional[float] = None,
+                 memory_policy: Union[str, EvictionPolicy] = "lru",
+                 memory_shards: int = 1,
+                 file_backend: str = "files",
+                 write_behind: bool = False,
+                 write_queue_size: int = 1000,
+                 memory_limit_mb: Optional[float] = None,
+                 sizer: Optional[Callable[[Any], int]] = estimate_size,
+                 serializers: Optional[SerializerRegistry] = None,
+                 hot_set_size: int = 256):
+        
+        self.metrics = CacheMetrics()
+        # Сериализаторы файлового уровня по пространствам имен
+        self.serializers = serializers or SerializerRegistry()
+        
+        # Бюджет памяти в байтах (кроме ограничения на число записей)
+        max_bytes = int(memory_limit_mb * 1024 * 1024) if memory_limit_mb is not None else None
+        if memory_shards > 1:
+            self.memory_cache = ShardedMemoryCache(memory_cache_size, default_ttl,
+                                                   memory_policy, memory_shards, max_bytes, sizer,
+                                                   on_evict=self.metrics.eviction)
+        else:
+            self.memory_cache = MemoryCache(memory_cache_size, default_ttl, memory_policy,
+                                            max_bytes, sizer, on_evict=self.metrics.eviction)
+        # "files" - файл на ключ, "segments" - сегменты с дозаписью
+        if file_backend == "segments":
+            self.file_cache = SegmentFileCache(max_size_mb=file_cache_size_mb, serializers=self.serializers)
+        elif file_backend == "files":
+            self.file_cache = FileCache(max_size_mb=file_cache_size_mb, serializers=self.serializers)
+        else:
+            raise ValueError(f"Unknown file cache backend: {file_backend}")
+        # Отложенная запись: set не ждет диска
+        self.write_queue = WriteBehindQueue(self.file_cache, write_queue_size) if write_behind else None
+        # Ключи по пространствам имен и тегам для точечной инвалидации
+        self.tags = CacheTagIndex(oldest_entry=self.file_cache.oldest_write_time)
+        # Размер индекса тегов, при котором из него убираются вытесненные ключи
+        self._tags_prune_at = 1024
+        self.logger = logging.getLogger(__name__)
+        # Периодическая запись статистики в JSON
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_stop = threading.Event()
+        self._snapshot_path: Optional[Path] = None
+        # Сколько ключей сохранять в списке горячих при закрытии
+        self.hot_set_size = min(hot_set_size, memory_cache_size)
+        self.warmup: Optional[CacheWarmup] = None
+    
+    def get(self, key: str, use_file_cache: bool = True) -> Optional[Any]:
+        """Получение значения из кэша (сначала память, потом файл)"""
+        metrics = self.metrics
+        namespace = key_namespace(key)
+        
+        # Сначала проверяем память
+        started = time.perf_counter()
+        value = self.memory_cache.get(key)
+        metrics.latency["memory.get"].record(time.perf_counter() - started)
+        if value is not None:
+            metrics.hit(namespace)
+            return value
+        
+        # Затем проверяем файловый кэш (включая записи, еще не дошедшие до диска)
+        if use_file_cache:
+            started = time.perf_counter()
+            value = self._load_from_file(key)
+            metrics.latency["file.get"].record(time.perf_counter() - started)
+            if value is not None:
+                metrics.hit(namespace)
+                return value
+        
+        metrics.miss(namespace)
+        return None
+    
+    def _load_from_file(self, key: str) -> Optional[Any]:
+        """Чтение из файлового уровня с проверкой меток и загрузкой в память"""
+        value = self.write_queue.get_pending(key) if self.write_queue else None
+        if value is None:
+            value = self.file_cache.get(key)
+        if isinstance(value, _TaggedValue):
+            self.tags.bind(self.file_cache.cache_dir)
+            if self.tags.is_stale(value.labels, value.written_at):
+                # Метки записи инвалидированы после ее сохранения
+                self.delete(key)
+                return None
+            self.tags.add(key, value.labels, in_file=True)
+            value = value.value
+        if value is not None:
+            # Загружаем в память для быстрого доступа
+            self.memory_cache.set(key, value)
+        return value
+    
+    def warm(self, key: str) -> bool:
+        """Загрузка ключа из файлового уровня в память без учета в статистике
+        
+        Returns:
+            True, если ключ есть в памяти после вызова
+        """
+        if key in self.memory_cache:
+            return True
+        return self._load_from_file(key) is not None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            use_file_cache: bool = True, namespace: Optional[str] = None,
+            tags=None) -> None:
+        """Установка значения в кэш
+        
+        Args:
+            namespace: Пространство имен записи (для invalidate(namespace=...))
+            tags: Теги записи, например {"tasks", "day:2025-10-03"}
+        """
+        labels = cache_labels(namespace, tags)
+        if labels:
+            if use_file_cache:
+                self.tags.bind(self.file_cache.cache_dir)
+            self.tags.add(key, labels, in_file=use_file_cache)
+            if len(self.tags) > self._tags_prune_at:
+                # Порог растет вместе с индексом: очистка O(1) амортизированно
+                self.tags.prune(lambda tagged_key: tagged_key in self.memory_cache)
+                self._tags_prune_at = max(1024, 2 * len(self.tags))
+        elif self.tags:
+            self.tags.discard(key)
+        
+        # Всегда сохраняем в память
+        started = time.perf_counter()
+        self.memory_cache.set(key, value, ttl)
+        self.metrics.latency["memory.set"].record(time.perf_counter() - started)
+        
+        # Опционально сохраняем в файл (при отложенной записи - время постановки в очередь)
+        if use_file_cache:
+            if labels:
+                value = _TaggedValue(value, labels, time.time())
+            started = time.perf_counter()
+            if self.write_queue is not None:
+                self.write_queue.put(key, value, ttl)
+            else:
+                self.file_cache.set(key, value, ttl)
+            self.metrics.latency["file.set"].record(time.perf_counter() - started)
+    
+    def invalidate(self, tag: Optional[str] = None, namespace: Optional[str] = None) -> int:
+        """Удаление записей с тегом и/или из пространства имен во всех уровнях
+        
+        Время работы пропорционально числу затронутых записей.
+        
+        Returns:
+            Количество удаленных ключей
+        """
+        if tag is None and namespace is None:
+            raise ValueError("invalidate() requires a tag or a namespace")
+        
+        self.tags.bind(self.file_cache.cache_dir)
+        keys = set()
+        if namespace is not None:
+            keys |= self.tags.pop(f"ns:{namespace}")
+        if tag is not None:
+            keys |= self.tags.pop(f"tag:{tag}")
+        for key in keys:
+            self._delete_untracked(key)
+        return len(keys)
     
     def delete(self, key: str) -> bool:
         """Удаление значения из всех уровней кэша"""
+        self.tags.discard(key)
+        return self._delete_untracked(key)
+    
+    def _delete_untracked(self, key: str) -> bool:
+        """Удаление значения из всех уровней без обновления индекса тегов"""
         memory_deleted = self.memory_cache.delete(key)
+        pending_deleted = self.write_queue.discard(key) if self.write_queue else False
         file_deleted = self.file_cache.delete(key)
-        return memory_deleted or file_deleted
+        return memory_deleted or pending_deleted or file_deleted
     
     def clear(self) -> None:
         """Очистка всех уровней кэша"""
+        self.tags.clear()
         self.memory_cache.clear()
+        if self.write_queue is not None:
+            self.write_queue.clear()
         self.file_cache.clear()
     
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание записи на диск всех отложенных значений"""
+        if self.write_queue is None:
+            return True
+        return self.write_queue.flush(timeout)
+    
+    def close(self) -> None:
+        """Запись отложенных значений, закрытие файлового кэша и отказ от истечения в фоне
+        
+        Перед закрытием сохраняется список горячих ключей для прогрева при следующем запуске.
+        """
+        if self.warmup is not None:
+            self.warmup.cancel()
+        if self.hot_set_size:
+            self.save_hot_set()
+        self.stop_stats_snapshots()
+        if self.write_queue is not None:
+            self.write_queue.stop(flush=True)
+        self.tags.flush()
+        self.file_cache.close()
+        self.memory_cache.close()
+    
+    def _hot_set_path(self, path: Union[str, Path, None], for_reading: bool = False) -> Path:
+        if path is not None:
+            return Path(path)
+        return cache_state_path(self.file_cache.cache_dir, self.HOT_SET_FILE, for_reading)
+    
+    def save_hot_set(self, path: Union[str, Path, None] = None) -> bool:
+        """Атомарная запись горячих ключей (по частоте и давности обращений) в JSON
+        
+        Сохраняются только строковые ключи - ключи записей файлового уровня.
+        Ключи незавершенного прогрева дописываются в конец списка, чтобы
+        ранний выход из приложения не обнулял горячий набор.
+        """
+        try:
+            path = self._hot_set_path(path)
+            hot = [(key, round(score, 3)) for key, score in self.memory_cache.hot_keys(self.hot_set_size)
+                   if isinstance(key, str)]
+            if self.warmup is not None and len(hot) < self.hot_set_size:
+                seen = {key for key, _ in hot}
+                hot.extend((key, 0.0) for key in self.warmup.remaining() if key not in seen)
+                hot = hot[:self.hot_set_size]
+            if not hot:
+                return False
+            
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.HOT_SET_VERSION, 'saved_at': time.time(), 'keys': hot},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка записи горячих ключей кэша: {e}")
+            return False
+    
+    def load_hot_set(self, path: Union[str, Path, None] = None) -> List[str]:
+        """Горячие ключи прошлого запуска по убыванию важности"""
+        try:
+            with open(self._hot_set_path(path, for_reading=True), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            self.logger.error(f"Ошибка чтения горячих ключей кэша: {e}")
+            return []
+        if data.get('version') != self.HOT_SET_VERSION:
+            return []
+        return [key for key, _ in data.get('keys', [])]
+    
+    def start_warmup(self, path: Union[str, Path, None] = None, delay: float = 0.0,
+                     pause: float = 0.001) -> Optional[CacheWarmup]:
+        """Фоновый прогрев памяти горячими ключами прошлого запуска
+        
+        Returns:
+            Прогрев (можно отменить через cancel()) или None, если ключей нет
+        """
+        keys = self.load_hot_set(path)
+        if not keys:
+            return None
+        if self.warmup is not None:
+            self.warmup.cancel()
+        self.warmup = CacheWarmup(self, keys, delay, pause).start()
+        return self.warmup
+    
+    def write_stats_snapshot(self, path: Union[str, Path]) -> bool:
+        """Атомарная запись статистики в JSON-файл"""
+        try:
+            path = Path(path)
+            snapshot = self.get_stats()
+            snapshot['timestamp'] = datetime.now().isoformat()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка записи статистики кэша: {e}")
+            return False
+    
+    def start_stats_snapshots(self, path: Union[str, Path], interval: float = 60.0) -> None:
+        """Периодическая запись статистики в JSON-файл из фонового потока"""
+        self.stop_stats_snapshots()
+        self._snapshot_path = Path(path)
+        self._snapshot_stop.clear()
+        
+        def snapshot_worker():
+            while not self._snapshot_stop.wait(interval):
+                self.write_stats_snapshot(self._snapshot_path)
+        
+        self._snapshot_thread = threading.Thread(target=snapshot_worker, name="CacheStatsSnapshot", daemon=True)
+        self._snapshot_thread.start()
+    
+    def stop_stats_snapshots(self) -> None:
+        """Остановка периодической записи (с последним снимком)"""
+        if self._snapshot_thread is None:
+            return
+        self._snapshot_stop.set()
+        self._snapshot_thread.join(timeout=5)
+        self._snapshot_thread = None
+        self.write_stats_snapshot(self._snapshot_path)
+    
     def get_stats(self) -> Dict[str, Any]:
         """Получение статистики кэширования"""
         return {
             'memory_cache': self.memory_cache.get_stats(),
+            'file_cache': self.file_cache.get_stats(),
             'file_cache_dir': str(self.file_cache.cache_dir),
-            'file_cache_size_mb': self.file_cache.max_size_bytes / (1024 * 1024)
+            'file_cache_size_mb': self.file_cache.max_size_bytes / (1024 * 1024),
+            'write_behind': self.write_queue.get_stats() if self.write_queue else None,
+            'serializers': self.serializers.get_stats(),
+            'warmup': self.warmup.get_stats() if self.warmup else None,
+            **self.metrics.snapshot()
         }
+
+class CacheRegistry:
+    """Реестр кэшей процесса с общим бюджетом памяти
+    
+    Кэш регистрируется под именем и должен предоставлять свойство bytes
+    (оценка занятой памяти), trim(nbytes) и get_stats() со счетчиками hits и
+    misses (как у MemoryCache). Реестр хранит слабые ссылки: удаленный кэш
+    выбывает сам. При превышении бюджета первыми урезаются наименее ценные
+    кэши - с наименьшей долей попаданий, умноженной на вес.
+    """
+    
+    def __init__(self, budget_bytes: Optional[int] = None):
+        self.budget_bytes = budget_bytes
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Имя -> (слабая ссылка, вес)
+        self._caches: Dict[str, tuple] = {}
+        self._trimmed: Dict[str, int] = {}
+        self.enforcements = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    def register(self, name: str, cache: Any, weight: float = 1.0) -> str:
+        """Регистрация кэша; при занятом имени добавляется номер
+        
+        Returns:
+            Имя, под которым кэш зарегистрирован
+        """
+        with self._lock:
+            unique, number = name, 1
+            while unique in self._caches and self._caches[unique][0]() is not None:
+                number += 1
+                unique = f"{name}#{number}"
+            self._caches[unique] = (weakref.ref(cache), weight)
+            self._trimmed.setdefault(unique, 0)
+            return unique
+    
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._caches.pop(name, None)
+            self._trimmed.pop(name, None)
+    
+    def caches(self) -> Dict[str, Any]:
+        """Живые зарегистрированные кэши"""
+        alive = {}
+        with self._lock:
+            for name, (ref, _) in list(self._caches.items()):
+                cache = ref()
+                if cache is None:
+                    del self._caches[name]
+                    self._trimmed.pop(name, None)
+                else:
+                    alive[name] = cache
+        return alive
+    
+    def total_bytes(self) -> int:
+        return sum(cache.bytes for cache in self.caches().values())
+    
+    def _value(self, name: str, cache: Any) -> float:
+        """Ценность кэша: доля попаданий (со сглаживанием для новых кэшей), умноженная на вес"""
+        stats = cache.get_stats()
+        hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+        return self._caches[name][1] * (hits + 1) / (hits + misses + 1)
     
-    def _start_cleanup_thread(self) -> None:
-        """Запуск фонового потока очистки"""
-        def cleanup_worker():
-            while True:
+    def enforce(self) -> int:
+        """Урезание наименее ценных кэшей до общего бюджета
+        
+        Returns:
+            Освобождено байт
+        """
+        if self.budget_bytes is None:
+            return 0
+        caches = self.caches()
+        sizes = {name: cache.bytes for name, cache in caches.items()}
+        excess = sum(sizes.values()) - self.budget_bytes
+        if excess <= 0:
+            return 0
+        
+        with self._lock:
+            order = sorted((self._value(name, cache), name) for name, cache in caches.items()
+                           if name in self._caches)
+        freed = 0
+        for _, name in order:
+            if excess <= 0:
+                break
+            released = caches[name].trim(min(excess, sizes[name]))
+            excess -= released
+            freed += released
+            with self._lock:
+                if name in self._trimmed:
+                    self._trimmed[name] += released
+        self.enforcements += 1
+        return freed
+    
+    def start(self, interval: float = 5.0) -> None:
+        """Периодическая проверка бюджета в фоновом потоке"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        
+        def budget_worker():
+            while not self._stop.wait(interval):
                 try:
-                    time.sleep(300)  # Каждые 5 минут
-                    expired_count = self.memory_cache.cleanup_expired()
-                    if expired_count > 0:
-                        self.logger.debug(f"Очищено {expired_count} истекших записей из кэша")
+                    self.enforce()
                 except Exception as e:
-                    self.logger.error(f"Ошибка в фоновой очистке кэша: {e}")
+                    self.logger.error(f"Ошибка проверки бюджета кэшей: {e}")
         
-        cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        cleanup_thread.start()
+        self._thread = threading.Thread(target=budget_worker, name="CacheBudget", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Сводка по всем кэшам процесса"""
+        caches = {}
+        for name, cache in self.caches().items():
+            stats = cache.get_stats()
+            hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+            with self._lock:
+                weight = self._caches[name][1] if name in self._caches else 0.0
+                trimmed = self._trimmed.get(name, 0)
+            caches[name] = {
+                'bytes': cache.bytes,
+                'entries': stats.get('size', 0),
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': (hits / (hits + misses) * 100) if hits + misses else 0,
+                'weight': weight,
+                'trimmed_bytes': trimmed
+            }
+        return {
+            'budget_bytes': self.budget_bytes,
+            'total_bytes': sum(stats['bytes'] for stats in caches.values()),
+            'enforcements': self.enforcements,
+            'caches': caches
+        }
+
+# Ключи кэша для декоратора cached
+_PRIMITIVE_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
+
+# Ключи длиннее порога заменяются хэшем, чтобы не хранить большие строки
+KEY_HASH_THRESHOLD = 128
+
+# Токены экземпляров уникальны в пределах процесса, а с префиксом запуска -
+# и между запусками (ключи попадают в файловый кэш)
+_RUN_NONCE = uuid.uuid4().hex[:8]
+_instance_counter = itertools.count(1)
+_instance_tokens: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_instance_tokens_lock = threading.Lock()
+
+def _all_primitive(values) -> bool:
+    for value in values:
+        if type(value) not in _PRIMITIVE_TYPES and not (type(value) is tuple and _all_primitive(value)):
+            return False
+    return True
+
+def structural_key(value: Any) -> Any:
+    """Каноническое представление значения: словари и множества без учета порядка"""
+    value_type = type(value)
+    if value_type in _PRIMITIVE_TYPES:
+        return value
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted(((structural_key(key), structural_key(item))
+                                      for key, item in value.items()), key=repr)))
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted((structural_key(item) for item in value), key=repr)))
+    if isinstance(value, list):
+        return ("list", tuple(structural_key(item) for item in value))
+    if isinstance(value, tuple):
+        return tuple(structural_key(item) for item in value)
+    return repr(value)
+
+def instance_token(instance: Any) -> str:
+    """Устойчивый токен экземпляра (id может достаться новому объекту после сборки мусора)"""
+    if isinstance(instance, type):
+        return f"<{instance.__module__}.{instance.__qualname__}>"
+    try:
+        with _instance_tokens_lock:
+            token = _instance_tokens.get(instance)
+            if token is None:
+                token = f"<{type(instance).__qualname__}:{_RUN_NONCE}-{next(_instance_counter)}>"
+                _instance_tokens[instance] = token
+            return token
+    except TypeError:
+        # Объекты без слабых ссылок: уникальны только пока живы
+        return f"<{type(instance).__qualname__}:{_RUN_NONCE}@{id(instance)}>"
+
+def make_cache_key(namespace: str, args: tuple, kwargs: Dict[str, Any],
+                   structural: bool = False, text: bool = True) -> Union[str, tuple]:
+    """Ключ вызова без хэширования строкового представления аргументов
+    
+    Аргументы-примитивы (и кортежи из них) образуют ключ-кортеж, который
+    словарь кэша хэширует сам; как в functools.lru_cache, равные значения
+    разных типов (1, 1.0, True) дают равные ключи-кортежи. Строковый ключ
+    (text=True) нужен файловому кэшу; длинные строковые ключи заменяются md5.
+    Прочие аргументы хэшируются через str, как раньше.
+    
+    Args:
+        structural: Сравнивать словари, списки и множества по содержимому
+        text: Вернуть строку вместо кортежа
+    """
+    if kwargs:
+        # Имена аргументов - всегда строки, проверяются только значения
+        items = tuple(sorted(kwargs.items())) if len(kwargs) > 1 else tuple(kwargs.items())
+        if _all_primitive(args) and _all_primitive(kwargs.values()):
+            key = (namespace, args, items)
+        elif structural:
+            key = (namespace, structural_key(args), structural_key(items))
+        else:
+            body = str(args) + str(sorted(kwargs.items()))
+            return f"{namespace}:{hashlib.md5(body.encode()).hexdigest()}"
+    elif _all_primitive(args):
+        key = (namespace, args)
+    elif structural:
+        key = (namespace, structural_key(args))
+    else:
+        return f"{namespace}:{hashlib.md5(str(args).encode()).hexdigest()}"
+    
+    if not text:
+        return key
+    body = repr(key[1:])
+    if len(body) > KEY_HASH_THRESHOLD:
+        body = hashlib.md5(body.encode()).hexdigest()
+    return f"{namespace}:{body}"
 
 # Декоратор для кэширования результатов функций
+class _CachedResult:
+    """Результат функции в кэше декоратора cached
+    
+    Обертка отличает закэшированный None от промаха, хранит срок свежести,
+    после которого значение отдается как устаревшее до фонового обновления,
+    и время вычисления, которое экономит каждое попадание.
+    """
+    __slots__ = ("value", "fresh_until", "cost")
+    
+    def __init__(self, value: Any, fresh_until: Optional[float], cost: float = 0.0):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.cost = cost
+    
+    def __getstate__(self):
+        return (self.value, self.fresh_until, self.cost)
+    
+    def __setstate__(self, state):
+        # Записи файлового кэша до учета времени вычисления - без cost
+        self.value, self.fresh_until = state[:2]
+        self.cost = state[2] if len(state) > 2 else 0.0
+
+class _Flight:
+    """Вычисление, которого ждут одновременные вызовы с тем же ключом"""
+    __slots__ = ("done", "result", "error")
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
 def cached(ttl: Optional[float] = None, use_file_cache: bool = False, 
-          key_func: Optional[Callable] = None):
+          key_func: Optional[Callable] = None, negative_ttl: Optional[float] = None,
+          stale_ttl: Optional[float] = None, namespace: Optional[str] = None,
+          tags=None, method: Optional[str] = None, structural: bool = False,
+          serializer: Optional[str] = None):
     """
     Декоратор для кэширования результатов функций
     
+    Одновременные вызовы с одним ключом ждут одного вычисления вместо
+    того, чтобы запускать функцию каждый.
+    
     Args:
         ttl: Время жизни кэша в секундах
         use_file_cache: Использовать файловый кэш
         key_func: Функция для генерации ключа кэша
+        negative_ttl: Время жизни результата None (0 - не кэшировать None;
+            по умолчанию как у обычных результатов)
+        stale_ttl: Сколько секунд после истечения ttl отдавать устаревшее
+            значение, обновляя его в фоновом потоке
+        namespace: Пространство имен записей функции (по умолчанию модуль
+            и имя функции); clear_cache очищает только его
+        tags: Теги записей - набор строк или функция от аргументов вызова,
+            возвращающая набор (например, {"tasks", "day:2025-10-03"})
+        method: Ключ для методов: "instance" - свой кэш у каждого экземпляра,
+            "shared" - self не входит в ключ. По умолчанию "instance", если
+            первый параметр функции называется self или cls
+        structural: Хэшировать словари, списки и множества по содержимому
+        serializer: Сериализатор файлового кэша для записей функции
+            ("pickle", "marshal", "json")
     """
+    if method not in (None, "instance", "shared"):
+        raise ValueError(f"Unknown method key mode: {method}")
+    if serializer is not None and serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {serializer}")
+    logger = logging.getLogger(__name__)
+    
     def decorator(func):
+        func_namespace = namespace or f"{func.__module__}.{func.__qualname__}"
+        bound = method
+        if bound is None:
+            code = getattr(func, "__code__", None)
+            if code is not None and code.co_argcount and code.co_varnames[0] in ("self", "cls"):
+                bound = "instance"
+        flights: Dict[str, _Flight] = {}
+        flights_lock = threading.Lock()
+        
+        def store(cache_key, result, args, kwargs, cost):
+            entry_ttl = ttl
+            if result is None and negative_ttl is not None:
+                if negative_ttl <= 0:
+                    return
+                entry_ttl = negative_ttl
+            
+            fresh_until = None
+            hard_ttl = entry_ttl
+            if entry_ttl is not None:
+                fresh_until = time.time() + entry_ttl
+                if stale_ttl:
+                    hard_ttl = entry_ttl + stale_ttl
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            manager = get_cache_manager()
+            if serializer is not None and use_file_cache:
+                manager.serializers.register(func_namespace, serializer)
+            manager.set(cache_key, _CachedResult(result, fresh_until, cost),
+                                    hard_ttl, use_file_cache,
+                                    namespace=func_namespace, tags=entry_tags)
+        
+        def begin(cache_key):
+            """Регистрация вычисления; второй элемент - True для ведущего вызова"""
+            with flights_lock:
+                flight = flights.get(cache_key)
+                if flight is not None:
+                    return flight, False
+                flight = flights[cache_key] = _Flight()
+                return flight, True
+        
+        def run(flight, cache_key, args, kwargs):
+            """Вычисление ведущим вызовом и пробуждение ожидающих"""
+            try:
+                started = time.perf_counter()
+                flight.result = func(*args, **kwargs)
+                cost = time.perf_counter() - started
+                get_cache_manager().metrics.loaded(func_namespace, cost)
+                store(cache_key, flight.result, args, kwargs, cost)
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with flights_lock:
+                    flights.pop(cache_key, None)
+                flight.done.set()
+        
+        def refresh(flight, cache_key, args, kwargs):
+            try:
+                run(flight, cache_key, args, kwargs)
+            except Exception as e:
+                logger.error(f"Ошибка фонового обновления кэша {func.__name__}: {e}")
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Генерируем ключ кэша
             if key_func:
                 cache_key = key_func(*args, **kwargs)
             else:
-                # Используем имя функции и хэш аргументов
-                args_str = str(args) + str(sorted(kwargs.items()))
-                cache_key = f"{func.__name__}:{hashlib.md5(args_str.encode()).hexdigest()}"
+                key_args = args
+                if bound == "instance" and args:
+                    key_args = (instance_token(args[0]),) + args[1:]
+                elif bound == "shared" and args:
+                    key_args = args[1:]
+                # Ключ-кортеж достаточен памяти; файловому кэшу нужна строка
+                cache_key = make_cache_key(func_namespace, key_args, kwargs, structural,
+                                           text=use_file_cache)
             
             # Проверяем кэш
-            cached_result = cache_manager.get(cache_key, use_file_cache)
-            if cached_result is not None:
-                return cached_result
-            
-            # Выполняем функцию и кэшируем результат
-            result = func(*args, **kwargs)
-            cache_manager.set(cache_key, result, ttl, use_file_cache)
+            manager = get_cache_manager()
+            entry = manager.get(cache_key, use_file_cache)
+            if isinstance(entry, _CachedResult):
+                if entry.cost:
+                    manager.metrics.saved(func_namespace, entry.cost)
+                if entry.fresh_until is None or time.time() < entry.fresh_until:
+                    return entry.value
+                if stale_ttl:
+                    # Отдаем устаревшее значение, обновление - в фоне и только одно
+                    flight, leader = begin(cache_key)
+                    if leader:
+                        threading.Thread(target=refresh, args=(flight, cache_key, args, kwargs),
+                                         name=f"CacheRefresh-{func.__name__}", daemon=True).start()
+                    return entry.value
             
-            return result
+            # Выполняем функцию (или ждем уже идущее вычисление) и кэшируем результат
+            flight, leader = begin(cache_key)
+            if leader:
+                return run(flight, cache_key, args, kwargs)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
         
         # Добавляем методы для управления кэшем
-        wrapper.clear_cache = lambda: cache_manager.clear()
-        wrapper.cache_stats = lambda: cache_manager.get_stats()
+        wrapper.cache_namespace = func_namespace
+        wrapper.clear_cache = lambda: get_cache_manager().invalidate(namespace=func_namespace)
+        wrapper.cache_stats = lambda: get_cache_manager().get_stats()
         
         return wrapper
     return decorator
 
-# Глобальный экземпляр менеджера кэша
-cache_manager = CacheManager()
+# Глобальный экземпляр менеджера кэша (ленивая инициализация: импорт модуля
+# не создает каталог кэша и не запускает фоновый поток)
+_cache_manager = None
+_cache_manager_lock = threading.Lock()
+
+# Глобальным кэшем одновременно пользуются UI, фоновые обработчики и поток уведомлений
+GLOBAL_MEMORY_SHARDS = 16
+
+# Доля PerformanceConfig.memory_limit_mb, отводимая кэшу в памяти
+GLOBAL_MEMORY_SHARE = 0.25
+
+# Как часто глобальный кэш записывает снимок статистики (секунды)
+STATS_SNAPSHOT_INTERVAL = 60.0
+
+# Задержка прогрева глобального кэша после запуска: сначала отрисовывается окно (секунды)
+WARMUP_DELAY = 2.0
+
+# Доля PerformanceConfig.memory_limit_mb на все кэши процесса вместе
+REGISTRY_MEMORY_SHARE = 0.5
+
+# Как часто реестр проверяет общий бюджет кэшей (секунды)
+BUDGET_CHECK_INTERVAL = 5.0
+
+_cache_registry = None
+_cache_registry_lock = threading.Lock()
+
+def get_cache_registry() -> CacheRegistry:
+    """Получение глобального реестра кэшей с бюджетом из конфигурации"""
+    global _cache_registry
+    with _cache_registry_lock:
+        if _cache_registry is None:
+            from config_manager import get_config
+            config = get_config()
+            _cache_registry = CacheRegistry(
+                int(config.performance.memory_limit_mb * REGISTRY_MEMORY_SHARE * 1024 * 1024))
+            _cache_registry.start(BUDGET_CHECK_INTERVAL)
+        return _cache_registry
 
 def get_cache_manager() -> CacheManager:
     """Получение глобального менеджера кэша"""
-    return cache_manager
+    global _cache_manager
+    # Быстрый путь без блокировки: после создания менеджер только читается
+    manager = _cache_manager
+    if manager is not None:
+        return manager
+    with _cache_manager_lock:
+        if _cache_manager is None:
+            from config_manager import get_config
+            config = get_config()
+            manager = CacheManager(
+                file_cache_size_mb=config.data.cache_size_mb,
+                memory_shards=GLOBAL_MEMORY_SHARDS,
+                write_behind=True,
+                memory_limit_mb=config.performance.memory_limit_mb * GLOBAL_MEMORY_SHARE
+            )
+            manager.start_stats_snapshots(
+                cache_state_path(manager.file_cache.cache_dir, "stats.json"),
+                STATS_SNAPSHOT_INTERVAL)
+            manager.start_warmup(delay=WARMUP_DELAY)
+            get_cache_registry().register("cache_manager", manager.memory_cache)
+            # Отложенные записи дописываются при выходе из приложения
+            atexit.register(manager.close)
+            # Публикуется полностью настроенным: быстрый путь не увидит его раньше
+            _cache_manager = manager
+        return _cache_manager
+
+def __getattr__(name):
+    # Совместимость с `from cache_manager import cache_manager`
+    if name == "cache_manager":
+        return get_cache_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,8 +5,8 @@
 
 import json
 import os
-from typing import Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
 import logging
 
@@ -67,6 +67,8 @@ class PerformanceConfig:
     analytics_update_interval_ms: int = 5000
     lazy_loading: bool = True
     memory_limit_mb: int = 512
+    stall_watchdog: bool = False  # сторож зависаний главного потока (включается для диагностики)
+    stall_thresholds_ms: List[int] = field(default_factory=lambda: [50, 250, 1000])
 
 @dataclass
 class AppConfig:
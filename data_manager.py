@@ -2,17 +2,405 @@
 import json
 import os
 import shutil
-from datetime import datetime, timedelta
-from PyQt5.QtWidgets import QMessageBox
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, date as date_type
 import hashlib
 
+# Форматы файлов расписания:
+#   "2.0" - JSON с отступами и ISO-строками времени (schedule_YYYY-MM-DD.json)
+#   "3.0" - заголовок + сжатый компактный JSON со смещениями в минутах (schedule_YYYY-MM-DD.tbs)
+SCHEDULE_FORMAT_VERSION = "3.0"
+SCHEDULE_EXTENSIONS = {"2.0": ".json", "3.0": ".tbs"}
+
+SCHEDULE_MAGIC = b"TBS3"
+# magic, версия формата, флаги, резерв, день (ordinal), saved_at (unix), crc32 тела
+_V3_HEADER = struct.Struct("<4sBBHIqI")
+_V3_FLAG_ZLIB = 0x01
+
+
+# "HH:MM:00" для целых минут суток - быстрый путь восстановления ISO-строк
+_MINUTE_LABELS = [f"{minute // 60:02d}:{minute % 60:02d}:00" for minute in range(24 * 60)]
+
+
+def _minute_offset(value, midnight):
+    """Смещение времени от полуночи дня в минутах (дробное, если есть секунды)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    offset = (value - midnight).total_seconds() / 60
+    return int(offset) if offset == int(offset) else offset
+
+
+def _from_minute_offset(offset, midnight, day_prefix):
+    if offset.__class__ is int and 0 <= offset < 1440:
+        return day_prefix + _MINUTE_LABELS[offset]
+    return (midnight + timedelta(minutes=offset)).isoformat()
+
+
+# Порядок полей блока в строке формата 3.0
+_V3_BLOCK_FIELDS = ("id", "title", "start_time", "end_time", "color",
+                    "notify", "progress", "created_at", "updated_at")
+
+
+def _block_to_row(block, midnight):
+    """Блок в строку формата 3.0"""
+    return [
+        block["id"],
+        block["title"],
+        _minute_offset(block["start_time"], midnight),
+        _minute_offset(block["end_time"], midnight),
+        block.get("color"),
+        1 if block.get("notify", True) else 0,
+        block.get("progress", 0),
+        block.get("created_at"),
+        block.get("updated_at")
+    ]
+
+
+def _row_to_block(row, midnight, day_prefix):
+    """Строка формата 3.0 в словарь блока"""
+    row[2] = _from_minute_offset(row[2], midnight, day_prefix)
+    row[3] = _from_minute_offset(row[3], midnight, day_prefix)
+    row[5] = row[5] == 1
+    return dict(zip(_V3_BLOCK_FIELDS, row))
+
+
+def encode_schedule_v3(data):
+    """Кодирование дня в формат 3.0"""
+    day = date_type.fromisoformat(data["date"])
+    midnight = datetime.combine(day, datetime.min.time())
+    
+    rows = [_block_to_row(block, midnight) for block in data["time_blocks"]]
+    
+    metadata = data.get("metadata", {})
+    payload = json.dumps({
+        "b": rows,
+        "m": [metadata.get("total_blocks", len(rows)),
+              metadata.get("total_minutes", 0),
+              metadata.get("productivity_score", 0)]
+    }, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+    body = zlib.compress(payload, 6)
+    
+    saved_at = datetime.fromisoformat(data["saved_at"]) if data.get("saved_at") else datetime.now()
+    header = _V3_HEADER.pack(SCHEDULE_MAGIC, 3, _V3_FLAG_ZLIB, 0, day.toordinal(),
+                             int(saved_at.timestamp()), zlib.crc32(body))
+    return header + body
+
+
+def decode_schedule_v3(raw):
+    """Декодирование дня из формата 3.0 в словарь формата 2.0"""
+    if len(raw) < _V3_HEADER.size:
+        raise ValueError("Файл расписания поврежден: неполный заголовок")
+    
+    magic, major, flags, _, ordinal, saved_at, crc = _V3_HEADER.unpack_from(raw)
+    if magic != SCHEDULE_MAGIC or major != 3:
+        raise ValueError("Неизвестный формат файла расписания")
+    
+    body = raw[_V3_HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise ValueError("Файл расписания поврежден: неверная контрольная сумма")
+    if flags & _V3_FLAG_ZLIB:
+        body = zlib.decompress(body)
+    payload = json.loads(body)
+    
+    day = date_type.fromordinal(ordinal)
+    midnight = datetime.combine(day, datetime.min.time())
+    day_prefix = day.isoformat() + "T"
+    
+    rows = payload["b"]
+    labels = _MINUTE_LABELS
+    for row in rows:
+        start, end = row[2], row[3]
+        # Быстрый путь: целые минуты в пределах суток
+        if start.__class__ is int and 0 <= start < 1440:
+            row[2] = day_prefix + labels[start]
+        else:
+            row[2] = _from_minute_offset(start, midnight, day_prefix)
+        if end.__class__ is int and 0 <= end < 1440:
+            row[3] = day_prefix + labels[end]
+        else:
+            row[3] = _from_minute_offset(end, midnight, day_prefix)
+        row[5] = row[5] == 1
+    time_blocks = [dict(zip(_V3_BLOCK_FIELDS, row)) for row in rows]
+    
+    total_blocks, total_minutes, productivity_score = payload["m"]
+    return {
+        "version": "3.0",
+        "date": day.isoformat(),
+        "saved_at": datetime.fromtimestamp(saved_at).isoformat(),
+        "time_blocks": time_blocks,
+        "metadata": {
+            "total_blocks": total_blocks,
+            "total_minutes": total_minutes,
+            "productivity_score": productivity_score
+        }
+    }
+
+
+def decode_schedule_v3_intervals(raw):
+    """Быстрое чтение только интервалов блоков (начало, конец) в минутах от полуночи
+    
+    Не восстанавливает ISO-строки и словари блоков - для статистики и экспорта
+    по длинным периодам.
+    """
+    magic, major, flags, _, ordinal, saved_at, crc = _V3_HEADER.unpack_from(raw)
+    if magic != SCHEDULE_MAGIC or major != 3:
+        raise ValueError("Неизвестный формат файла расписания")
+    
+    body = raw[_V3_HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise ValueError("Файл расписания поврежден: неверная контрольная сумма")
+    if flags & _V3_FLAG_ZLIB:
+        body = zlib.decompress(body)
+    return [(row[2], row[3]) for row in json.loads(body)["b"]]
+
+
+# Журнал изменений дня (schedule_YYYY-MM-DD.patches): последовательность записей
+# "длина, crc32" + сжатый JSON патча поверх базового файла дня
+PATCH_LOG_EXTENSION = ".patches"
+_PATCH_RECORD = struct.Struct("<II")
+
+# Поля, изменение которых считается правкой блока (updated_at меняется только при правке)
+_BLOCK_CONTENT_FIELDS = tuple(field for field in _V3_BLOCK_FIELDS if field != "updated_at")
+
+
+def encode_patch_record(patch, day):
+    """Кодирование патча в запись журнала изменений (блоки - строками формата 3.0)"""
+    midnight = datetime.combine(day, datetime.min.time())
+    compact = {"u": [_block_to_row(block, midnight) for block in patch["upsert"]]}
+    if patch["delete"]:
+        compact["d"] = patch["delete"]
+    if "order" in patch:
+        compact["o"] = patch["order"]
+    if "metadata" in patch:
+        metadata = patch["metadata"]
+        compact["m"] = [metadata["total_blocks"], metadata["total_minutes"], metadata["productivity_score"]]
+    if "saved_at" in patch:
+        compact["t"] = int(datetime.fromisoformat(patch["saved_at"]).timestamp())
+    if "base" in patch:
+        compact["b"] = patch["base"]
+    
+    body = zlib.compress(json.dumps(compact, separators=(",", ":"), ensure_ascii=False).encode('utf-8'), 6)
+    return _PATCH_RECORD.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_patch_records(raw, day):
+    """Чтение записей журнала изменений
+    
+    Чтение останавливается на первой неполной или поврежденной записи
+    (например, после сбоя во время дозаписи).
+    
+    Returns:
+        (список патчей, длина корректной части журнала в байтах)
+    """
+    midnight = datetime.combine(day, datetime.min.time())
+    day_prefix = day.isoformat() + "T"
+    
+    patches = []
+    offset = 0
+    while offset + _PATCH_RECORD.size <= len(raw):
+        length, crc = _PATCH_RECORD.unpack_from(raw, offset)
+        start = offset + _PATCH_RECORD.size
+        body = raw[start:start + length]
+        if len(body) != length or zlib.crc32(body) != crc:
+            break
+        compact = json.loads(zlib.decompress(body))
+        patch = {
+            "upsert": [_row_to_block(row, midnight, day_prefix) for row in compact["u"]],
+            "delete": compact.get("d", [])
+        }
+        if "o" in compact:
+            patch["order"] = compact["o"]
+        if "m" in compact:
+            patch["metadata"] = dict(zip(("total_blocks", "total_minutes", "productivity_score"), compact["m"]))
+        if "t" in compact:
+            patch["saved_at"] = datetime.fromtimestamp(compact["t"]).isoformat()
+        if "b" in compact:
+            patch["base"] = compact["b"]
+        patches.append(patch)
+        offset = start + length
+    return patches, offset
+
+
+def diff_schedule(old_blocks, new_blocks):
+    """Структурная разница двух версий дня (блоки сопоставляются по id)
+    
+    Returns:
+        Патч {"upsert": [...], "delete": [...], "order": [...]} или None,
+        если id блоков не уникальны и разницу построить нельзя
+    """
+    old_by_id = {block["id"]: block for block in old_blocks}
+    new_ids = [block["id"] for block in new_blocks]
+    if len(old_by_id) != len(old_blocks) or len(set(new_ids)) != len(new_ids):
+        return None
+    
+    new_id_set = set(new_ids)
+    patch = {
+        "upsert": [block for block in new_blocks if old_by_id.get(block["id"]) != block],
+        "delete": [block["id"] for block in old_blocks if block["id"] not in new_id_set]
+    }
+    
+    # Порядок сохраняется явно, только если он отличается от получаемого при применении патча
+    natural_order = [block["id"] for block in old_blocks if block["id"] in new_id_set]
+    natural_order += [block_id for block_id in new_ids if block_id not in old_by_id]
+    if natural_order != new_ids:
+        patch["order"] = new_ids
+    return patch
+
+
+def is_empty_patch(patch):
+    """Патч без изменений"""
+    return not patch["upsert"] and not patch["delete"] and "order" not in patch
+
+
+def apply_schedule_patch(data, patch):
+    """Применение патча к словарю дня (на месте)"""
+    blocks = {block["id"]: block for block in data["time_blocks"]}
+    deleted = set(patch.get("delete", ()))
+    order = [block_id for block_id in blocks if block_id not in deleted]
+    for block_id in deleted:
+        blocks.pop(block_id, None)
+    
+    for block in patch.get("upsert", ()):
+        if block["id"] not in blocks:
+            order.append(block["id"])
+        blocks[block["id"]] = block
+    
+    if "order" in patch:
+        order = patch["order"]
+    
+    data["time_blocks"] = [blocks[block_id] for block_id in order if block_id in blocks]
+    if "metadata" in patch:
+        data["metadata"] = patch["metadata"]
+    if "saved_at" in patch:
+        data["saved_at"] = patch["saved_at"]
+    return data
+
+
+class DataManagerError(Exception):
+    """Ошибка сохранения или загрузки дня (при raise_errors=True)"""
+
+
+def show_message(level, title, text):
+    """Обработчик сообщений по умолчанию
+    
+    Показывает QMessageBox (level - "warning" или "information"), только если
+    Qt-приложение уже запущено и вызов пришел из главного потока; из фоновых
+    потоков (автосохранение, предзагрузка) сообщение печатается - Qt не
+    разрешает создавать окна вне GUI-потока. Сам модуль PyQt5 не импортирует.
+    """
+    qt_widgets = sys.modules.get("PyQt5.QtWidgets")
+    on_gui_thread = threading.current_thread() is threading.main_thread()
+    # Голое QCoreApplication окон не показывает
+    if (qt_widgets is not None and on_gui_thread
+            and isinstance(qt_widgets.QApplication.instance(), qt_widgets.QApplication)):
+        getattr(qt_widgets.QMessageBox, level)(None, title, text)
+    else:
+        print(f"{title}: {text}")
+
+
+def snapshot_block(block):
+    """Поля блока в виде словаря для записи вне UI-потока
+    
+    Принимает виджет блока или уже готовый снимок; время начала и конца
+    остается datetime.
+    """
+    if isinstance(block, dict):
+        return block
+    return {
+        "id": block.block_id,
+        "title": block.title,
+        "start_time": block.start_time,
+        "end_time": block.end_time,
+        "color": block.color,
+        "notify": block.notify,
+        "progress": getattr(block, 'progress', 0),
+        "created_at": getattr(block, 'created_at', None)
+    }
+
+
+def snapshot_blocks(time_blocks):
+    """Снимки всех блоков дня (вызывается в UI-потоке перед постановкой в очередь)"""
+    return [snapshot_block(block) for block in time_blocks]
+
+
+def _duration_minutes(snapshot):
+    return int((snapshot["end_time"] - snapshot["start_time"]).total_seconds() / 60)
+
+
+def productivity_score_from_data(blocks_data):
+    """Оценка продуктивности дня по сохраненным блокам (ISO-строки времени).
+
+    Единая формула для статистики и сводок: доля от 8 часов запланированного времени
+    """
+    if not blocks_data:
+        return 0
+
+    total_minutes = 0
+    for block in blocks_data:
+        start = datetime.fromisoformat(block["start_time"])
+        end = datetime.fromisoformat(block["end_time"])
+        total_minutes += (end - start).total_seconds() / 60
+
+    return min(100, int((total_minutes / (8 * 60)) * 100))
+
+
 class PremiumDataManager:
     """Менеджер данных премиум-класса с шифрованием и резервными копиями"""
-    def __init__(self):
-        self.data_dir = "time_blocking_premium_data"
+    # Не больше патчей в журнале дня до консолидации в базовый файл
+    MAX_PATCHES_PER_DAY = 20
+    # Патч пишется, если правка затрагивает не больше этой доли блоков дня
+    MAX_PATCH_SHARE = 0.25
+    # Сколько последних сохраненных версий дней держать в памяти
+    SAVED_STATES_LIMIT = 31
+    
+    def __init__(self, data_dir="time_blocking_premium_data",
+                 format_version=SCHEDULE_FORMAT_VERSION, on_message=None, raise_errors=False):
+        """
+        Args:
+            data_dir: Каталог файлов дней
+            format_version: Формат записи файлов дней
+            on_message: Обработчик сообщений on_message(level, title, text),
+                по умолчанию show_message
+            raise_errors: save_day и load_day выбрасывают DataManagerError вместо
+                сообщений пользователю (пакетные задачи без интерфейса)
+        """
+        if format_version not in SCHEDULE_EXTENSIONS:
+            raise ValueError(f"Unsupported schedule format: {format_version}")
+        self.data_dir = data_dir
         self.backup_dir = os.path.join(self.data_dir, "backups")
+        self.format_version = format_version
+        self.on_message = on_message or show_message
+        self.raise_errors = raise_errors
         self.ensure_directories()
         self.encryption_key = self.generate_encryption_key()
+        self._save_listeners = []
+        # Защищает файлы дней от одновременной записи приложением и мигратором
+        self._io_lock = threading.RLock()
+        # Последние сохраненные версии дней - основа для структурной разницы
+        self._saved_states = OrderedDict()
+    
+    def add_save_listener(self, callback):
+        """Подписка на сохранение дня: callback(date, time_blocks_data, metadata)"""
+        if callback not in self._save_listeners:
+            self._save_listeners.append(callback)
+    
+    def remove_save_listener(self, callback):
+        """Отписка от сохранения дня"""
+        if callback in self._save_listeners:
+            self._save_listeners.remove(callback)
+    
+    def _notify_saved(self, date, data):
+        """Оповещение подписчиков о сохраненном дне"""
+        for callback in list(self._save_listeners):
+            try:
+                callback(date, data["time_blocks"], data["metadata"])
+            except Exception as e:
+                print(f"Ошибка обработчика сохранения дня: {e}")
     
     def ensure_directories(self):
         """Создание необходимых директорий"""
@@ -27,53 +415,190 @@ class PremiumDataManager:
     def save_day(self, time_blocks, date=None, create_backup=True):
         """Сохранение дня с созданием резервной копии"""
         try:
-            if date is None:
-                date = datetime.now().date()
-            
-            filename = os.path.join(self.data_dir, f"schedule_{date.strftime('%Y-%m-%d')}.json")
-            
-            # Создание резервной копии если файл существует
-            if create_backup and os.path.exists(filename):
-                self.create_backup(filename, date)
-            
-            data = {
-                "version": "2.0",
-                "date": date.isoformat(),
-                "saved_at": datetime.now().isoformat(),
-                "time_blocks": [],
-                "metadata": {
-                    "total_blocks": len(time_blocks),
-                    "total_minutes": sum(block.get_duration_minutes() for block in time_blocks),
-                    "productivity_score": self.calculate_productivity_score(time_blocks)
-                }
+            return self.write_day(time_blocks, date, create_backup)
+        except Exception as e:
+            self._report_error("Ошибка сохранения", f"Не удалось сохранить данные: {str(e)}", e)
+            return False
+    
+    def _report_error(self, title, text, error):
+        """Ошибка сохранения или загрузки: исключение или сообщение пользователю"""
+        if self.raise_errors:
+            raise DataManagerError(text) from error
+        self.on_message("warning", title, text)
+    
+    def write_day(self, time_blocks, date=None, create_backup=True):
+        """Запись дня на диск без обработки ошибок (безопасно вне UI-потока)
+        
+        Небольшие правки дописываются патчем в журнал изменений дня,
+        крупные - и каждый MAX_PATCHES_PER_DAY патч - переписывают базовый файл.
+        """
+        if date is None:
+            date = datetime.now().date()
+        
+        # Блоки могут быть виджетами (сохранение из UI) или снимками (автосохранение)
+        time_blocks = snapshot_blocks(time_blocks)
+        now = datetime.now().isoformat()
+        data = {
+            "version": self.format_version,
+            "date": date.isoformat(),
+            "saved_at": now,
+            "time_blocks": [],
+            "metadata": {
+                "total_blocks": len(time_blocks),
+                "total_minutes": sum(_duration_minutes(block) for block in time_blocks),
+                "productivity_score": self.calculate_productivity_score(time_blocks)
             }
+        }
+        
+        with self._io_lock:
+            state = self._load_saved_state(date)
+            previous_blocks = {}
+            if state is not None:
+                previous_blocks = {block["id"]: block for block in state["data"]["time_blocks"]}
             
             for block in time_blocks:
+                previous = previous_blocks.get(block["id"])
                 block_data = {
-                    "id": block.block_id,
-                    "title": block.title,
-                    "start_time": block.start_time.isoformat(),
-                    "end_time": block.end_time.isoformat(),
-                    "color": block.color,
-                    "notify": block.notify,
-                    "progress": getattr(block, 'progress', 0),
-                    "created_at": getattr(block, 'created_at', datetime.now().isoformat()),
-                    "updated_at": datetime.now().isoformat()
+                    "id": block["id"],
+                    "title": block["title"],
+                    "start_time": block["start_time"].isoformat(),
+                    "end_time": block["end_time"].isoformat(),
+                    "color": block["color"],
+                    "notify": block["notify"],
+                    "progress": block.get("progress", 0),
+                    "created_at": block.get("created_at")
+                                  or (previous or {}).get("created_at") or now,
+                    "updated_at": now
                 }
+                # Неизмененный блок сохраняет прежнее время обновления и не попадает в патч
+                if previous is not None and all(previous.get(field) == block_data[field]
+                                                for field in _BLOCK_CONTENT_FIELDS):
+                    block_data["updated_at"] = previous.get("updated_at") or now
                 data["time_blocks"].append(block_data)
             
-            # "Шифрование" данных (в реальном приложении используйте настоящие методы)
-            encrypted_data = self.simple_encrypt(json.dumps(data, indent=2, ensure_ascii=False))
+            filename = self.get_day_filename(date)
+            patch = None
+            if state is not None and state["base_file"] == filename:
+                patch = diff_schedule(state["data"]["time_blocks"], data["time_blocks"])
             
-            with open(filename, 'wb') as f:
-                f.write(encrypted_data)
+            if patch is not None and is_empty_patch(patch):
+                # Ничего не изменилось - файл не трогаем
+                return True
             
-            return True
+            if patch is not None and self._fits_patch_log(state, patch):
+                state = self._append_patch(date, state, patch, data, create_backup)
+            else:
+                state = self._write_base(date, state, data, create_backup)
             
-        except Exception as e:
-            QMessageBox.warning(None, "Ошибка сохранения", 
-                              f"Не удалось сохранить данные: {str(e)}")
+            self._saved_states[date] = state
+            self._saved_states.move_to_end(date)
+            while len(self._saved_states) > self.SAVED_STATES_LIMIT:
+                self._saved_states.popitem(last=False)
+        
+        self._notify_saved(date, data)
+        return True
+    
+    def _fits_patch_log(self, state, patch):
+        """Можно ли записать правку патчем, не консолидируя журнал"""
+        if state["patch_count"] >= self.MAX_PATCHES_PER_DAY:
+            return False
+        # Журнал, переросший базовый файл, дешевле переписать целиком
+        if state["patch_bytes"] >= state["base_bytes"]:
             return False
+        changes = len(patch["upsert"]) + len(patch["delete"])
+        return changes <= max(1, int(len(state["data"]["time_blocks"]) * self.MAX_PATCH_SHARE))
+    
+    def _append_patch(self, date, state, patch, data, create_backup):
+        """Дозапись патча в журнал изменений дня"""
+        patch["base"] = state["base_crc"]
+        patch["saved_at"] = data["saved_at"]
+        patch["metadata"] = data["metadata"]
+        record = encode_patch_record(patch, date)
+        
+        if create_backup:
+            # Полная копия делается один раз на цикл журнала, дальше копируются только патчи
+            if not state["base_backed_up"]:
+                self.create_state_backup(state["data"], date)
+            self.create_patch_backup(record, date)
+        
+        with open(self.get_patch_log_filename(date), 'ab') as f:
+            f.write(record)
+        
+        return dict(state, data=data, patch_count=state["patch_count"] + 1,
+                    patch_bytes=state["patch_bytes"] + len(record),
+                    base_backed_up=state["base_backed_up"] or create_backup)
+    
+    def _write_base(self, date, state, data, create_backup):
+        """Полная запись базового файла дня с консолидацией журнала изменений"""
+        existing = self.find_day_file(date)
+        
+        # Создание резервной копии если файл существует; если текущий цикл журнала
+        # уже в копиях (полная копия + патчи), прежняя версия восстанавливается из них
+        if create_backup and existing:
+            if state is None:
+                self.create_backup(existing, date)
+            elif not state["base_backed_up"]:
+                self.create_state_backup(state["data"], date)
+        
+        filename = self.get_day_filename(date)
+        payload = self.encode_day(data)
+        self.atomic_write(filename, payload)
+        
+        # Патчи старого журнала привязаны к прежнему базовому файлу и больше не применяются
+        patch_log = self.get_patch_log_filename(date)
+        if os.path.exists(patch_log):
+            os.remove(patch_log)
+        
+        # День мог храниться в старом формате - удаляем устаревшую копию
+        if existing and existing != filename:
+            os.remove(existing)
+        
+        return {
+            "data": data,
+            "base_file": filename,
+            "base_crc": zlib.crc32(payload),
+            "base_bytes": len(payload),
+            "patch_count": 0,
+            "patch_bytes": 0,
+            "base_backed_up": False
+        }
+    
+    def _load_saved_state(self, date):
+        """Последняя сохраненная версия дня (из памяти или с диска)"""
+        state = self._saved_states.get(date)
+        if state is not None:
+            self._saved_states.move_to_end(date)
+            return state
+        
+        filename = self.find_day_file(date)
+        if filename is None:
+            return None
+        
+        try:
+            with open(filename, 'rb') as f:
+                raw_data = f.read()
+            data = self.decode_day(raw_data)
+            if not self.validate_data(data):
+                return None
+            base_crc = zlib.crc32(raw_data)
+            patches, patch_bytes = self.read_patch_log(date, base_crc)
+        except Exception as e:
+            # Поврежденный файл будет перезаписан целиком
+            print(f"Ошибка чтения сохраненной версии дня: {e}")
+            return None
+        
+        for patch in patches:
+            apply_schedule_patch(data, patch)
+        
+        return {
+            "data": data,
+            "base_file": filename,
+            "base_crc": base_crc,
+            "base_bytes": len(raw_data),
+            "patch_count": len(patches),
+            "patch_bytes": patch_bytes,
+            "base_backed_up": False
+        }
     
     def load_day(self, date=None):
         """Загрузка дня с проверкой целостности"""
@@ -81,29 +606,200 @@ class PremiumDataManager:
             if date is None:
                 date = datetime.now().date()
             
-            filename = os.path.join(self.data_dir, f"schedule_{date.strftime('%Y-%m-%d')}.json")
+            return self.read_day(date)
             
+        except DataManagerError:
+            # Файл не прошел проверку целостности: попытка загрузки из резервной копии
+            return self.restore_from_backup(date)
+        except Exception as e:
+            self._report_error("Ошибка загрузки", f"Не удалось загрузить данные: {str(e)}", e)
+            return self.restore_from_backup(date) or []
+    
+    def read_day(self, date):
+        """Чтение дня без обработки ошибок и сообщений (безопасно вне UI-потока)
+        
+        Raises:
+            DataManagerError: файл дня не прошел проверку целостности
+        """
+        filename = self.find_day_file(date)
+        
+        if filename is None:
+            return []
+        
+        with open(filename, 'rb') as f:
+            raw_data = f.read()
+        
+        # Формат определяется по содержимому файла
+        data = self.decode_day(raw_data)
+        
+        # Проверка версии и целостности
+        if not self.validate_data(data):
+            raise DataManagerError(f"Файл дня не прошел проверку целостности: {filename}")
+        
+        # Правки, дописанные после последней консолидации
+        patches, _ = self.read_patch_log(date, zlib.crc32(raw_data))
+        for patch in patches:
+            apply_schedule_patch(data, patch)
+        
+        return data["time_blocks"]
+    
+    def load_day_intervals(self, date):
+        """Интервалы блоков дня в минутах от полуночи (без полного декодирования)"""
+        filename = self.find_day_file(date)
+        if filename is None:
+            return []
+        
+        with open(filename, 'rb') as f:
+            raw_data = f.read()
+        
+        has_patches = os.path.exists(self.get_patch_log_filename(date))
+        if not has_patches and raw_data[:len(SCHEDULE_MAGIC)] == SCHEDULE_MAGIC:
+            return decode_schedule_v3_intervals(raw_data)
+        
+        # Старый формат или день с журналом изменений: вычисляем смещения из ISO-строк
+        data = self.decode_day(raw_data)
+        if not self.validate_data(data):
+            return []
+        if has_patches:
+            patches, _ = self.read_patch_log(date, zlib.crc32(raw_data))
+            for patch in patches:
+                apply_schedule_patch(data, patch)
+        midnight = datetime.combine(date, datetime.min.time())
+        return [(_minute_offset(block["start_time"], midnight),
+                 _minute_offset(block["end_time"], midnight))
+                for block in data["time_blocks"]]
+    
+    def get_day_filename(self, date, format_version=None):
+        """Путь к файлу дня в заданном формате (по умолчанию - в текущем)"""
+        extension = SCHEDULE_EXTENSIONS[format_version or self.format_version]
+        return os.path.join(self.data_dir, f"schedule_{date.strftime('%Y-%m-%d')}{extension}")
+    
+    def get_patch_log_filename(self, date):
+        """Путь к журналу изменений дня"""
+        return os.path.join(self.data_dir, f"schedule_{date.strftime('%Y-%m-%d')}{PATCH_LOG_EXTENSION}")
+    
+    def read_patch_log(self, date, base_crc):
+        """Патчи журнала изменений, относящиеся к базовому файлу с контрольной суммой base_crc
+        
+        Оборванная при сбое запись в конце журнала отрезается.
+        
+        Returns:
+            (список патчей, размер корректной части журнала в байтах)
+        """
+        filename = self.get_patch_log_filename(date)
+        with self._io_lock:
             if not os.path.exists(filename):
-                return []
+                return [], 0
             
             with open(filename, 'rb') as f:
-                encrypted_data = f.read()
+                raw_data = f.read()
+            
+            patches, valid_length = decode_patch_records(raw_data, date)
+            if valid_length < len(raw_data):
+                with open(filename, 'r+b') as f:
+                    f.truncate(valid_length)
+        
+        # Журнал от другого базового файла (сбой между записью базы и удалением журнала)
+        if any(patch.get("base") != base_crc for patch in patches):
+            return [], valid_length
+        return patches, valid_length
+    
+    def find_day_file(self, date):
+        """Поиск существующего файла дня (новый формат имеет приоритет)"""
+        for version in sorted(SCHEDULE_EXTENSIONS, reverse=True):
+            filename = self.get_day_filename(date, version)
+            if os.path.exists(filename):
+                return filename
+        return None
+    
+    def encode_day(self, data):
+        """Кодирование дня в текущем формате"""
+        if self.format_version == "3.0":
+            return encode_schedule_v3(data)
+        # "Шифрование" данных (в реальном приложении используйте настоящие методы)
+        return self.simple_encrypt(json.dumps(data, indent=2, ensure_ascii=False))
+    
+    def decode_day(self, raw_data):
+        """Декодирование дня любого поддерживаемого формата"""
+        if raw_data[:len(SCHEDULE_MAGIC)] == SCHEDULE_MAGIC:
+            return decode_schedule_v3(raw_data)
+        # "Расшифровка" данных
+        return json.loads(self.simple_decrypt(raw_data))
+    
+    def atomic_write(self, filename, payload):
+        """Запись через временный файл, чтобы сбой не оставил файл дня обрезанным"""
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_filename, filename)
+    
+    def migrate_day_file(self, filename):
+        """Перевод файла дня в текущий формат
+        
+        Returns:
+            True если файл был сконвертирован
+        """
+        with self._io_lock:
+            if not os.path.exists(filename):
+                return False
             
-            # "Расшифровка" данных
-            decrypted_data = self.simple_decrypt(encrypted_data)
-            data = json.loads(decrypted_data)
+            with open(filename, 'rb') as f:
+                raw_data = f.read()
             
-            # Проверка версии и целостности
+            data = self.decode_day(raw_data)
             if not self.validate_data(data):
-                # Попытка загрузки из резервной копии
-                return self.restore_from_backup(date)
+                return False
             
-            return data["time_blocks"]
+            date = date_type.fromisoformat(data["date"])
+            target = self.get_day_filename(date)
+            if target == filename:
+                return False
             
-        except Exception as e:
-            QMessageBox.warning(None, "Ошибка загрузки", 
-                              f"Не удалось загрузить данные: {str(e)}")
-            return self.restore_from_backup(date) or []
+            # Новый файл уже записан приложением - старая копия устарела
+            if os.path.exists(target):
+                os.remove(filename)
+                return False
+            
+            # Журнал изменений привязан к старому файлу - переносим правки в новый
+            patches, _ = self.read_patch_log(date, zlib.crc32(raw_data))
+            for patch in patches:
+                apply_schedule_patch(data, patch)
+            
+            data["version"] = self.format_version
+            payload = self.encode_day(data)
+            
+            # Проверяем, что сконвертированные данные читаются без потерь блоков
+            if len(self.decode_day(payload)["time_blocks"]) != len(data["time_blocks"]):
+                raise ValueError(f"Проверка миграции не пройдена: {filename}")
+            
+            self.atomic_write(target, payload)
+            os.remove(filename)
+            patch_log = self.get_patch_log_filename(date)
+            if os.path.exists(patch_log):
+                os.remove(patch_log)
+            self._saved_states.pop(date, None)
+            return True
+    
+    def find_legacy_day_files(self):
+        """Файлы дней, сохраненные не в текущем формате"""
+        legacy_extensions = tuple(extension for version, extension in SCHEDULE_EXTENSIONS.items()
+                                  if version != self.format_version)
+        legacy = []
+        for file in sorted(os.listdir(self.data_dir)):
+            if file.startswith("schedule_") and file.endswith(legacy_extensions):
+                legacy.append(os.path.join(self.data_dir, file))
+        return legacy
+    
+    def saved_days(self):
+        """Даты всех сохраненных дней (в любом формате)"""
+        days = set()
+        for file in os.listdir(self.data_dir):
+            if file.startswith("schedule_"):
+                try:
+                    days.add(datetime.strptime(file[len("schedule_"):len("schedule_YYYY-MM-DD")], "%Y-%m-%d").date())
+                except ValueError:
+                    continue
+        return sorted(days)
     
     def simple_encrypt(self, data):
         """Упрощенное "шифрование" (для демонстрации)"""
@@ -118,12 +814,16 @@ class PremiumDataManager:
         required_fields = ["version", "date", "time_blocks"]
         return all(field in data for field in required_fields)
     
+    def _backup_path(self, date, extension):
+        """Путь к новой резервной копии дня"""
+        backup_name = f"backup_{date.strftime('%Y-%m-%d')}_{datetime.now().strftime('%H-%M-%S-%f')}{extension}"
+        return os.path.join(self.backup_dir, backup_name)
+    
     def create_backup(self, original_file, date):
         """Создание резервной копии"""
         try:
-            backup_name = f"backup_{date.strftime('%Y-%m-%d')}_{datetime.now().strftime('%H-%M-%S')}.json"
-            backup_path = os.path.join(self.backup_dir, backup_name)
-            shutil.copy2(original_file, backup_path)
+            extension = os.path.splitext(original_file)[1]
+            shutil.copy2(original_file, self._backup_path(date, extension))
             
             # Ограничение количества резервных копий (максимум 10)
             self.cleanup_old_backups(date)
@@ -131,50 +831,81 @@ class PremiumDataManager:
         except Exception as e:
             print(f"Ошибка создания резервной копии: {e}")
     
+    def create_state_backup(self, data, date):
+        """Полная резервная копия версии дня, собранной из базового файла и патчей"""
+        try:
+            with open(self._backup_path(date, SCHEDULE_EXTENSIONS[self.format_version]), 'wb') as f:
+                f.write(self.encode_day(data))
+            self.cleanup_old_backups(date)
+        except Exception as e:
+            print(f"Ошибка создания резервной копии: {e}")
+    
+    def create_patch_backup(self, record, date):
+        """Резервная копия одной правки (запись журнала изменений)"""
+        try:
+            with open(self._backup_path(date, PATCH_LOG_EXTENSION), 'wb') as f:
+                f.write(record)
+        except Exception as e:
+            print(f"Ошибка создания резервной копии: {e}")
+    
+    def _list_backups(self, date):
+        """Полные копии и копии патчей дня: списки (путь, время создания)"""
+        full_backups, patch_backups = [], []
+        for file in os.listdir(self.backup_dir):
+            if file.startswith(f"backup_{date.strftime('%Y-%m-%d')}"):
+                file_path = os.path.join(self.backup_dir, file)
+                target = patch_backups if file.endswith(PATCH_LOG_EXTENSION) else full_backups
+                target.append((file_path, os.path.getctime(file_path)))
+        return full_backups, patch_backups
+    
     def cleanup_old_backups(self, date):
         """Очистка старых резервных копий"""
         try:
-            backup_pattern = f"backup_{date.strftime('%Y-%m-%d')}_*.json"
-            backups = []
-            
-            for file in os.listdir(self.backup_dir):
-                if file.startswith(f"backup_{date.strftime('%Y-%m-%d')}"):
-                    file_path = os.path.join(self.backup_dir, file)
-                    backups.append((file_path, os.path.getctime(file_path)))
+            full_backups, patch_backups = self._list_backups(date)
             
             # Сортируем по дате создания (новые сначала)
-            backups.sort(key=lambda x: x[1], reverse=True)
+            full_backups.sort(key=lambda x: x[1], reverse=True)
             
             # Удаляем старые копии (оставляем 10 последних)
-            for backup_path, _ in backups[10:]:
+            for backup_path, _ in full_backups[10:]:
                 os.remove(backup_path)
+            
+            # Патчи старше самой ранней оставшейся полной копии применить не к чему
+            if full_backups:
+                oldest_kept = full_backups[:10][-1][1]
+                for backup_path, created in patch_backups:
+                    if created < oldest_kept:
+                        os.remove(backup_path)
                 
         except Exception as e:
             print(f"Ошибка очистки резервных копий: {e}")
     
     def restore_from_backup(self, date):
-        """Восстановление из резервной копии"""
+        """Восстановление из резервной копии: последняя полная копия + более поздние патчи"""
         try:
-            backups = []
-            for file in os.listdir(self.backup_dir):
-                if file.startswith(f"backup_{date.strftime('%Y-%m-%d')}"):
-                    file_path = os.path.join(self.backup_dir, file)
-                    backups.append((file_path, os.path.getctime(file_path)))
+            full_backups, patch_backups = self._list_backups(date)
             
-            if not backups:
+            if not full_backups:
                 return None
             
-            # Берем самую свежую резервную копию
-            latest_backup = max(backups, key=lambda x: x[1])[0]
+            # Берем самую свежую полную резервную копию
+            latest_backup, latest_created = max(full_backups, key=lambda x: x[1])
             
             with open(latest_backup, 'rb') as f:
-                encrypted_data = f.read()
+                raw_data = f.read()
+            
+            data = self.decode_day(raw_data)
             
-            decrypted_data = self.simple_decrypt(encrypted_data)
-            data = json.loads(decrypted_data)
+            for backup_path, created in sorted(patch_backups, key=lambda x: x[1]):
+                if created <= latest_created:
+                    continue
+                with open(backup_path, 'rb') as f:
+                    patches, _ = decode_patch_records(f.read(), date)
+                for patch in patches:
+                    apply_schedule_patch(data, patch)
             
-            QMessageBox.information(None, "Восстановление", 
-                                  "Данные восстановлены из резервной копии")
+            self.on_message("information", "Восстановление",
+                            "Данные восстановлены из резервной копии")
             
             return data["time_blocks"]
             
@@ -187,13 +918,14 @@ class PremiumDataManager:
         if not time_blocks:
             return 0
         
-        total_minutes = sum(block.get_duration_minutes() for block in time_blocks)
+        time_blocks = snapshot_blocks(time_blocks)
+        total_minutes = sum(_duration_minutes(block) for block in time_blocks)
         # Максимальная продуктивность - 8 часов работы
         max_productivity = 8 * 60
         score = min(100, int((total_minutes / max_productivity) * 100))
         
         # Бонус за разнообразие задач
-        unique_tasks = len(set(block.title for block in time_blocks))
+        unique_tasks = len(set(block["title"] for block in time_blocks))
         diversity_bonus = min(20, unique_tasks * 2)
         
         return min(100, score + diversity_bonus)
@@ -214,17 +946,19 @@ class PremiumDataManager:
         daily_stats = []
         
         while current_date <= end_date:
-            blocks = self.load_day(current_date)
-            if blocks:
-                total_minutes = sum((datetime.fromisoformat(block["end_time"]) - 
-                                   datetime.fromisoformat(block["start_time"])).total_seconds() / 60 
-                                   for block in blocks)
+            try:
+                intervals = self.load_day_intervals(current_date)
+            except Exception as e:
+                print(f"Ошибка чтения дня {current_date}: {e}")
+                intervals = []
+            if intervals:
+                total_minutes = sum(end - start for start, end in intervals)
                 
                 day_stat = {
                     "date": current_date,
-                    "blocks": len(blocks),
+                    "blocks": len(intervals),
                     "hours": total_minutes / 60,
-                    "productivity": self.calculate_productivity_score_from_data(blocks)
+                    "productivity": min(100, int((total_minutes / (8 * 60)) * 100))
                 }
                 daily_stats.append(day_stat)
             
@@ -243,16 +977,7 @@ class PremiumDataManager:
     
     def calculate_productivity_score_from_data(self, blocks_data):
         """Расчет продуктивности из данных блоков"""
-        if not blocks_data:
-            return 0
-        
-        total_minutes = 0
-        for block in blocks_data:
-            start = datetime.fromisoformat(block["start_time"])
-            end = datetime.fromisoformat(block["end_time"])
-            total_minutes += (end - start).total_seconds() / 60
-        
-        return min(100, int((total_minutes / (8 * 60)) * 100))
+        return productivity_score_from_data(blocks_data)
     
     def export_data(self, start_date, end_date, format='json'):
         """Экспорт данных в различных форматах"""
@@ -301,4 +1026,239 @@ class PremiumDataManager:
                     f'{date},{start_time},{end_time},"{block["title"]}",{block["color"]},{duration}'
                 )
         
-        return "\n".join(csv_lines)
\ No newline at end of file
+        return "\n".join(csv_lines)
+
+
+class AutoSaveService:
+    """Автосохранение дней с отслеживанием изменений и отложенной записью
+    
+    Правки только помечают день как измененный. Запись выполняется фоновым
+    потоком, когда после последней правки прошло debounce_seconds (но не
+    позже max_delay_seconds после первой), поэтому серия правок при
+    перетаскивании дает одну запись и одну резервную копию.
+    """
+    
+    def __init__(self, data_manager, debounce_seconds=2.0, max_delay_seconds=30.0,
+                 create_backup=True):
+        self.data_manager = data_manager
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.create_backup = create_backup
+        
+        self._dirty = {}  # date -> {"blocks", "first_edit", "due"}
+        self._condition = threading.Condition()
+        # Сериализует записи: фоновый поток и flush() не пишут один день одновременно
+        self._write_lock = threading.Lock()
+        self._worker = None
+        self._running = False
+        
+        # Статистика
+        self.saves = 0
+        self.coalesced_edits = 0
+        self.failures = 0
+    
+    def mark_dirty(self, date, time_blocks):
+        """Пометить день как измененный (дешево, можно вызывать на каждую правку)"""
+        now = time.monotonic()
+        with self._condition:
+            entry = self._dirty.get(date)
+            if entry is None:
+                entry = {"first_edit": now}
+                self._dirty[date] = entry
+            else:
+                self.coalesced_edits += 1
+            
+            entry["blocks"] = list(time_blocks)
+            entry["due"] = min(now + self.debounce_seconds,
+                               entry["first_edit"] + self.max_delay_seconds)
+            
+            self._ensure_worker()
+            self._condition.notify()
+    
+    def discard(self, date):
+        """Отказ от несохраненных изменений дня (пользователь не стал его сохранять)
+        
+        Returns:
+            Были ли у дня несохраненные изменения
+        """
+        with self._condition:
+            return self._dirty.pop(date, None) is not None
+    
+    def is_dirty(self, date=None):
+        """Есть ли несохраненные изменения (для дня или вообще)"""
+        with self._condition:
+            if date is None:
+                return bool(self._dirty)
+            return date in self._dirty
+    
+    def flush(self, date=None):
+        """Немедленная запись несохраненных дней в текущем потоке
+        
+        Returns:
+            Количество записанных дней
+        """
+        with self._write_lock:
+            with self._condition:
+                if date is None:
+                    pending = list(self._dirty.items())
+                    self._dirty.clear()
+                elif date in self._dirty:
+                    pending = [(date, self._dirty.pop(date))]
+                else:
+                    pending = []
+            
+            return self._write_pending(pending)
+    
+    def stop(self, flush=True):
+        """Остановка фонового потока (с финальной записью по умолчанию)"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        
+        worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout=5)
+        self._worker = None
+        
+        if flush:
+            self.flush()
+    
+    def get_stats(self):
+        """Статистика автосохранения"""
+        with self._condition:
+            pending = len(self._dirty)
+        return {
+            "pending_days": pending,
+            "saves": self.saves,
+            "coalesced_edits": self.coalesced_edits,
+            "failures": self.failures
+        }
+    
+    def _ensure_worker(self):
+        """Ленивый запуск фонового потока (вызывается под self._condition)"""
+        if self._running and self._worker is not None:
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="AutoSaveService", daemon=True)
+        self._worker.start()
+    
+    def _run(self):
+        """Основной цикл фонового потока"""
+        while True:
+            with self._condition:
+                while self._running:
+                    if self._dirty:
+                        next_due = min(entry["due"] for entry in self._dirty.values())
+                        timeout = next_due - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        self._condition.wait(timeout)
+                    else:
+                        self._condition.wait()
+                
+                if not self._running:
+                    return
+            
+            with self._write_lock:
+                now = time.monotonic()
+                with self._condition:
+                    due_dates = [d for d, entry in self._dirty.items() if entry["due"] <= now]
+                    pending = [(d, self._dirty.pop(d)) for d in due_dates]
+                
+                self._write_pending(pending)
+    
+    def _write_pending(self, pending):
+        """Запись снимков дней (вызывается под self._write_lock)"""
+        written = 0
+        for date, entry in pending:
+            try:
+                self.data_manager.write_day(entry["blocks"], date, self.create_backup)
+                self.saves += 1
+                written += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"Ошибка автосохранения дня {date}: {e}")
+                # Повторная попытка позже, если день не был изменен заново
+                with self._condition:
+                    if date not in self._dirty:
+                        entry["due"] = time.monotonic() + self.max_delay_seconds
+                        self._dirty[date] = entry
+        return written
+
+
+class ScheduleMigrator:
+    """Фоновая конвертация файлов дней в текущий формат
+    
+    Работает по одному файлу с паузами, чтобы не мешать интерактивной
+    работе; запись дней приложением и миграция сериализуются блокировкой
+    менеджера данных.
+    """
+    
+    def __init__(self, data_manager, pause_seconds=0.05):
+        self.data_manager = data_manager
+        self.pause_seconds = pause_seconds
+        self._stop_event = threading.Event()
+        self._worker = None
+        
+        # Статистика
+        self.migrated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+    
+    def start(self):
+        """Запуск миграции в фоновом потоке"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self.run, name="ScheduleMigrator", daemon=True)
+        self._worker.start()
+    
+    def stop(self, timeout=5):
+        """Прерывание миграции (текущий файл дописывается)"""
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+    
+    def wait(self, timeout=None):
+        """Ожидание завершения миграции"""
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+        return not self.is_running()
+    
+    def is_running(self):
+        return self._worker is not None and self._worker.is_alive()
+    
+    def run(self):
+        """Конвертация всех файлов старого формата"""
+        for filename in self.data_manager.find_legacy_day_files():
+            if self._stop_event.is_set():
+                break
+            
+            try:
+                size_before = os.path.getsize(filename)
+                if self.data_manager.migrate_day_file(filename):
+                    self.migrated += 1
+                    self.bytes_before += size_before
+                    date_part = os.path.basename(filename)[len("schedule_"):].split(".")[0]
+                    target = self.data_manager.get_day_filename(date_type.fromisoformat(date_part))
+                    self.bytes_after += os.path.getsize(target)
+                else:
+                    self.skipped += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Ошибка миграции файла {filename}: {e}")
+            
+            self._stop_event.wait(self.pause_seconds)
+    
+    def get_stats(self):
+        """Статистика миграции"""
+        return {
+            "running": self.is_running(),
+            "migrated": self.migrated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after
+        }
@@ -2,9 +2,11 @@
 
 import random
 from datetime import datetime, timedelta
-from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QLabel
 
+from frame_scheduler import get_frame_scheduler
+from task_manager import get_task_manager
+
 class DynamicInterfaceManager:
     """Менеджер для динамического обновления всех элементов интерфейса"""
     
@@ -15,27 +17,33 @@ class DynamicInterfaceManager:
         self.setup_dynamic_timers()
     
     def setup_dynamic_timers(self):
-        """Настройка таймеров для разных элементов"""
+        """Регистрация обновлений в общем планировщике кадров"""
+        scheduler = getattr(self.app, 'frame_scheduler', None) or get_frame_scheduler()
         
-        # Таймер для времени (каждую секунду)
-        self.time_timer = QTimer()
-        self.time_timer.timeout.connect(self.update_time_elements)
-        self.time_timer.start(1000)
+        # Заголовок окна с текущим временем (карточку времени обновляет само приложение)
+        scheduler.register("window_title", self.update_time_elements, 1000,
+                           inputs=lambda: datetime.now().strftime("%H:%M:%S"))
         
-        # Таймер для статистики (каждые 5 секунд)
-        self.stats_timer = QTimer()
-        self.stats_timer.timeout.connect(self.update_stats_elements)
-        self.stats_timer.start(5000)
+        # Статистика dashboard: при изменении задач и раз в 5 секунд, пока вкладка открыта
+        scheduler.register("dashboard_stats", self.update_stats_elements, 5000,
+                           inputs=self.get_task_counts, active=self.is_dashboard_active)
+        get_task_manager().add_change_listener(
+            lambda action, task, dates: scheduler.mark_dirty("dashboard_stats"))
         
-        # Таймер для мотивационных сообщений (каждые 30 секунд)
-        self.motivation_timer = QTimer()
-        self.motivation_timer.timeout.connect(self.update_motivation_elements)
-        self.motivation_timer.start(30000)
+        # Мотивационные сообщения (каждые 30 секунд)
+        scheduler.register("motivation", self.update_motivation_elements, 30000)
         
-        # Таймер для анимаций (каждые 2 секунды)
-        self.animation_timer = QTimer()
-        self.animation_timer.timeout.connect(self.update_animations)
-        self.animation_timer.start(2000)
+        # Пульсация и прогресс-бары анимируются через CSS, отдельный таймер не нужен
+    
+    def is_dashboard_active(self):
+        """Открыта ли вкладка dashboard"""
+        current_tab = self.app.tabs.currentWidget()
+        return hasattr(current_tab, 'objectName') and current_tab.objectName() == "dashboard_tab"
+    
+    def get_task_counts(self):
+        """Входные данные статистики dashboard: всего и выполнено задач сегодня"""
+        task_manager = get_task_manager()
+        return len(task_manager.get_tasks_for_today()), len(task_manager.get_completed_tasks_today())
     
     def register_dynamic_element(self, element_id, element, update_type="stats"):
         """Регистрация элемента для динамического обновления"""
@@ -48,10 +56,6 @@ class DynamicInterfaceManager:
     def update_time_elements(self):
         """Обновление всех элементов времени"""
         try:
-            # Обновляем основную карточку времени
-            if hasattr(self.app, 'time_card') and self.app.time_card:
-                self.app.update_time_display()
-            
             # Обновляем заголовок окна с текущим временем
             current_time = datetime.now().strftime("%H:%M:%S")
             self.app.setWindowTitle(f"⏰ Time Blocking v5.0 - {current_time}")
@@ -65,10 +69,8 @@ class DynamicInterfaceManager:
             # Обновляем счетчики
             self.update_counters['stats_updates'] = self.update_counters.get('stats_updates', 0) + 1
             
-            # Если активна вкладка dashboard, обновляем статистику
-            current_tab = self.app.tabs.currentWidget()
-            if hasattr(current_tab, 'objectName') and current_tab.objectName() == "dashboard_tab":
-                self.refresh_dashboard_stats()
+            # Вкладку dashboard проверяет планировщик
+            self.refresh_dashboard_stats()
                 
         except Exception as e:
             print(f"Ошибка обновления статистики: {e}")
@@ -0,0 +1,283 @@
+"""
+🎞️ Единый планировщик обновлений интерфейса
+Вместо отдельного QTimer на каждый виджет обновления регистрируются с
+желаемым интервалом и выполняются пачкой в одном такте главного потока.
+Обновление пропускается, если его входные данные не изменились или
+виджет не виден, и выполняется вне очереди, если его пометили грязным.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+from cache_manager import LatencyHistogram
+
+# Маркер "входные данные еще не снимались": первое обновление выполняется всегда
+_NO_INPUTS = object()
+
+
+class _Refresh:
+    """Зарегистрированное обновление"""
+    __slots__ = ("name", "callback", "interval", "inputs", "active", "next_due",
+                 "last_inputs", "dirty", "deferred", "runs", "skipped", "hidden", "failed", "run_time")
+
+    def __init__(self, name: str, callback: Callable[[], Any], interval: Optional[float],
+                 inputs: Optional[Callable[[], Any]], active: Optional[Callable[[], bool]]):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.inputs = inputs
+        self.active = active
+        self.next_due = math.inf
+        self.last_inputs = _NO_INPUTS
+        self.dirty = True
+        # Неактивное грязное обновление ждет срока или новой пометки, а не каждого такта
+        self.deferred = False
+        self.runs = 0
+        self.skipped = 0
+        self.hidden = 0
+        self.failed = 0
+        self.run_time = 0.0
+
+
+class FrameScheduler(QObject):
+    """Обновления интерфейса с общим таймером
+
+    Сроки обновлений выровнены по сетке их интервалов (секундное обновление
+    срабатывает на границе секунды, трехсекундное - на каждой третьей), поэтому
+    обновления с кратными интервалами попадают в один такт. Таймер
+    однократный и заводится до ближайшего срока, простаивающий интерфейс не
+    просыпается впустую.
+    """
+
+    _wake = pyqtSignal()
+
+    def __init__(self, min_interval_ms: float = 16, clock: Callable[[], float] = time.time,
+                 parent=None):
+        super().__init__(parent)
+        self.min_interval = min_interval_ms / 1000
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._refreshes: Dict[str, _Refresh] = {}
+        self._timer: Optional[QTimer] = None
+        self._wake_pending = False
+        # mark_dirty() может вызываться из фоновых потоков: сигнал доставляется в главный
+        self._wake.connect(self._on_wake, Qt.QueuedConnection)
+
+        # Статистика
+        self.ticks = 0
+        self.tick_time = LatencyHistogram()
+
+    # ------------------------------------------------------------------
+    # Регистрация
+    # ------------------------------------------------------------------
+
+    def register(self, name: str, callback: Callable[[], Any],
+                 interval_ms: Optional[float] = None,
+                 inputs: Optional[Callable[[], Any]] = None,
+                 active: Optional[Callable[[], bool]] = None) -> None:
+        """Регистрация обновления (повторная регистрация имени заменяет прежнюю)
+
+        Args:
+            name: Имя обновления для mark_dirty() и статистики
+            callback: Функция обновления (вызывается в главном потоке)
+            interval_ms: Желаемый интервал; None - только по mark_dirty()
+            inputs: Снимок входных данных; обновление пропускается, пока снимок
+                равен предыдущему
+            active: Нужно ли обновление сейчас (например, виден ли виджет);
+                неактивное обновление откладывается до следующего срока
+        """
+        interval = interval_ms / 1000 if interval_ms else None
+        refresh = _Refresh(name, callback, interval, inputs, active)
+        with self._lock:
+            self._refreshes[name] = refresh
+        self._request_wake()
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._refreshes.pop(name, None)
+
+    def mark_dirty(self, *names: str) -> None:
+        """Выполнить обновления в ближайшем такте, даже если входные данные не изменились
+
+        Без имен помечаются все обновления. Можно вызывать из любого потока;
+        несколько пометок подряд выполняются одним тактом.
+        """
+        with self._lock:
+            targets = [self._refreshes[name] for name in names if name in self._refreshes] \
+                if names else list(self._refreshes.values())
+            for refresh in targets:
+                refresh.dirty = True
+                refresh.deferred = False
+        if targets:
+            self._request_wake()
+
+    # ------------------------------------------------------------------
+    # Такт
+    # ------------------------------------------------------------------
+
+    def _due(self, interval: float, now: float) -> float:
+        """Ближайший срок на сетке интервала после now"""
+        return (math.floor(now / interval) + 1) * interval
+
+    def tick(self, now: Optional[float] = None) -> int:
+        """Выполнение всех обновлений, чей срок наступил или которые помечены грязными
+
+        Returns:
+            Сколько обновлений было выполнено
+        """
+        now = self.clock() if now is None else now
+        started = time.perf_counter()
+        with self._lock:
+            due = [refresh for refresh in self._refreshes.values()
+                   if (refresh.dirty and not refresh.deferred) or now >= refresh.next_due
+                   # Часы переведены назад: срок пересчитывается по сетке
+                   or (refresh.interval is not None and refresh.next_due - now > refresh.interval)]
+            batch = []
+            for refresh in due:
+                if refresh.interval is not None:
+                    refresh.next_due = self._due(refresh.interval, now)
+                # Пометка снимается до вызова: пометка во время обновления не теряется
+                batch.append((refresh, refresh.dirty))
+                refresh.dirty = False
+
+        runs = 0
+        for refresh, dirty in batch:
+            if self._run(refresh, dirty):
+                runs += 1
+
+        self.ticks += 1
+        self.tick_time.record(time.perf_counter() - started)
+        return runs
+
+    def _run(self, refresh: _Refresh, dirty: bool) -> bool:
+        """Одно обновление: проверка активности и входных данных, вызов"""
+        try:
+            if refresh.active is not None and not refresh.active():
+                # Грязная пометка сохраняется до момента, когда обновление понадобится
+                with self._lock:
+                    refresh.dirty = refresh.dirty or dirty
+                    refresh.deferred = True
+                refresh.hidden += 1
+                return False
+            snapshot = refresh.inputs() if refresh.inputs is not None else _NO_INPUTS
+            if not dirty and snapshot is not _NO_INPUTS and snapshot == refresh.last_inputs:
+                refresh.skipped += 1
+                return False
+            refresh.deferred = False
+            refresh.last_inputs = snapshot
+            started = time.perf_counter()
+            refresh.callback()
+            refresh.run_time += time.perf_counter() - started
+            refresh.runs += 1
+            return True
+        except Exception as e:
+            refresh.failed += 1
+            self.logger.error(f"Ошибка обновления интерфейса {refresh.name}: {e}")
+            return False
+
+    def next_delay(self, now: Optional[float] = None) -> Optional[float]:
+        """Секунды до ближайшего срока (None - ждать нечего)"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if any(refresh.dirty and not refresh.deferred for refresh in self._refreshes.values()):
+                return self.min_interval
+            deadlines = [refresh.next_due for refresh in self._refreshes.values()
+                         if refresh.interval is not None]
+        if not deadlines:
+            return None
+        return max(self.min_interval, min(deadlines) - now)
+
+    # ------------------------------------------------------------------
+    # Таймер Qt
+    # ------------------------------------------------------------------
+
+    def start(self, parent=None) -> None:
+        """Запуск общего таймера (в главном потоке; повторный вызов ничего не делает)"""
+        if self._timer is not None:
+            return
+        self._timer = QTimer(parent)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timer)
+        self._reschedule()
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+
+    def _on_timer(self) -> None:
+        self.tick()
+        self._reschedule()
+
+    def _reschedule(self) -> None:
+        if self._timer is None:
+            return
+        delay = self.next_delay()
+        if delay is None:
+            self._timer.stop()
+        else:
+            self._timer.start(max(1, int(math.ceil(delay * 1000))))
+
+    def _request_wake(self) -> None:
+        with self._lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        self._wake.emit()
+
+    def _on_wake(self) -> None:
+        """Новое или грязное обновление: таймер переводится на ближайший срок"""
+        with self._lock:
+            self._wake_pending = False
+        if self._timer is None:
+            return
+        delay = self.next_delay()
+        if delay is not None and (not self._timer.isActive()
+                                  or self._timer.remainingTime() > delay * 1000):
+            self._timer.start(max(1, int(math.ceil(delay * 1000))))
+
+    # ------------------------------------------------------------------
+    # Статистика
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Такты, выполненные и пропущенные обновления"""
+        with self._lock:
+            refreshes: List[_Refresh] = list(self._refreshes.values())
+        return {
+            'ticks': self.ticks,
+            'tick': self.tick_time.snapshot(),
+            'runs': sum(refresh.runs for refresh in refreshes),
+            'skipped': sum(refresh.skipped for refresh in refreshes),
+            'hidden': sum(refresh.hidden for refresh in refreshes),
+            'refreshes': {
+                refresh.name: {
+                    'interval_ms': refresh.interval * 1000 if refresh.interval else None,
+                    'runs': refresh.runs,
+                    'skipped': refresh.skipped,
+                    'hidden': refresh.hidden,
+                    'failed': refresh.failed,
+                    'total_ms': round(refresh.run_time * 1000, 3)
+                }
+                for refresh in refreshes
+            }
+        }
+
+
+# Глобальный планировщик (ленивая инициализация)
+_frame_scheduler = None
+_frame_scheduler_lock = threading.Lock()
+
+def get_frame_scheduler() -> FrameScheduler:
+    """Получение глобального планировщика обновлений интерфейса"""
+    global _frame_scheduler
+    with _frame_scheduler_lock:
+        if _frame_scheduler is None:
+            _frame_scheduler = FrameScheduler()
+        return _frame_scheduler
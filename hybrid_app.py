@@ -32,6 +32,10 @@ from advanced_analytics import get_advanced_analytics_widget
 from enhanced_ui import DragDropTaskWidget, TimelineWidget, ModernTaskDialog
 from cloud_sync import cloud_sync_manager, data_exporter
 from performance_optimizer import get_performance_optimizer
+from data_manager import PremiumDataManager
+from rollup_store import get_rollup_store
+from frame_scheduler import get_frame_scheduler
+from task_list_model import TaskListModel, TaskListView, priority_text, status_color, status_text
 
 # Новые модули v5.0
 try:
@@ -45,7 +49,7 @@ except ImportError as e:
 # Новые модули v6.0 - Улучшения производительности и UI
 try:
     from config_manager import get_config, ConfigManager
-    from cache_manager import get_cache_manager, cached
+    from cache_manager import get_cache_manager, get_cache_registry, cached
     from async_notifications import get_notification_manager, create_task_reminder
     from modern_ui_components import (
         ModernButton, ModernCard, ModernTaskItem, ModernSearchBox, 
@@ -71,10 +75,9 @@ class JavaScriptUIComponent(QWidget if not WEBENGINE_AVAILABLE else QWebEngineVi
         else:
             self.setup_native_ui()
         
-        # Таймер для обновления данных
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_dashboard_data)
-        self.update_timer.start(1000)  # Обновляем каждую секунду
+        # Обновление данных каждую секунду, пока панель видна
+        get_frame_scheduler().register("dashboard_data", self.update_dashboard_data, 1000,
+                                       active=self.isVisible)
     
     def setup_native_ui(self):
         """Настройка нативного UI без WebEngine"""
@@ -738,9 +741,17 @@ class HybridTimeBlockingApp(QMainWindow):
             # Инициализируем менеджеры только если QApplication уже создано
             from PyQt5.QtWidgets import QApplication
             if QApplication.instance() is not None:
+                # Расписание дней общее с окном планировщика: статистика, предзагрузка
+                # и сводки аналитики учитывают блоки времени, а не только задачи.
+                # Подключается до создания аналитики - тепловая карта сразу
+                # предзагружает дни своего периода
+                self.data_manager = PremiumDataManager()
+                get_rollup_store().attach(data_manager=self.data_manager)
+                self.performance_optimizer = get_performance_optimizer()
+                self.performance_optimizer.attach_data_manager(self.data_manager)
+                
                 self.smart_notification_manager = get_smart_notification_manager()
                 self.advanced_analytics_widget = get_advanced_analytics_widget()
-                self.performance_optimizer = get_performance_optimizer()
                 
                 # Инициализация новых модулей v5.0
                 if AI_MODULES_AVAILABLE:
@@ -1110,29 +1121,20 @@ class HybridTimeBlockingApp(QMainWindow):
         header_layout.addLayout(buttons_layout)
         layout.addLayout(header_layout)
         
-        # Список задач
-        self.tasks_list = QListWidget()
+        # Список задач: модель обновляется построчно по изменениям задач,
+        # представление рисует только видимые строки
+        if not hasattr(self, 'tasks_model'):
+            self.tasks_model = TaskListModel(task_manager, parent=self)
+        self.tasks_list = TaskListView()
+        self.tasks_list.setModel(self.tasks_model)
+        self.tasks_list.placeholder_text = _("no_tasks")
         self.tasks_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background: #2D2D2D;
                 border: 2px solid #FF2B43;
                 border-radius: 8px;
                 padding: 10px;
             }
-            QListWidget::item {
-                background: #1E1E1E;
-                border: 1px solid #444;
-                border-radius: 6px;
-                padding: 10px;
-                margin: 5px;
-                color: white;
-            }
-            QListWidget::item:selected {
-                background: #FF2B43;
-            }
-            QListWidget::item:hover {
-                background: #3D3D3D;
-            }
         """)
         
         layout.addWidget(self.tasks_list)
@@ -1158,9 +1160,6 @@ class HybridTimeBlockingApp(QMainWindow):
         
         widget.setLayout(layout)
         
-        # Загружаем задачи
-        self.refresh_tasks()
-        
         return widget
     
     def create_dashboard_tab(self):
@@ -1396,21 +1395,46 @@ class HybridTimeBlockingApp(QMainWindow):
         """)
     
     def setup_timers(self):
-        """Настройка таймеров"""
-        # Таймер для обновления времени (каждую секунду)
-        self.time_timer = QTimer()
-        self.time_timer.timeout.connect(self.update_time_display)
-        self.time_timer.start(1000)  # Каждую секунду
-        
-        # Таймер для обновления статистики
-        self.stats_timer = QTimer()
-        self.stats_timer.timeout.connect(self.update_statistics)
-        self.stats_timer.start(30000)  # Каждые 30 секунд
-    
-        # Таймер для обновления всех динамических элементов (каждые 3 секунды)
-        self.all_elements_timer = QTimer()
-        self.all_elements_timer.timeout.connect(self.update_all_dynamic_elements)
-        self.all_elements_timer.start(3000)
+        """Регистрация обновлений в общем планировщике кадров"""
+        self.frame_scheduler = get_frame_scheduler()
+        scheduler = self.frame_scheduler
+        ui_interval = get_config().performance.ui_update_interval_ms if V6_MODULES_AVAILABLE else 1000
+        
+        # Карточка времени перестраивается только при смене показываемой секунды
+        scheduler.register("time_card", self.update_time_display, ui_interval,
+                           inputs=lambda: localization.format_moscow_time("%H:%M:%S"),
+                           active=lambda: bool(getattr(self, 'time_card', None)))
+        
+        # Статистика в заголовке окна (каждые 30 секунд, если блоки изменились)
+        scheduler.register("window_stats", self.update_statistics, 30000,
+                           inputs=lambda: (len(self.time_blocks),
+                                           sum(block['duration'] for block in self.time_blocks)))
+        
+        # Динамические элементы (каждые 3 секунды, только видимые)
+        for name, attribute, refresh in self.dynamic_element_refreshes():
+            scheduler.register(name, refresh, 3000,
+                               active=lambda attribute=attribute: self.is_widget_visible(attribute))
+        
+        # Переключение вкладки: показанные виджеты обновляются сразу
+        self.tabs.currentChanged.connect(lambda index: scheduler.mark_dirty())
+        scheduler.start(self)
+    
+    def dynamic_element_refreshes(self):
+        """Динамические элементы: (имя обновления, атрибут виджета, функция обновления)"""
+        return [
+            ("upcoming_tasks", 'upcoming_tasks',
+             lambda: self.upcoming_tasks.setPlainText(dynamic_task_list.get_dynamic_task_text())),
+            ("chart", 'chart_widget',
+             lambda: self.chart_widget.setPlainText(dynamic_chart.get_dynamic_chart_text())),
+            ("dynamic_stats", 'stats_widget',
+             lambda: self.stats_widget.setPlainText(dynamic_stats.get_dynamic_stats_text())),
+            ("integrations_status", 'integrations_status', self.update_integrations_status),
+        ]
+    
+    def is_widget_visible(self, attribute):
+        """Виджет создан и показан на экране"""
+        widget = getattr(self, attribute, None)
+        return widget is not None and widget.isVisible()
     def add_time_block(self):
         """Добавление временного блока"""
         import random
@@ -1511,20 +1535,16 @@ class HybridTimeBlockingApp(QMainWindow):
                 priority=task_data['priority']
             )
             
-            # Обновляем список
-            self.refresh_tasks()
-            
             # Показываем сообщение
             QMessageBox.information(self, _("add_task"), _("task_added"))
     
     def edit_selected_task(self):
         """Редактирование выбранной задачи"""
-        current_item = self.tasks_list.currentItem()
-        if not current_item:
+        task_id = self.tasks_list.selected_task_id()
+        if not task_id:
             QMessageBox.warning(self, _("edit"), "Выберите задачу для редактирования")
             return
         
-        task_id = current_item.data(Qt.UserRole)
         task = task_manager.get_task_by_id(task_id)
         
         if not task:
@@ -1550,35 +1570,29 @@ class HybridTimeBlockingApp(QMainWindow):
                 status=task_data['status']
             )
             
-            # Обновляем список
-            self.refresh_tasks()
-            
             QMessageBox.information(self, _("edit"), "Задача обновлена")
     
     def complete_selected_task(self):
         """Завершение выбранной задачи"""
-        current_item = self.tasks_list.currentItem()
-        if not current_item:
+        task_id = self.tasks_list.selected_task_id()
+        if not task_id:
             QMessageBox.warning(self, _("complete"), "Выберите задачу для завершения")
             return
         
-        task_id = current_item.data(Qt.UserRole)
         task = task_manager.complete_task(task_id)
         
         if task:
-            self.refresh_tasks()
             QMessageBox.information(self, _("complete"), _("task_completed"))
         else:
             QMessageBox.warning(self, _("complete"), "Не удалось завершить задачу")
     
     def delete_selected_task(self):
         """Удаление выбранной задачи"""
-        current_item = self.tasks_list.currentItem()
-        if not current_item:
+        task_id = self.tasks_list.selected_task_id()
+        if not task_id:
             QMessageBox.warning(self, _("delete"), "Выберите задачу для удаления")
             return
         
-        task_id = current_item.data(Qt.UserRole)
         task = task_manager.get_task_by_id(task_id)
         
         if not task:
@@ -1595,80 +1609,30 @@ class HybridTimeBlockingApp(QMainWindow):
         
         if reply == QMessageBox.Yes:
             if task_manager.delete_task(task_id):
-                self.refresh_tasks()
                 QMessageBox.information(self, _("delete"), _("task_deleted"))
             else:
                 QMessageBox.warning(self, _("delete"), "Не удалось удалить задачу")
     
     def refresh_tasks(self):
-        """Обновление списка задач"""
-        self.tasks_list.clear()
-        
-        today_tasks = task_manager.get_tasks_for_today()
-        
-        if not today_tasks:
-            item = QListWidgetItem(_("no_tasks"))
-            item.setFlags(item.flags() & ~Qt.ItemIsSelectable)
-            self.tasks_list.addItem(item)
-            return
-        
-        # Сортируем задачи по времени начала
-        today_tasks.sort(key=lambda t: t.start_time)
-        
-        for task in today_tasks:
-            # Формируем текст элемента
-            status_text = self.get_status_text(task.status)
-            priority_text = self.get_priority_text(task.priority)
-            time_text = f"{task.start_time.strftime('%H:%M')} - {task.end_time.strftime('%H:%M')}"
-            
-            # Определяем цвет статуса
-            status_color = self.get_status_color(task.status)
-            
-            item_text = f"[{status_text}] {task.title}\n"
-            item_text += f"⏰ {time_text} | 🎯 {priority_text}\n"
-            
-            if task.description:
-                item_text += f"📝 {task.description[:50]}{'...' if len(task.description) > 50 else ''}"
-            
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, task.id)
-            
-            # Устанавливаем цвет в зависимости от статуса
-            item.setBackground(status_color)
-            
-            self.tasks_list.addItem(item)
-    
+        """Полная перезагрузка списка задач (смена дня или языка)"""
+        if hasattr(self, 'tasks_model'):
+            self.tasks_model.reload()
+        if hasattr(self, 'tasks_list'):
+            # Подсказка пустого списка рисуется самим видом: перевод меняется только здесь
+            self.tasks_list.placeholder_text = _("no_tasks")
+            self.tasks_list.viewport().update()
+
     def get_status_text(self, status: TaskStatus) -> str:
         """Получение текста статуса на текущем языке"""
-        status_map = {
-            TaskStatus.PLANNED: _("status_planned"),
-            TaskStatus.IN_PROGRESS: _("status_in_progress"),
-            TaskStatus.COMPLETED: _("status_completed"),
-            TaskStatus.CANCELLED: _("status_cancelled")
-        }
-        return status_map.get(status, str(status.value))
+        return status_text(status)
     
     def get_priority_text(self, priority: TaskPriority) -> str:
         """Получение текста приоритета на текущем языке"""
-        priority_map = {
-            TaskPriority.LOW: _("priority_low"),
-            TaskPriority.MEDIUM: _("priority_medium"),
-            TaskPriority.HIGH: _("priority_high"),
-            TaskPriority.URGENT: _("priority_urgent")
-        }
-        return priority_map.get(priority, str(priority.value))
+        return priority_text(priority)
     
     def get_status_color(self, status: TaskStatus):
         """Получение цвета для статуса задачи"""
-        from PyQt5.QtGui import QColor
-        
-        color_map = {
-            TaskStatus.PLANNED: QColor(70, 70, 70),      # Серый
-            TaskStatus.IN_PROGRESS: QColor(255, 193, 7), # Желтый
-            TaskStatus.COMPLETED: QColor(76, 175, 80),   # Зеленый
-            TaskStatus.CANCELLED: QColor(244, 67, 54)    # Красный
-        }
-        return color_map.get(status, QColor(70, 70, 70))
+        return status_color(status)
     
     def create_ai_tab(self):
         """Создание современной вкладки ИИ-помощника"""
@@ -2566,37 +2530,9 @@ class HybridTimeBlockingApp(QMainWindow):
     
     
     def update_all_dynamic_elements(self):
-        """Обновление всех динамических элементов интерфейса"""
-        try:
-            # Обновляем список задач
-            if hasattr(self, 'upcoming_tasks') and self.upcoming_tasks:
-                new_text = dynamic_task_list.get_dynamic_task_text()
-                self.upcoming_tasks.setPlainText(new_text)
-            
-            # Обновляем график
-            if hasattr(self, 'chart_widget') and self.chart_widget:
-                new_chart = dynamic_chart.get_dynamic_chart_text()
-                self.chart_widget.setPlainText(new_chart)
-            
-            # Обновляем статистику
-            if hasattr(self, 'stats_widget') and self.stats_widget:
-                new_stats = dynamic_stats.get_dynamic_stats_text()
-                self.stats_widget.setPlainText(new_stats)
-            
-            # Обновляем список задач в отдельной вкладке
-            if hasattr(self, 'tasks_list_widget') and self.tasks_list_widget:
-                self.update_tasks_display()
-            
-            # Обновляем статистику задач
-            if hasattr(self, 'tasks_stats_widget') and self.tasks_stats_widget:
-                self.update_tasks_stats()
-            
-            # Обновляем статус интеграций
-            if hasattr(self, 'integrations_status') and self.integrations_status:
-                self.update_integrations_status()
-                
-        except Exception as e:
-            print(f"Ошибка обновления динамических элементов: {e}")
+        """Немедленное обновление всех динамических элементов интерфейса"""
+        if hasattr(self, 'frame_scheduler'):
+            self.frame_scheduler.mark_dirty(*(name for name, _, _ in self.dynamic_element_refreshes()))
     
     def clear_completed_tasks(self):
         """Очистка выполненных задач"""
@@ -2607,8 +2543,7 @@ class HybridTimeBlockingApp(QMainWindow):
             
             if completed_tasks:
                 # Здесь можно добавить логику удаления
-                self.update_tasks_display()
-                self.update_tasks_stats()
+                self.refresh_tasks()
                 print(f"Очищено {len(completed_tasks)} выполненных задач")
             else:
                 print("Нет выполненных задач для очистки")
@@ -2616,14 +2551,6 @@ class HybridTimeBlockingApp(QMainWindow):
         except Exception as e:
             print(f"Ошибка очистки задач: {e}")
     
-    def refresh_tasks(self):
-        """Обновление списка задач"""
-        try:
-            self.update_tasks_display()
-            self.update_tasks_stats()
-            print("Список задач обновлен")
-        except Exception as e:
-            print(f"Ошибка обновления задач: {e}")
     def update_time_display(self):
         """Обновление отображения времени в реальном времени"""
         try:
@@ -3025,14 +2952,48 @@ class HybridTimeBlockingApp(QMainWindow):
         """Показать статистику кэша"""
         if hasattr(self, 'cache_manager') and self.cache_manager:
             stats = self.cache_manager.get_stats()
+            memory = stats['memory_cache']
+            files = stats['file_cache']
+            latency = stats['latency']
             info = f"""
 Статистика кэширования:
-- Элементов в памяти: {stats['memory_cache']['size']}
-- Попадания: {stats['memory_cache']['hits']}
-- Промахи: {stats['memory_cache']['misses']}
-- Процент попаданий: {stats['memory_cache']['hit_rate']:.1f}%
-            """
-            QMessageBox.information(self, "Статистика кэша", info.strip())
+- Элементов в памяти: {memory['size']} ({memory['bytes'] / 1024 / 1024:.1f} МБ)
+- Попадания: {memory['hits']}
+- Промахи: {memory['misses']}
+- Процент попаданий: {memory['hit_rate']:.1f}%
+- Файловый кэш: {files['entries']} записей, {files['size_bytes'] / 1024 / 1024:.1f} МБ
+- Чтение из памяти: p50 {latency['memory.get']['p50_ms']:.3f} мс, p99 {latency['memory.get']['p99_ms']:.3f} мс
+- Чтение из файла: p50 {latency['file.get']['p50_ms']:.3f} мс, p99 {latency['file.get']['p99_ms']:.3f} мс
+            """.strip()
+            warmup = stats.get('warmup')
+            if warmup:
+                info += (f"\n- Прогрев: {warmup['loaded']} из {warmup['total']} ключей "
+                         f"({warmup['state']})")
+            
+            # Функции, которые экономят больше всего времени
+            namespaces = sorted(stats['namespaces'].items(),
+                                key=lambda item: item[1]['saved_seconds'], reverse=True)
+            if namespaces:
+                info += "\n\nПо функциям (сэкономлено / вычисления / попадания):"
+                for namespace, counters in namespaces[:8]:
+                    info += (f"\n- {namespace}: {counters['saved_seconds']:.2f} с / "
+                             f"{counters['load_seconds']:.2f} с / {counters['hit_rate']:.0f}%, "
+                             f"вытеснено {counters['evictions']}")
+            
+            # Все кэши процесса и общий бюджет памяти
+            registry = get_cache_registry().get_stats()
+            info += (f"\n\nКэши процесса: {registry['total_bytes'] / 1024 / 1024:.1f} из "
+                     f"{(registry['budget_bytes'] or 0) / 1024 / 1024:.0f} МБ")
+            for name, counters in registry['caches'].items():
+                info += (f"\n- {name}: {counters['entries']} записей, "
+                         f"{counters['bytes'] / 1024 / 1024:.1f} МБ, {counters['hit_rate']:.0f}%, "
+                         f"урезано {counters['trimmed_bytes'] / 1024 / 1024:.1f} МБ")
+            
+            # Общий планировщик обновлений интерфейса
+            frames = get_frame_scheduler().get_stats()
+            info += (f"\n\nОбновления интерфейса: {frames['ticks']} тактов, выполнено {frames['runs']}, "
+                     f"без изменений {frames['skipped']}, скрыто {frames['hidden']}")
+            QMessageBox.information(self, "Статистика кэша", info)
         else:
             QMessageBox.warning(self, "Ошибка", "Система кэширования недоступна")
     
@@ -3093,6 +3054,15 @@ def main():
     window = HybridTimeBlockingApp()
     window.show()
     
+    # Сторож зависаний (performance.stall_watchdog): отчет time_blocking_premium_data/stall_report.json
+    try:
+        from stall_watchdog import start_stall_watchdog
+        watchdog = start_stall_watchdog(app)
+        if watchdog is not None:
+            app.aboutToQuit.connect(watchdog.stop)
+    except Exception as e:
+        print(f"Сторож зависаний недоступен: {e}")
+    
     try:
         print("🎉 Приложение успешно запущено!")
         print("📊 Функции v4.0:")
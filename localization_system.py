@@ -276,9 +276,22 @@ class LocalizationManager:
         """Получение поддерживаемых языков"""
         return self.supported_languages.copy()
 
-# Глобальный экземпляр
-localization = LocalizationManager()
+# Глобальный экземпляр (ленивая инициализация: импорт модуля не обращается к QSettings)
+_localization = None
+
+def get_localization() -> LocalizationManager:
+    """Получение глобального менеджера локализации"""
+    global _localization
+    if _localization is None:
+        _localization = LocalizationManager()
+    return _localization
+
+def __getattr__(name):
+    # Совместимость с `from localization_system import localization`
+    if name == "localization":
+        return get_localization()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def _(key: str, *args) -> str:
     """Короткая функция для получения перевода"""
-    return localization.get_text(key, *args)
+    return get_localization().get_text(key, *args)
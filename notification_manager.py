@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from PyQt5.QtCore import QTimer, pyqtSignal, QObject, Qt
 from PyQt5.QtWidgets import QMessageBox, QSystemTrayIcon
 from animations import NotificationAnimator
+from frame_scheduler import get_frame_scheduler
 
 class PremiumNotificationManager(QObject):
     """Менеджер уведомлений премиум-класса"""
@@ -12,8 +13,7 @@ class PremiumNotificationManager(QObject):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_notifications)
+        self.scheduler = get_frame_scheduler()
         self.enabled = True
         self.notification_times = {}
         self.snoozed_notifications = {}
@@ -28,20 +28,26 @@ class PremiumNotificationManager(QObject):
     
     def start(self):
         """Запуск проверки уведомлений"""
-        self.timer.start(30000)  # Проверка каждые 30 секунд
+        self.register_check()
+        self.scheduler.start()
         self.check_notifications()
     
     def stop(self):
         """Остановка проверки уведомлений"""
-        self.timer.stop()
+        self.scheduler.unregister("premium_notifications")
+    
+    def register_check(self):
+        """Проверка каждые 30 секунд, пока есть ожидающие уведомления"""
+        self.scheduler.register("premium_notifications", self.check_notifications, 30000,
+                                active=lambda: bool(self.notification_times or self.snoozed_notifications))
     
     def set_enabled(self, enabled):
         """Включение/выключение уведомлений"""
         self.enabled = enabled
         if enabled:
-            self.timer.start(30000)
+            self.register_check()
         else:
-            self.timer.stop()
+            self.stop()
     
     def add_notification(self, block_id, start_time, title, reminder_type="start"):
         """Добавление уведомления"""
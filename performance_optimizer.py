@@ -2,99 +2,91 @@
 import json
 import os
 import pickle
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Any, Optional
-from functools import lru_cache
 import threading
-import queue
-from PyQt5.QtCore import QObject, QThread, pyqtSignal, QTimer
+from concurrent.futures import Future
+from PyQt5.QtCore import QObject, pyqtSignal
+from background_executor import PriorityExecutor, TaskPriority, get_background_executor
+from cache_manager import MemoryCache, get_cache_registry
+from prefetcher import get_prefetcher
+from productivity_stats import get_productivity_stats_service
 
-class DataCache:
-    """Система кэширования данных"""
+class DataCache(MemoryCache):
+    """Система кэширования данных
+    
+    LRU-кэш с TTL и оценкой размера записей: переполнение вытесняет по одной
+    записи, истекшие записи удаляются в фоне, а общий бюджет памяти с
+    другими кэшами соблюдает реестр кэшей.
+    """
     
     def __init__(self, max_size=1000, ttl_seconds=3600):
-        self.cache = {}
-        self.access_times = {}
-        self.max_size = max_size
+        super().__init__(max_size=max_size, default_ttl=ttl_seconds, policy="lru")
         self.ttl_seconds = ttl_seconds
-        
-    def get(self, key: str) -> Optional[Any]:
-        """Получение данных из кэша"""
-        if key not in self.cache:
-            return None
-            
-        # Проверяем TTL
-        if self._is_expired(key):
-            self.remove(key)
-            return None
-            
-        self.access_times[key] = datetime.now()
-        return self.cache[key]
-    
-    def set(self, key: str, value: Any):
-        """Сохранение данных в кэш"""
-        # Очищаем кэш если он переполнен
-        if len(self.cache) >= self.max_size:
-            self._cleanup()
-            
-        self.cache[key] = value
-        self.access_times[key] = datetime.now()
     
     def remove(self, key: str):
         """Удаление из кэша"""
-        self.cache.pop(key, None)
-        self.access_times.pop(key, None)
-    
-    def _is_expired(self, key: str) -> bool:
-        """Проверка истечения TTL"""
-        if key not in self.access_times:
-            return True
-            
-        age = datetime.now() - self.access_times[key]
-        return age.total_seconds() > self.ttl_seconds
-    
-    def _cleanup(self):
-        """Очистка устаревших записей"""
-        expired_keys = [k for k in self.cache.keys() if self._is_expired(k)]
-        for key in expired_keys:
-            self.remove(key)
-            
-        # Если все еще переполнен, удаляем самые старые
-        if len(self.cache) >= self.max_size:
-            sorted_keys = sorted(self.access_times.items(), key=lambda x: x[1])
-            for key, _ in sorted_keys[:len(self.cache) // 4]:  # Удаляем 25%
-                self.remove(key)
+        self.delete(key)
 
-class BackgroundProcessor(QThread):
-    """Фоновый обработчик задач"""
+class BackgroundProcessor(QObject):
+    """Фоновый обработчик задач
+    
+    Задачи выполняет общий пул потоков с приоритетами, результаты и ошибки
+    приходят сигналами в поток Qt.
+    """
     
     task_completed = pyqtSignal(str, object)  # task_id, result
+    task_failed = pyqtSignal(str, object)  # task_id, exception
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, executor: Optional[PriorityExecutor] = None):
         super().__init__(parent)
-        self.task_queue = queue.Queue()
+        self.executor = executor or get_background_executor()
         self.running = True
+        self._lock = threading.Lock()
+        self._pending = set()
         
-    def add_task(self, task_id: str, func, *args, **kwargs):
-        """Добавление задачи в очередь"""
-        self.task_queue.put((task_id, func, args, kwargs))
+    def add_task(self, task_id: str, func, *args,
+                 priority: TaskPriority = TaskPriority.INTERACTIVE,
+                 timeout: Optional[float] = None, **kwargs) -> Future:
+        """Добавление задачи в очередь
+        
+        Returns:
+            Future задачи (cancel() снимает ее из очереди)
+        """
+        future = self.executor.submit(func, *args, priority=priority, task_id=task_id,
+                                      timeout=timeout, **kwargs)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._deliver(task_id, done))
+        return future
+    
+    def _deliver(self, task_id: str, future: Future):
+        """Передача результата в поток Qt (сигналы между потоками ставятся в очередь)"""
+        with self._lock:
+            self._pending.discard(future)
+        if future.cancelled() or not self.running:
+            return
+        try:
+            error = future.exception()
+            if error is None:
+                self.task_completed.emit(task_id, future.result())
+            else:
+                self.task_failed.emit(task_id, error)
+        except RuntimeError:
+            # Объект Qt уже удален
+            pass
     
-    def run(self):
-        """Основной цикл обработки"""
-        while self.running:
-            try:
-                task_id, func, args, kwargs = self.task_queue.get(timeout=1)
-                result = func(*args, **kwargs)
-                self.task_completed.emit(task_id, result)
-                self.task_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Ошибка выполнения фоновой задачи: {e}")
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очередей и задержки пула"""
+        return self.executor.get_stats()
     
     def stop(self):
-        """Остановка процессора"""
+        """Остановка процессора: отмена еще не начатых задач"""
         self.running = False
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
 
 class PerformanceOptimizer(QObject):
     """Главный класс оптимизации производительности"""
@@ -102,59 +94,40 @@ class PerformanceOptimizer(QObject):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.cache = DataCache()
-        self.background_processor = BackgroundProcessor()
-        self.background_processor.start()
-        self.cleanup_timer = None
-        
-        # Отложенная инициализация таймера
-        self.init_cleanup_timer()
+        # Очистку и общий бюджет памяти кэшей выполняет реестр кэшей
+        get_cache_registry().register("performance_optimizer.data", self.cache)
+        self.background_processor = BackgroundProcessor(self)
+        self.stats_service = get_productivity_stats_service()
+        self.prefetcher = get_prefetcher()
     
-    def init_cleanup_timer(self):
-        """Инициализация таймера очистки в правильном потоке"""
-        from PyQt5.QtCore import QTimer
-        if self.cleanup_timer is None:
-            self.cleanup_timer = QTimer(self)
-            self.cleanup_timer.timeout.connect(self._periodic_cleanup)
-            self.cleanup_timer.start(300000)  # 5 минут
+    def attach_data_manager(self, data_manager) -> None:
+        """Источник расписания дней для статистики и предзагрузки
+        
+        Без него статистика считается только по задачам: focus_time и
+        productivity_score дней равны 0.
+        """
+        self.stats_service.attach(data_manager=data_manager)
+        self.prefetcher.attach(data_manager=data_manager)
     
-    @lru_cache(maxsize=128)
     def get_productivity_stats(self, date_str: str) -> Dict:
-        """Кэшированное получение статистики продуктивности"""
-        # Здесь будет реальная логика расчета статистики
-        return {
-            'productivity_score': 0.75,
-            'completed_tasks': 8,
-            'focus_time': 360,  # минуты
-            'efficiency': 0.82
-        }
+        """Статистика продуктивности дня
+        
+        Сервис считает день один раз и сбрасывает только дни, затронутые
+        сохранением расписания или изменением задач.
+        """
+        return self.stats_service.get(date.fromisoformat(date_str))
     
     def preload_data(self, date_range: List[str]):
-        """Предзагрузка данных в фоновом режиме"""
-        for date_str in date_range:
-            self.background_processor.add_task(
-                f"preload_{date_str}",
-                self._load_day_data,
-                date_str
-            )
+        """Предзагрузка дней и их статистики в фоновом режиме (низкий приоритет)"""
+        self.prefetcher.prefetch(date.fromisoformat(date_str) for date_str in date_range)
     
-    def _load_day_data(self, date_str: str) -> Dict:
-        """Загрузка данных за день"""
-        # Имитация загрузки данных
+    def get_stats(self) -> Dict[str, Any]:
+        """Очереди фоновых задач, предзагрузка и статистика продуктивности"""
         return {
-            'date': date_str,
-            'tasks': [],
-            'statistics': self.get_productivity_stats(date_str)
+            'background': self.background_processor.get_stats(),
+            'prefetch': self.prefetcher.get_stats(),
+            'productivity_stats': self.stats_service.get_stats()
         }
-    
-    def _periodic_cleanup(self):
-        """Периодическая очистка кэша и оптимизация"""
-        # Очистка кэша
-        self.cache._cleanup()
-        
-        # Очистка LRU кэша
-        self.get_productivity_stats.cache_clear()
-        
-        print("Выполнена периодическая очистка кэша")
 
 # Глобальный экземпляр оптимизатора (ленивая инициализация)
 _performance_optimizer = None
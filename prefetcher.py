@@ -0,0 +1,233 @@
+"""
+🔮 Предзагрузка соседних дней по навигации пользователя
+Пока пользователь смотрит день или период аналитики, в фоне
+загружаются и декодируются соседние дни и считается их статистика, чтобы
+переход к ним не ждал диска
+"""
+
+import threading
+from collections import deque
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from background_executor import PriorityExecutor, TaskPriority
+from cache_manager import MemoryCache
+
+
+class NavigationPrefetcher:
+    """Предзагрузка дней вокруг просматриваемого
+
+    Одновременно выполняется не больше max_in_flight задач, остальные ждут
+    в очереди по близости к просматриваемому дню. Переход к другому дню
+    отменяет задачи, которые больше не нужны.
+    """
+
+    def __init__(self, data_manager=None, stats_service=None,
+                 executor: Optional[PriorityExecutor] = None,
+                 max_in_flight: int = 2, days_around: int = 1,
+                 period_days_limit: int = 31, max_days: int = 64):
+        self.data_manager = data_manager
+        self.stats_service = stats_service
+        self._executor = executor
+        self.max_in_flight = max_in_flight
+        self.days_around = days_around
+        self.period_days_limit = period_days_limit
+        # Декодированные блоки дней (загруженные заранее или по запросу)
+        self._days = MemoryCache(max_size=max_days, policy="lru")
+        self._lock = threading.Lock()
+        self._wanted = set()
+        self._queue = deque()
+        self._in_flight: Dict[date, Any] = {}
+        # Дни, загруженные заранее и еще не запрошенные
+        self._prefetched = set()
+        # Версии дней: загрузка, начатая до сохранения дня, не кладет в кэш старые блоки
+        self._versions: Dict[date, int] = {}
+
+        # Статистика
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.hits = 0
+        self.misses = 0
+        self.useful = 0
+
+    @property
+    def executor(self) -> PriorityExecutor:
+        if self._executor is None:
+            from background_executor import get_background_executor
+            self._executor = get_background_executor()
+        return self._executor
+
+    @property
+    def cache(self) -> MemoryCache:
+        return self._days
+
+    def attach(self, data_manager=None, stats_service=None) -> None:
+        """Источники данных; сохранение дня сбрасывает его загруженную копию"""
+        if data_manager is not None:
+            self.data_manager = data_manager
+            data_manager.add_save_listener(self._on_day_saved)
+        if stats_service is not None:
+            self.stats_service = stats_service
+
+    def _on_day_saved(self, day: date, time_blocks, metadata) -> None:
+        with self._lock:
+            self._versions[day] = self._versions.get(day, 0) + 1
+            self._prefetched.discard(day)
+            self._days.delete(day)
+
+    # ------------------------------------------------------------------
+    # Навигация
+    # ------------------------------------------------------------------
+
+    def view_day(self, day: date) -> None:
+        """Пользователь смотрит день: соседние дни, затем остальные дни его недели"""
+        wanted = []
+        for distance in range(1, self.days_around + 1):
+            wanted += [day + timedelta(days=distance), day - timedelta(days=distance)]
+        monday = day - timedelta(days=day.weekday())
+        week = [monday + timedelta(days=offset) for offset in range(7)]
+        wanted += sorted((other for other in week if other != day),
+                         key=lambda other: abs((other - day).days))
+        self.prefetch(wanted)
+
+    def view_period(self, start: date, end: date) -> None:
+        """Пользователь смотрит период аналитики: статистика предыдущего периода той же длины
+
+        Текущий период уже считается для отображения; переключатель периода ведет назад,
+        поэтому заранее готовятся дни перед началом периода, начиная с ближайших.
+        """
+        days = min((end - start).days + 1, self.period_days_limit)
+        self.prefetch([start - timedelta(days=offset) for offset in range(1, days + 1)])
+
+    def prefetch(self, days: Iterable[date]) -> None:
+        """Замена списка дней для предзагрузки (по убыванию важности)
+
+        Дни из прежнего списка, которых нет в новом, снимаются из очереди.
+        """
+        wanted = list(dict.fromkeys(days))
+        wanted_set = set(wanted)
+        with self._lock:
+            self._wanted = wanted_set
+            stale = [future for day, future in self._in_flight.items() if day not in wanted_set]
+            self._queue = deque(day for day in wanted
+                                if day not in self._in_flight and not self._is_ready(day))
+        # Отмена вне блокировки: обратный вызов отмененной задачи берет ее сам.
+        # Уже начатые задачи дорабатывают, но не кладут день в кэш
+        for future in stale:
+            future.cancel()
+        self._pump()
+
+    def cancel(self) -> None:
+        """Отмена всей предзагрузки (например, при закрытии окна)"""
+        self.prefetch([])
+
+    def _is_ready(self, day: date) -> bool:
+        return day in self._days and (self.stats_service is None or day in self.stats_service.memo)
+
+    def _pump(self) -> None:
+        """Запуск задач из очереди в пределах max_in_flight"""
+        while True:
+            with self._lock:
+                if not self._queue or len(self._in_flight) >= self.max_in_flight:
+                    return
+                day = self._queue.popleft()
+                self.scheduled += 1
+                future = self.executor.submit(self._load, day, priority=TaskPriority.PREFETCH,
+                                              task_id=f"prefetch_{day.isoformat()}")
+                self._in_flight[day] = future
+            future.add_done_callback(lambda done, day=day: self._finished(day, done))
+
+    def _load(self, day: date) -> None:
+        """Загрузка и декодирование дня, расчет его статистики (в фоновом потоке)
+
+        Ошибки чтения не показываются пользователю: задача завершается с
+        ошибкой (пул пишет ее в журнал), а день потом загружается обычным
+        load_day() в UI-потоке, где ошибка и будет показана.
+        """
+        if day not in self._days and self.data_manager is not None:
+            with self._lock:
+                version = self._versions.get(day, 0)
+            blocks = self.data_manager.read_day(day)
+            with self._lock:
+                # Пока день загружался, пользователь мог перейти к другому
+                if day not in self._wanted:
+                    return
+                if self._versions.get(day, 0) == version:
+                    self._prefetched.add(day)
+                    self._days.set(day, blocks)
+        if self.stats_service is not None:
+            self.stats_service.get(day)
+
+    def _finished(self, day: date, future) -> None:
+        with self._lock:
+            if self._in_flight.get(day) is future:
+                del self._in_flight[day]
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+        self._pump()
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    def load_day(self, day: date) -> List[Dict[str, Any]]:
+        """Блоки дня: из предзагрузки или с диска
+
+        Возвращаемый список общий с кэшем и не должен изменяться.
+        """
+        blocks = self._days.get(day)
+        with self._lock:
+            if blocks is not None:
+                self.hits += 1
+                if day in self._prefetched:
+                    self._prefetched.discard(day)
+                    self.useful += 1
+                return blocks
+            self.misses += 1
+            version = self._versions.get(day, 0)
+        blocks = self.data_manager.load_day(day) or []
+        with self._lock:
+            if self._versions.get(day, 0) == version:
+                self._days.set(day, blocks)
+        return blocks
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Попадания в предзагрузку и судьба запланированных задач"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / requests * 100) if requests else 0,
+                'scheduled': self.scheduled,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'useful': self.useful,
+                # Доля загруженных заранее дней, которые потом понадобились
+                'accuracy': (self.useful / self.completed * 100) if self.completed else 0,
+                'in_flight': len(self._in_flight),
+                'queued': len(self._queue)
+            }
+
+
+# Глобальный экземпляр (ленивая инициализация)
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+def get_prefetcher() -> NavigationPrefetcher:
+    """Получение глобального предзагрузчика со статистикой продуктивности"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            from cache_manager import get_cache_registry
+            from productivity_stats import get_productivity_stats_service
+            _prefetcher = NavigationPrefetcher(stats_service=get_productivity_stats_service())
+            get_cache_registry().register("prefetched_days", _prefetcher.cache)
+        return _prefetcher
@@ -0,0 +1,152 @@
+"""
+📈 Статистика продуктивности по дням
+Считает показатели дня из расписания и задач один раз и хранит результат,
+пока сохранение дня или изменение задач не затронет именно этот день
+"""
+
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List
+
+from cache_manager import MemoryCache
+
+
+class ProductivityStatsService:
+    """Запомненная статистика продуктивности по датам"""
+
+    # Статистика сегодняшнего и будущих дней перепроверяется: их данные
+    # могут меняться в обход подписок (например, правки в другом окне)
+    CURRENT_DAY_TTL = 60.0
+
+    def __init__(self, data_manager=None, task_manager=None, max_days: int = 3660):
+        self.data_manager = data_manager
+        self.task_manager = task_manager
+        self._memo = MemoryCache(max_size=max_days, policy="lru")
+        self._lock = threading.Lock()
+        # Версии дней: расчет, начатый до инвалидации, не сохраняет устаревший результат
+        self._versions: Dict[date, int] = {}
+        self.computed = 0
+
+    @property
+    def memo(self) -> MemoryCache:
+        return self._memo
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    def get(self, day: date) -> Dict[str, Any]:
+        """Статистика дня (копия, ее можно изменять)"""
+        stats = self._memo.get(day)
+        if stats is not None:
+            return dict(stats)
+
+        with self._lock:
+            version = self._versions.get(day, 0)
+        stats = self.compute(day)
+        ttl = self.CURRENT_DAY_TTL if day >= date.today() else None
+        with self._lock:
+            self.computed += 1
+            if self._versions.get(day, 0) == version:
+                self._memo.set(day, stats, ttl)
+        return dict(stats)
+
+    def get_range(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """Статистика каждого дня диапазона (включительно)"""
+        return [self.get(date.fromordinal(ordinal))
+                for ordinal in range(start.toordinal(), end.toordinal() + 1)]
+
+    def compute(self, day: date) -> Dict[str, Any]:
+        """Расчет статистики дня из расписания и задач
+
+        Вызывается и из фоновых потоков, поэтому день читается без сообщений
+        пользователю: ошибка чтения уходит исключением вызывающему.
+        """
+        blocks = []
+        if self.data_manager is not None:
+            blocks = self.data_manager.read_day(day)
+
+        focus_minutes = 0
+        for block in blocks:
+            start = datetime.fromisoformat(block["start_time"])
+            end = datetime.fromisoformat(block["end_time"])
+            focus_minutes += (end - start).total_seconds() / 60
+
+        if self.data_manager is not None:
+            score = self.data_manager.calculate_productivity_score_from_data(blocks)
+        else:
+            score = min(100, int((focus_minutes / (8 * 60)) * 100)) if blocks else 0
+
+        tasks = self.task_manager.get_tasks_for_date(day) if self.task_manager is not None else []
+        completed = sum(1 for task in tasks if getattr(task.status, "value", task.status) == "completed")
+
+        return {
+            'date': day.isoformat(),
+            'productivity_score': score / 100,
+            'completed_tasks': completed,
+            'total_tasks': len(tasks),
+            'focus_time': int(focus_minutes),  # минуты
+            'efficiency': completed / len(tasks) if tasks else 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # Инвалидация
+    # ------------------------------------------------------------------
+
+    def invalidate(self, days: Iterable[date]) -> None:
+        """Сброс статистики указанных дней"""
+        with self._lock:
+            for day in days:
+                self._versions[day] = self._versions.get(day, 0) + 1
+                self._memo.delete(day)
+
+    def clear(self) -> None:
+        """Сброс статистики всех дней"""
+        with self._lock:
+            for day in list(self._versions):
+                self._versions[day] += 1
+            self._memo.clear()
+
+    def attach(self, data_manager=None, task_manager=None) -> None:
+        """Источники данных и подписка на сохранение дней и изменения задач"""
+        if data_manager is not None:
+            self.data_manager = data_manager
+            data_manager.add_save_listener(self._on_day_saved)
+        if task_manager is not None:
+            self.task_manager = task_manager
+            task_manager.add_change_listener(self._on_tasks_changed)
+        self.clear()
+
+    def _on_day_saved(self, day: date, time_blocks: List[Dict[str, Any]],
+                      metadata: Dict[str, Any]) -> None:
+        self.invalidate([day])
+
+    def _on_tasks_changed(self, action: str, task: Any, dates) -> None:
+        self.invalidate(dates)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Запомненные дни и число расчетов"""
+        memo = self._memo.get_stats()
+        return {
+            'days': memo['size'],
+            'hits': memo['hits'],
+            'misses': memo['misses'],
+            'computed': self.computed
+        }
+
+
+# Глобальный экземпляр (ленивая инициализация)
+_stats_service = None
+_stats_service_lock = threading.Lock()
+
+def get_productivity_stats_service() -> ProductivityStatsService:
+    """Получение глобального сервиса статистики, подписанного на изменения задач"""
+    global _stats_service
+    with _stats_service_lock:
+        if _stats_service is None:
+            from cache_manager import get_cache_registry
+            from task_manager import get_task_manager
+            _stats_service = ProductivityStatsService()
+            _stats_service.attach(task_manager=get_task_manager())
+            get_cache_registry().register("productivity_stats", _stats_service.memo)
+        return _stats_service
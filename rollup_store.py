@@ -0,0 +1,504 @@
+"""
+📊 Хранилище агрегатов для долгосрочной аналитики
+Держит предрасчитанные сводки день → неделя → месяц → год, чтобы отчеты
+за длинные периоды (например, "Весь год") не загружали каждый день с диска
+"""
+
+import atexit
+import json
+import os
+import threading
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from data_manager import productivity_score_from_data
+
+# Суммируемые показатели одной сводки
+METRICS = (
+    "minutes",           # запланированные минуты блоков
+    "blocks",            # количество блоков
+    "tasks",             # количество задач
+    "completed_tasks",   # выполненные задачи
+    "productivity_sum",  # сумма оценок продуктивности по дням
+    "scored_days",       # дни с блоками (знаменатель средней продуктивности)
+    "active_days"        # дни с любыми данными
+)
+
+LEVELS = ("day", "week", "month", "year")
+
+# Источники дневных данных: расписание (PremiumDataManager) и задачи (TaskManager)
+SOURCES = ("schedule", "tasks")
+
+ROLLUP_FORMAT_VERSION = 1
+
+
+def _empty_record() -> Dict[str, float]:
+    return {metric: 0 for metric in METRICS}
+
+
+def _is_empty(record: Dict[str, float]) -> bool:
+    return all(not record.get(metric) for metric in METRICS)
+
+
+def _month_end(day: date) -> date:
+    if day.month == 12:
+        return date(day.year, 12, 31)
+    return date(day.year, day.month + 1, 1) - timedelta(days=1)
+
+
+def level_key(level: str, day: date) -> str:
+    """Ключ сводки заданного уровня, в которую входит день"""
+    if level == "day":
+        return day.isoformat()
+    if level == "week":
+        iso_year, iso_week, _ = day.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if level == "month":
+        return f"{day.year}-{day.month:02d}"
+    if level == "year":
+        return str(day.year)
+    raise ValueError(f"Unknown rollup level: {level}")
+
+
+def period_bounds(level: str, day: date) -> Tuple[date, date]:
+    """Первый и последний день периода заданного уровня, в который входит день"""
+    if level == "day":
+        return day, day
+    if level == "week":
+        monday = day - timedelta(days=day.weekday())
+        return monday, monday + timedelta(days=6)
+    if level == "month":
+        return date(day.year, day.month, 1), _month_end(day)
+    if level == "year":
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    raise ValueError(f"Unknown rollup level: {level}")
+
+
+def cover_range(start: date, end: date,
+                levels: Tuple[str, ...] = ("year", "month", "week")) -> List[Tuple[str, str]]:
+    """Разбиение диапазона на минимальный набор сводок
+
+    Внутренняя часть покрывается самыми крупными целыми периодами
+    (год, месяц, ISO-неделя), а остатки по краям - более мелкими,
+    вплоть до дневных сводок.
+    """
+    if start > end:
+        return []
+
+    for index, level in enumerate(levels):
+        # Первый период уровня, целиком начинающийся не раньше start
+        first_start, first_end = period_bounds(level, start)
+        if first_start < start:
+            first_start = first_end + timedelta(days=1)
+        if period_bounds(level, first_start)[1] > end:
+            continue
+
+        pieces = []
+        current = first_start
+        while True:
+            _, period_end = period_bounds(level, current)
+            if period_end > end:
+                break
+            pieces.append((level, level_key(level, current)))
+            current = period_end + timedelta(days=1)
+
+        finer = levels[index + 1:]
+        return (cover_range(start, first_start - timedelta(days=1), finer)
+                + pieces
+                + cover_range(current, end, finer))
+
+    days = []
+    current = start
+    while current <= end:
+        days.append(("day", level_key("day", current)))
+        current += timedelta(days=1)
+    return days
+
+
+class RollupStore:
+    """Инкрементально обновляемые сводки продуктивности"""
+
+    def __init__(self, path: Optional[str] = None, executor=None):
+        self.path = path or os.path.join("time_blocking_premium_data", "rollups.json")
+        self.logger = logging.getLogger(__name__)
+        # Пул для отложенной записи и пересчета (по умолчанию - общий фоновый пул)
+        self.executor = executor
+        self._lock = threading.RLock()
+        self._levels: Dict[str, Dict[str, Dict[str, float]]] = {level: {} for level in LEVELS}
+        # Дневные данные по источникам, чтобы обновление задач не затирало блоки и наоборот
+        self._day_sources: Dict[str, Dict[str, Dict[str, float]]] = {}
+        # Источники, история которых уже пересчитана (сохраняется в файле)
+        self._built_sources = set()
+        # Дни, обновленные во время пересчета: пересчет не затирает их более старыми данными
+        self._touched: Optional[set] = None
+        self._rebuild_depth = 0
+        self._backfilling = set()
+        self._dirty = False
+        self._save_pending = False
+        # Одновременные записи (фоновая и при выходе) не делят временный файл
+        self._save_lock = threading.Lock()
+        self.load()
+
+    # ------------------------------------------------------------------
+    # Обновление
+    # ------------------------------------------------------------------
+
+    def update_day_schedule(self, day: date, time_blocks: Iterable[Dict[str, Any]],
+                            productivity_score: Optional[float] = None) -> None:
+        """Обновление сводок после сохранения расписания дня"""
+        self._update_source(day, "schedule", self._schedule_values(time_blocks, productivity_score))
+
+    def update_day_tasks(self, day: date, tasks: Iterable[Any]) -> None:
+        """Обновление сводок после изменения задач дня"""
+        self._update_source(day, "tasks", self._task_values(tasks))
+
+    @staticmethod
+    def _schedule_values(time_blocks: Iterable[Dict[str, Any]],
+                         productivity_score: Optional[float]) -> Dict[str, float]:
+        blocks = list(time_blocks)
+        minutes = 0
+        for block in blocks:
+            start = datetime.fromisoformat(block["start_time"])
+            end = datetime.fromisoformat(block["end_time"])
+            minutes += (end - start).total_seconds() / 60
+
+        if productivity_score is None:
+            productivity_score = productivity_score_from_data(blocks)
+
+        return {
+            "minutes": minutes,
+            "blocks": len(blocks),
+            "productivity_sum": productivity_score if blocks else 0,
+            "scored_days": 1 if blocks else 0
+        }
+
+    @staticmethod
+    def _task_values(tasks: Iterable[Any]) -> Dict[str, float]:
+        tasks = list(tasks)
+        completed = sum(1 for task in tasks if getattr(task.status, "value", task.status) == "completed")
+        return {
+            "tasks": len(tasks),
+            "completed_tasks": completed
+        }
+
+    def _update_source(self, day: date, source: str, values: Dict[str, float],
+                       rebuilding: bool = False) -> None:
+        """Замена вклада одного источника в дневную сводку и распространение разницы"""
+        day_key = level_key("day", day)
+        with self._lock:
+            if self._touched is not None:
+                if rebuilding and (day_key, source) in self._touched:
+                    return
+                if not rebuilding:
+                    self._touched.add((day_key, source))
+
+            sources = self._day_sources.setdefault(day_key, {})
+            sources[source] = values
+
+            new_record = _empty_record()
+            for source_values in sources.values():
+                for metric, value in source_values.items():
+                    new_record[metric] += value
+            new_record["active_days"] = 1 if (new_record["blocks"] or new_record["tasks"]) else 0
+
+            old_record = self._levels["day"].get(day_key, _empty_record())
+            delta = {metric: new_record[metric] - old_record.get(metric, 0) for metric in METRICS}
+
+            if all(value == 0 for value in delta.values()):
+                if _is_empty(new_record):
+                    self._day_sources.pop(day_key, None)
+                return
+
+            for level in LEVELS:
+                key = level_key(level, day)
+                if level == "day":
+                    record = new_record
+                else:
+                    record = self._levels[level].get(key, _empty_record())
+                    for metric, value in delta.items():
+                        record[metric] = record.get(metric, 0) + value
+
+                if _is_empty(record):
+                    self._levels[level].pop(key, None)
+                else:
+                    self._levels[level][key] = record
+
+            if _is_empty(new_record):
+                self._day_sources.pop(day_key, None)
+
+        self._schedule_save()
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    def get_record(self, level: str, key: str) -> Dict[str, float]:
+        """Сводка одного периода"""
+        with self._lock:
+            return dict(self._levels[level].get(key, _empty_record()))
+
+    def query(self, start: date, end: date) -> Dict[str, Any]:
+        """Агрегированная статистика за диапазон дат (включительно)"""
+        totals = _empty_record()
+        pieces = cover_range(start, end)
+
+        with self._lock:
+            for level, key in pieces:
+                record = self._levels[level].get(key)
+                if record:
+                    for metric in METRICS:
+                        totals[metric] += record.get(metric, 0)
+
+        return self._with_derived(totals, pieces_read=len(pieces))
+
+    def series(self, level: str, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+        """Ряд сводок заданного уровня за диапазон (для графиков и тепловых карт)"""
+        result = {}
+        with self._lock:
+            current = start
+            while current <= end:
+                key = level_key(level, current)
+                if key not in result:
+                    record = self._levels[level].get(key)
+                    if record:
+                        result[key] = self._with_derived(dict(record))
+                current += timedelta(days=1)
+        return result
+
+    def _with_derived(self, record: Dict[str, float], **extra) -> Dict[str, Any]:
+        """Добавление производных показателей"""
+        tasks = record.get("tasks", 0)
+        scored_days = record.get("scored_days", 0)
+        record.update(extra)
+        record["hours"] = record.get("minutes", 0) / 60
+        record["completion_rate"] = (record.get("completed_tasks", 0) / tasks * 100) if tasks else 0
+        record["productivity_score"] = (record.get("productivity_sum", 0) / scored_days) if scored_days else 0
+        return record
+
+    # ------------------------------------------------------------------
+    # Подключение к источникам данных
+    # ------------------------------------------------------------------
+
+    def attach(self, data_manager=None, task_manager=None) -> None:
+        """Подписка на сохранение дней и изменения задач
+
+        История источника, который еще не пересчитывался (файла сводок не
+        было или он другой версии), один раз пересчитывается в фоне.
+        """
+        if data_manager is not None:
+            data_manager.add_save_listener(self._on_day_saved)
+        if task_manager is not None:
+            task_manager.add_change_listener(self._make_task_listener(task_manager))
+        self.schedule_backfill(data_manager, task_manager)
+
+    def _on_day_saved(self, day: date, time_blocks: List[Dict[str, Any]],
+                      metadata: Dict[str, Any]) -> None:
+        # Оценка из метаданных содержит бонус за разнообразие; сводки считаются той же
+        # формулой, что и при пересчете, иначе сохраненный и пересчитанный день расходятся
+        self.update_day_schedule(day, time_blocks)
+
+    def _make_task_listener(self, task_manager):
+        def on_tasks_changed(action, task, dates):
+            for day in dates:
+                self.update_day_tasks(day, task_manager.get_tasks_for_date(day))
+        return on_tasks_changed
+
+    # ------------------------------------------------------------------
+    # Пересчет
+    # ------------------------------------------------------------------
+
+    def pending_sources(self) -> List[str]:
+        """Источники, история которых еще не пересчитана"""
+        with self._lock:
+            return [source for source in SOURCES if source not in self._built_sources]
+
+    def schedule_backfill(self, data_manager=None, task_manager=None):
+        """Однократный пересчет истории непересчитанных источников в полосе обслуживания
+
+        Returns:
+            Future пересчета или None, если пересчитывать нечего
+        """
+        pending = self.pending_sources()
+        with self._lock:
+            if "schedule" not in pending or "schedule" in self._backfilling:
+                data_manager = None
+            if "tasks" not in pending or "tasks" in self._backfilling:
+                task_manager = None
+            if data_manager is None and task_manager is None:
+                return None
+            sources = {"schedule"} if data_manager is not None else set()
+            if task_manager is not None:
+                sources.add("tasks")
+            self._backfilling |= sources
+
+        def run():
+            try:
+                self.backfill(data_manager, task_manager)
+            finally:
+                with self._lock:
+                    self._backfilling -= sources
+
+        return self._submit(run, "rollup_backfill")
+
+    def backfill(self, data_manager=None, task_manager=None) -> None:
+        """Пересчет всей истории источников: сохраненные дни, задачи и уже известные сводкам дни"""
+        with self._lock:
+            known = {source: {date.fromisoformat(key) for key, sources in self._day_sources.items()
+                              if source in sources}
+                     for source in SOURCES}
+        schedule_days = sorted(known["schedule"] | set(data_manager.saved_days())) \
+            if data_manager is not None else []
+        task_days = sorted(known["tasks"] | {task.start_time.date() for task in task_manager.get_all_tasks()}) \
+            if task_manager is not None else []
+        self._rebuild_days(schedule_days, task_days, data_manager, task_manager)
+
+    def rebuild(self, start: date, end: date, data_manager=None, task_manager=None) -> None:
+        """Полный пересчет сводок за диапазон из исходных данных"""
+        days = []
+        current = start
+        while current <= end:
+            days.append(current)
+            current += timedelta(days=1)
+        self._rebuild_days(days if data_manager is not None else [],
+                           days if task_manager is not None else [],
+                           data_manager, task_manager)
+
+    def _rebuild_days(self, schedule_days: List[date], task_days: List[date],
+                      data_manager=None, task_manager=None) -> None:
+        """Пересчет заданных дней; файлы читаются без блокировки сводок"""
+        tasks_by_day: Dict[date, List[Any]] = {}
+        if task_manager is not None:
+            for task in task_manager.get_all_tasks():
+                tasks_by_day.setdefault(task.start_time.date(), []).append(task)
+
+        with self._lock:
+            self._rebuild_depth += 1
+            if self._touched is None:
+                self._touched = set()
+        try:
+            for day in schedule_days:
+                try:
+                    # Пересчет идет в фоне: ошибки чтения только в журнал
+                    blocks = data_manager.read_day(day)
+                except Exception as e:
+                    self.logger.warning(f"День {day} пропущен при пересчете сводок: {e}")
+                    continue
+                self._update_source(day, "schedule", self._schedule_values(blocks, None),
+                                    rebuilding=True)
+            for day in task_days:
+                self._update_source(day, "tasks", self._task_values(tasks_by_day.get(day, [])),
+                                    rebuilding=True)
+        finally:
+            with self._lock:
+                self._rebuild_depth -= 1
+                if not self._rebuild_depth:
+                    self._touched = None
+
+        with self._lock:
+            if data_manager is not None:
+                self._built_sources.add("schedule")
+            if task_manager is not None:
+                self._built_sources.add("tasks")
+            self._dirty = True
+        self.flush()
+
+    # ------------------------------------------------------------------
+    # Хранение
+    # ------------------------------------------------------------------
+
+    def load(self) -> None:
+        """Загрузка сводок с диска"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != ROLLUP_FORMAT_VERSION:
+                self.logger.warning("Неизвестная версия файла сводок, сводки будут пересчитаны")
+                return
+            with self._lock:
+                for level in LEVELS:
+                    self._levels[level] = data.get("levels", {}).get(level, {})
+                self._day_sources = data.get("day_sources", {})
+                # Файл без отметки о пересчете заполнялся только новыми изменениями
+                self._built_sources = set(data.get("built_sources", [])) & set(SOURCES)
+        except Exception as e:
+            self.logger.error(f"Ошибка загрузки сводок: {e}")
+
+    def _submit(self, func, task_id: str):
+        """Задача в полосе обслуживания фонового пула (без пула - сразу в текущем потоке)"""
+        try:
+            executor = self.executor
+            if executor is None:
+                from background_executor import get_background_executor
+                executor = get_background_executor()
+            from background_executor import TaskPriority
+            return executor.submit(func, priority=TaskPriority.MAINTENANCE, task_id=task_id)
+        except RuntimeError:
+            # Пул уже остановлен (выход из приложения)
+            func()
+            return None
+
+    def _schedule_save(self) -> None:
+        """Отложенная запись: изменения до начала записи попадают в одну запись"""
+        with self._lock:
+            self._dirty = True
+            if self._save_pending:
+                return
+            self._save_pending = True
+        self._submit(self.flush, "rollup_save")
+
+    def flush(self) -> bool:
+        """Запись несохраненных изменений в текущем потоке"""
+        with self._lock:
+            self._save_pending = False
+            if not self._dirty:
+                return True
+            self._dirty = False
+        if self.save():
+            return True
+        with self._lock:
+            self._dirty = True
+        return False
+
+    def save(self) -> bool:
+        """Атомарная запись сводок на диск"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._save_lock:
+                # Снимок берется под блокировкой записи: более старый снимок не перезапишет новый
+                with self._lock:
+                    payload = json.dumps({
+                        "version": ROLLUP_FORMAT_VERSION,
+                        "built_sources": sorted(self._built_sources),
+                        "levels": self._levels,
+                        "day_sources": self._day_sources
+                    }, separators=(",", ":"))
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения сводок: {e}")
+            return False
+
+
+# Глобальный экземпляр (ленивая инициализация)
+_rollup_store = None
+_rollup_store_lock = threading.Lock()
+
+def get_rollup_store() -> RollupStore:
+    """Получение глобального хранилища сводок, подписанного на изменения задач"""
+    global _rollup_store
+    with _rollup_store_lock:
+        if _rollup_store is None:
+            from task_manager import get_task_manager
+            _rollup_store = RollupStore()
+            # Отложенная запись не должна потеряться при выходе
+            atexit.register(_rollup_store.flush)
+            _rollup_store.attach(task_manager=get_task_manager())
+        return _rollup_store
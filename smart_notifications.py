@@ -203,21 +203,22 @@ class SmartNotificationManager(QObject):
         self.calendar_integration = CalendarIntegration()
         self.notifications_queue = []
         self.active_notifications = {}
-        self.check_timer = None
+        self.check_registered = False
         
-        # Отложенная инициализация таймера
+        # Отложенная регистрация проверки
         self.init_timer_delayed()
         
         # Системный трей для уведомлений
         self.setup_system_tray()
     
     def init_timer_delayed(self):
-        """Отложенная инициализация таймера в правильном потоке"""
-        from PyQt5.QtCore import QTimer
-        if self.check_timer is None:
-            self.check_timer = QTimer(self)
-            self.check_timer.timeout.connect(self.check_notifications)
-            self.check_timer.start(30000)  # Проверяем каждые 30 секунд
+        """Регистрация проверки в общем планировщике кадров"""
+        from frame_scheduler import get_frame_scheduler
+        if not self.check_registered:
+            # Проверяем каждые 30 секунд, если в очереди есть уведомления
+            get_frame_scheduler().register("smart_notifications", self.check_notifications, 30000,
+                                           active=lambda: bool(self.notifications_queue))
+            self.check_registered = True
     
     def setup_system_tray(self):
         """Настройка системного трея"""
@@ -0,0 +1,260 @@
+"""
+🐢 Сторожевой таймер зависаний главного потока
+Таймер Qt отмечается в главном потоке, а фоновый поток замечает, когда
+отметки перестают приходить, снимает стек главного потока и копит места
+зависаний в отчет, который можно приложить к сообщению об ошибке
+"""
+
+import json
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_THRESHOLDS_MS = (50, 250, 1000)
+
+# Кадры стандартной библиотеки, сторонних пакетов и самого сторожа не считаются местом зависания
+_LIBRARY_PREFIXES = tuple({os.path.normcase(path) for path in
+                           (sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"],
+                            sysconfig.get_paths()["platlib"], os.path.abspath(__file__))})
+
+
+def capture_stack(thread_id: int, limit: int = 30) -> List[str]:
+    """Стек потока от внешнего вызова к внутреннему ("файл:строка in функция")"""
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return []
+    return [f"{entry.filename}:{entry.lineno} in {entry.name}"
+            for entry in traceback.extract_stack(frame, limit=limit)]
+
+
+def stall_site(stack: List[str]) -> str:
+    """Место зависания: самый внутренний кадр кода приложения"""
+    for entry in reversed(stack):
+        if not os.path.normcase(entry).startswith(_LIBRARY_PREFIXES):
+            return entry
+    return stack[-1] if stack else "<unknown>"
+
+
+class StallWatchdog:
+    """Обнаружение остановок цикла событий главного потока
+
+    Пока главный поток занят, отметки таймера не приходят; если с последней
+    отметки прошло больше минимального порога, сторож снимает стек главного
+    потока при каждой проверке. Когда отметки возобновляются, зависание
+    записывается с длительностью и самым частым местом в стеке.
+    """
+
+    def __init__(self, thresholds_ms: Iterable[float] = DEFAULT_THRESHOLDS_MS,
+                 heartbeat_ms: Optional[float] = None, report_path: Optional[str] = None,
+                 main_thread_id: Optional[int] = None, max_events: int = 200,
+                 stack_limit: int = 30, report_interval: float = 5.0):
+        self.thresholds_ms = sorted(thresholds_ms)
+        if not self.thresholds_ms:
+            raise ValueError("at least one stall threshold is required")
+        # По умолчанию - половина минимального порога: простаивающий интерфейс
+        # просыпается редко, а зависание длиной в порог все равно замечается
+        self.heartbeat = (heartbeat_ms if heartbeat_ms is not None else self.thresholds_ms[0] / 2) / 1000
+        self.report_path = report_path
+        self.main_thread_id = main_thread_id or threading.main_thread().ident
+        self.stack_limit = stack_limit
+        self.report_interval = report_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._last_beat: Optional[float] = None
+        # Текущее зависание: время последней отметки перед ним и снятые стеки
+        self._stall: Optional[Dict[str, Any]] = None
+        self._last_report = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._timer = None
+
+        # Статистика
+        self.histogram = {threshold: 0 for threshold in self.thresholds_ms}
+        self.sites: Dict[str, Dict[str, Any]] = {}
+        self.events = deque(maxlen=max_events)
+
+    # ------------------------------------------------------------------
+    # Отметки главного потока
+    # ------------------------------------------------------------------
+
+    def beat(self) -> None:
+        """Отметка цикла событий (вызывается в главном потоке)"""
+        self._last_beat = time.perf_counter()
+
+    def install_heartbeat(self, parent=None) -> None:
+        """Таймер Qt, отмечающийся в цикле событий главного потока"""
+        from PyQt5.QtCore import QTimer
+        self._timer = QTimer(parent)
+        self._timer.timeout.connect(self.beat)
+        self._timer.start(max(1, int(self.heartbeat * 1000)))
+
+    def start(self, qt: bool = True, parent=None) -> None:
+        """Запуск сторожа (qt=False - отметки вызываются вручную через beat())"""
+        if qt:
+            self.install_heartbeat(parent)
+        self.beat()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # Проверка вдвое чаще минимального порога
+        interval = min(self.heartbeat, self.thresholds_ms[0] / 2000)
+
+        def watchdog_worker():
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    self.logger.error(f"Ошибка сторожа зависаний: {e}")
+
+        self._thread = threading.Thread(target=watchdog_worker, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановка сторожа и запись итогового отчета"""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.report_path:
+            self.write_report()
+
+    # ------------------------------------------------------------------
+    # Обнаружение
+    # ------------------------------------------------------------------
+
+    def check(self, now: Optional[float] = None) -> None:
+        """Одна проверка (вызывается потоком сторожа)"""
+        last_beat = self._last_beat
+        if last_beat is None:
+            return
+        now = time.perf_counter() if now is None else now
+
+        with self._lock:
+            stall = self._stall
+            if stall is not None and last_beat > stall['beat']:
+                # Отметки возобновились: зависание закончилось
+                self._stall = None
+                self._record(stall, (last_beat - stall['beat'] - self.heartbeat) * 1000)
+                stall = None
+
+            lag_ms = (now - last_beat - self.heartbeat) * 1000
+            if lag_ms < self.thresholds_ms[0]:
+                return
+            if stall is None:
+                stall = self._stall = {'beat': last_beat, 'samples': Counter(), 'stacks': {},
+                                       'hang_reported': False}
+
+            stack = capture_stack(self.main_thread_id, self.stack_limit)
+            site = stall_site(stack)
+            stall['samples'][site] += 1
+            stall['stacks'].setdefault(site, stack)
+            hang = lag_ms >= self.thresholds_ms[-1] and not stall['hang_reported']
+            if hang:
+                stall['hang_reported'] = True
+
+        if hang:
+            # Зависание может не закончиться: отчет пишется, пока оно идет
+            self.logger.warning(f"Главный поток не отвечает {lag_ms:.0f} мс: {site}")
+            if self.report_path:
+                self.write_report()
+
+    def _record(self, stall: Dict[str, Any], duration_ms: float) -> None:
+        """Учет закончившегося зависания (под блокировкой)"""
+        if duration_ms < self.thresholds_ms[0]:
+            return
+        threshold = max(value for value in self.thresholds_ms if duration_ms >= value)
+        site, _ = stall['samples'].most_common(1)[0]
+        stack = stall['stacks'][site]
+
+        self.histogram[threshold] += 1
+        counters = self.sites.get(site)
+        if counters is None:
+            counters = self.sites[site] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                           'by_threshold': {value: 0 for value in self.thresholds_ms},
+                                           'stack': stack}
+        counters['count'] += 1
+        counters['total_ms'] += duration_ms
+        counters['max_ms'] = max(counters['max_ms'], duration_ms)
+        counters['by_threshold'][threshold] += 1
+        self.events.append({
+            'at': datetime.now().isoformat(timespec="milliseconds"),
+            'duration_ms': round(duration_ms, 1),
+            'threshold_ms': threshold,
+            'site': site,
+            'stack': stack
+        })
+
+        if len(self.thresholds_ms) > 1 and duration_ms >= self.thresholds_ms[1]:
+            self.logger.warning(f"Главный поток был занят {duration_ms:.0f} мс: {site}")
+        if self.report_path and (time.time() - self._last_report >= self.report_interval
+                                 or threshold == self.thresholds_ms[-1]):
+            # Запись в фоне, чтобы не держать блокировку на время записи на диск
+            threading.Thread(target=self.write_report, name="StallReport", daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Отчет
+    # ------------------------------------------------------------------
+
+    def get_report(self, top_sites: int = 20) -> Dict[str, Any]:
+        """Гистограмма зависаний, самые дорогие места и последние события"""
+        with self._lock:
+            sites = sorted(self.sites.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+            return {
+                'generated_at': datetime.now().isoformat(timespec="seconds"),
+                'thresholds_ms': list(self.thresholds_ms),
+                'heartbeat_ms': self.heartbeat * 1000,
+                'stalls': sum(self.histogram.values()),
+                'histogram': {f"{threshold}ms": count for threshold, count in self.histogram.items()},
+                'sites': [
+                    {'site': site,
+                     'count': counters['count'],
+                     'total_ms': round(counters['total_ms'], 1),
+                     'max_ms': round(counters['max_ms'], 1),
+                     'by_threshold': {f"{threshold}ms": count
+                                      for threshold, count in counters['by_threshold'].items()},
+                     'stack': counters['stack']}
+                    for site, counters in sites[:top_sites]
+                ],
+                'stalling_now': self._stall is not None,
+                'recent': list(self.events)
+            }
+
+    def write_report(self, path: Optional[str] = None) -> bool:
+        """Атомарная запись отчета в JSON"""
+        path = path or self.report_path
+        try:
+            report = self.get_report()
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+            self._last_report = time.time()
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка записи отчета о зависаниях: {e}")
+            return False
+
+
+def start_stall_watchdog(parent=None) -> Optional[StallWatchdog]:
+    """Сторож зависаний с порогами из PerformanceConfig (None, если выключен)"""
+    from config_manager import get_config
+    performance = get_config().performance
+    if not performance.stall_watchdog:
+        return None
+    watchdog = StallWatchdog(performance.stall_thresholds_ms,
+                             report_path=os.path.join("time_blocking_premium_data", "stall_report.json"))
+    watchdog.start(parent=parent)
+    return watchdog
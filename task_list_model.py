@@ -0,0 +1,296 @@
+"""
+📋 Модель списка задач для QListView
+Строки дня хранятся отсортированными по времени начала и обновляются по
+одной по событиям TaskManager, а делегат рисует только видимые строки,
+поэтому список из тысяч задач не перестраивается целиком при каждом
+изменении.
+"""
+
+from bisect import bisect_left
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QPainter, QPen
+from PyQt5.QtWidgets import QListView, QStyle, QStyledItemDelegate
+
+from localization_system import _
+from task_manager import Task, TaskPriority, TaskStatus
+
+# Роли данных (Qt.UserRole - идентификатор задачи, как у прежних QListWidgetItem)
+TaskRole = Qt.UserRole + 1
+DetailsRole = Qt.UserRole + 2
+DescriptionRole = Qt.UserRole + 3
+
+STATUS_COLORS = {
+    TaskStatus.PLANNED: (70, 70, 70),        # Серый
+    TaskStatus.IN_PROGRESS: (255, 193, 7),   # Желтый
+    TaskStatus.COMPLETED: (76, 175, 80),     # Зеленый
+    TaskStatus.CANCELLED: (244, 67, 54)      # Красный
+}
+
+
+def status_text(status: TaskStatus) -> str:
+    """Текст статуса на текущем языке"""
+    status_map = {
+        TaskStatus.PLANNED: "status_planned",
+        TaskStatus.IN_PROGRESS: "status_in_progress",
+        TaskStatus.COMPLETED: "status_completed",
+        TaskStatus.CANCELLED: "status_cancelled"
+    }
+    return _(status_map[status]) if status in status_map else str(status.value)
+
+
+def priority_text(priority: TaskPriority) -> str:
+    """Текст приоритета на текущем языке"""
+    priority_map = {
+        TaskPriority.LOW: "priority_low",
+        TaskPriority.MEDIUM: "priority_medium",
+        TaskPriority.HIGH: "priority_high",
+        TaskPriority.URGENT: "priority_urgent"
+    }
+    return _(priority_map[priority]) if priority in priority_map else str(priority.value)
+
+
+def status_color(status: TaskStatus) -> QColor:
+    return QColor(*STATUS_COLORS.get(status, STATUS_COLORS[TaskStatus.PLANNED]))
+
+
+def task_sort_key(task: Task) -> Tuple[Any, str]:
+    """Порядок строк: время начала, при равенстве - идентификатор"""
+    return task.start_time, task.id
+
+
+class TaskListModel(QAbstractListModel):
+    """Задачи одного дня, отсортированные по времени начала
+
+    Подписывается на изменения TaskManager и применяет их построчно:
+    вставка, обновление, перемещение или удаление одной строки. Полная
+    перезагрузка нужна только при смене дня или языка.
+    """
+
+    # События из фоновых потоков доставляются в поток модели
+    _task_changed = pyqtSignal(str, object)
+
+    def __init__(self, task_manager=None, day: Optional[date] = None, parent=None):
+        super().__init__(parent)
+        self.task_manager = None
+        self.day = day
+        self._loaded_day: Optional[date] = None
+        self._tasks: List[Task] = []
+        self._keys: List[Tuple[Any, str]] = []
+        # Ключ строки по идентификатору: задача меняется на месте, старая позиция ищется по ключу
+        self._key_by_id: Dict[str, Tuple[Any, str]] = {}
+        self._task_changed.connect(self.apply_change, Qt.QueuedConnection)
+
+        # Статистика
+        self.counters = {'inserted': 0, 'updated': 0, 'moved': 0, 'removed': 0, 'reloads': 0}
+
+        if task_manager is not None:
+            self.attach(task_manager)
+
+    def attach(self, task_manager) -> None:
+        """Источник задач и подписка на его изменения"""
+        self.detach()
+        self.task_manager = task_manager
+        task_manager.add_change_listener(self._on_task_changed)
+        self.reload()
+
+    def detach(self) -> None:
+        if self.task_manager is not None:
+            self.task_manager.remove_change_listener(self._on_task_changed)
+            self.task_manager = None
+
+    def current_day(self) -> date:
+        """Показываемый день (None в self.day - сегодня)"""
+        if self.day is not None:
+            return self.day
+        return self.task_manager.get_moscow_time().date() if self.task_manager else date.today()
+
+    def reload(self) -> None:
+        """Полная перезагрузка строк дня"""
+        self.beginResetModel()
+        self._loaded_day = self.current_day()
+        tasks = self.task_manager.get_tasks_for_date(self._loaded_day) if self.task_manager else []
+        self._tasks = sorted(tasks, key=task_sort_key)
+        self._keys = [task_sort_key(task) for task in self._tasks]
+        self._key_by_id = {task.id: key for task, key in zip(self._tasks, self._keys)}
+        self.counters['reloads'] += 1
+        self.endResetModel()
+
+    def set_day(self, day: Optional[date]) -> None:
+        self.day = day
+        self.reload()
+
+    # ------------------------------------------------------------------
+    # Qt
+    # ------------------------------------------------------------------
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._tasks)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or not 0 <= index.row() < len(self._tasks):
+            return None
+        task = self._tasks[index.row()]
+
+        # Строки формируются только для запрошенных (видимых) строк
+        if role == Qt.DisplayRole:
+            return f"[{status_text(task.status)}] {task.title}"
+        if role == DetailsRole:
+            return (f"⏰ {task.start_time.strftime('%H:%M')} - {task.end_time.strftime('%H:%M')}"
+                    f" | 🎯 {priority_text(task.priority)}")
+        if role == DescriptionRole:
+            return f"📝 {task.description}" if task.description else ""
+        if role == Qt.ToolTipRole:
+            return task.description or None
+        if role == Qt.BackgroundRole:
+            return status_color(task.status)
+        if role == Qt.UserRole:
+            return task.id
+        if role == TaskRole:
+            return task
+        return None
+
+    # ------------------------------------------------------------------
+    # Доступ к строкам
+    # ------------------------------------------------------------------
+
+    def task_at(self, row: int) -> Optional[Task]:
+        return self._tasks[row] if 0 <= row < len(self._tasks) else None
+
+    def row_of(self, task_id: str) -> Optional[int]:
+        key = self._key_by_id.get(task_id)
+        return None if key is None else bisect_left(self._keys, key)
+
+    # ------------------------------------------------------------------
+    # Построчные изменения
+    # ------------------------------------------------------------------
+
+    def _on_task_changed(self, action: str, task: Task, dates) -> None:
+        if QThread.currentThread() is self.thread():
+            self.apply_change(action, task)
+        else:
+            self._task_changed.emit(action, task)
+
+    def apply_change(self, action: str, task: Task) -> None:
+        """Применение одного события TaskManager к строкам"""
+        old_row = self.row_of(task.id)
+        belongs = action != "deleted" and task.start_time.date() == self._loaded_day
+
+        if not belongs:
+            if old_row is not None:
+                self.beginRemoveRows(QModelIndex(), old_row, old_row)
+                self._pop(old_row, task.id)
+                self.endRemoveRows()
+                self.counters['removed'] += 1
+            return
+
+        key = task_sort_key(task)
+        if old_row is None:
+            row = bisect_left(self._keys, key)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._put(row, task, key)
+            self.endInsertRows()
+            self.counters['inserted'] += 1
+            return
+
+        position = bisect_left(self._keys, key)
+        # Позиция после удаления старой строки
+        new_row = position - 1 if position > old_row else position
+        if new_row != old_row:
+            # beginMoveRows ждет позицию назначения до удаления строки
+            self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(),
+                               new_row + 1 if new_row > old_row else new_row)
+            self._pop(old_row, task.id)
+            self._put(new_row, task, key)
+            self.endMoveRows()
+            self.counters['moved'] += 1
+        else:
+            self._tasks[old_row] = task
+            self._keys[old_row] = key
+            self._key_by_id[task.id] = key
+        index = self.index(new_row)
+        self.dataChanged.emit(index, index)
+        self.counters['updated'] += 1
+
+    def _pop(self, row: int, task_id: str) -> None:
+        del self._tasks[row]
+        del self._keys[row]
+        del self._key_by_id[task_id]
+
+    def _put(self, row: int, task: Task, key: Tuple[Any, str]) -> None:
+        self._tasks.insert(row, task)
+        self._keys.insert(row, key)
+        self._key_by_id[task.id] = key
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Число строк и построчных изменений"""
+        return dict(self.counters, rows=len(self._tasks))
+
+
+class TaskItemDelegate(QStyledItemDelegate):
+    """Карточка задачи: статус и название, время и приоритет, описание"""
+
+    ROW_HEIGHT = 84
+    MARGIN = 5
+    PADDING = 10
+
+    def sizeHint(self, option, index) -> QSize:
+        # Одинаковая высота строк: представление не измеряет каждую строку
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def paint(self, painter: QPainter, option, index: QModelIndex) -> None:
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        card = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+
+        if option.state & QStyle.State_Selected:
+            background = QColor("#FF2B43")
+        elif option.state & QStyle.State_MouseOver:
+            background = QColor("#3D3D3D")
+        else:
+            background = index.data(Qt.BackgroundRole) or QColor("#1E1E1E")
+        painter.setPen(QPen(QColor("#444444"), 1))
+        painter.setBrush(background)
+        painter.drawRoundedRect(card, 6, 6)
+
+        text = card.adjusted(self.PADDING, self.PADDING // 2, -self.PADDING, -self.PADDING // 2)
+        line_height = text.height() // 3
+        lines = (index.data(Qt.DisplayRole), index.data(DetailsRole), index.data(DescriptionRole))
+
+        painter.setPen(QColor("white"))
+        for number, line in enumerate(lines):
+            if not line:
+                continue
+            font = QFont(option.font)
+            font.setBold(number == 0)
+            painter.setFont(font)
+            rect = QRect(text.left(), text.top() + number * line_height, text.width(), line_height)
+            painter.drawText(rect, Qt.AlignLeft | Qt.AlignVCenter,
+                             painter.fontMetrics().elidedText(line, Qt.ElideRight, rect.width()))
+        painter.restore()
+
+
+class TaskListView(QListView):
+    """Список задач: одинаковые строки и надпись для пустого дня"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.placeholder_text = ""
+        self.setUniformItemSizes(True)
+        self.setMouseTracking(True)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.setItemDelegate(TaskItemDelegate(self))
+
+    def selected_task_id(self) -> Optional[str]:
+        index = self.currentIndex()
+        return index.data(Qt.UserRole) if index.isValid() else None
+
+    def paintEvent(self, event) -> None:
+        super().paintEvent(event)
+        if self.placeholder_text and (self.model() is None or self.model().rowCount() == 0):
+            painter = QPainter(self.viewport())
+            painter.setPen(QColor("#999999"))
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, self.placeholder_text)
@@ -1,8 +1,9 @@
 # task_manager.py - Менеджер задач с реальными данными
 import json
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import threading
+from datetime import datetime, timedelta, date
+from typing import List, Dict, Any, Optional, Callable, Set
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
@@ -92,16 +93,41 @@ class TaskManager:
     def __init__(self):
         self.tasks: List[Task] = []
         self.data_file = "tasks_data.json"
+        self._change_listeners: List[Callable[[str, Task, Set[date]], None]] = []
         self.load_tasks()
     
     def get_moscow_time(self) -> datetime:
         """Получение локального времени"""
         return datetime.now()
     
+    def add_change_listener(self, callback: Callable[[str, Task, Set[date]], None]):
+        """Подписка на изменения задач
+        
+        callback(action, task, dates) вызывается после сохранения, где action -
+        "added", "updated", "completed" или "deleted", а dates - дни, данные
+        которых затронуты изменением (для переноса задачи - старый и новый день).
+        """
+        if callback not in self._change_listeners:
+            self._change_listeners.append(callback)
+    
+    def remove_change_listener(self, callback: Callable[[str, Task, Set[date]], None]):
+        """Отписка от изменений задач"""
+        if callback in self._change_listeners:
+            self._change_listeners.remove(callback)
+    
+    def _notify_change(self, action: str, task: Task, dates: Set[date]):
+        """Оповещение подписчиков об изменении"""
+        for callback in list(self._change_listeners):
+            try:
+                callback(action, task, dates)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений задач: {e}")
+    
     def add_task(self, task: Task):
         """Добавление готовой задачи"""
         self.tasks.append(task)
         self.save_tasks()
+        self._notify_change("added", task, {task.start_time.date()})
     
     def get_all_tasks(self) -> List[Task]:
         """Получение всех задач"""
@@ -126,6 +152,7 @@ class TaskManager:
         
         self.tasks.append(task)
         self.save_tasks()
+        self._notify_change("added", task, {task.start_time.date()})
         return task
     
     def update_task(self, task_id: str, **kwargs) -> Optional[Task]:
@@ -135,6 +162,7 @@ class TaskManager:
             return None
         
         moscow_time = self.get_moscow_time()
+        previous_date = task.start_time.date()
         
         for key, value in kwargs.items():
             if hasattr(task, key):
@@ -142,6 +170,7 @@ class TaskManager:
         
         task.updated_at = moscow_time
         self.save_tasks()
+        self._notify_change("updated", task, {previous_date, task.start_time.date()})
         return task
     
     def delete_task(self, task_id: str) -> bool:
@@ -150,6 +179,7 @@ class TaskManager:
         if task:
             self.tasks.remove(task)
             self.save_tasks()
+            self._notify_change("deleted", task, {task.start_time.date()})
             return True
         return False
     
@@ -160,6 +190,7 @@ class TaskManager:
             moscow_time = self.get_moscow_time()
             task.mark_completed(moscow_time)
             self.save_tasks()
+            self._notify_change("completed", task, {task.start_time.date()})
             return task
         return None
     
@@ -170,16 +201,18 @@ class TaskManager:
                 return task
         return None
     
-    def get_tasks_for_today(self) -> List[Task]:
-        """Получение задач на сегодня"""
-        moscow_time = self.get_moscow_time()
-        today = moscow_time.date()
-        
+    def get_tasks_for_date(self, day: date) -> List[Task]:
+        """Получение задач за указанный день"""
         return [
             task for task in self.tasks
-            if task.start_time.date() == today
+            if task.start_time.date() == day
         ]
     
+    def get_tasks_for_today(self) -> List[Task]:
+        """Получение задач на сегодня"""
+        moscow_time = self.get_moscow_time()
+        return self.get_tasks_for_date(moscow_time.date())
+    
     def get_active_task(self) -> Optional[Task]:
         """Получение текущей активной задачи"""
         moscow_time = self.get_moscow_time()
@@ -288,5 +321,32 @@ class TaskManager:
             print(f"Ошибка загрузки файла задач: {e}")
             self.tasks = []
 
-# Глобальный экземпляр
-task_manager = TaskManager()
+# Глобальный экземпляр (ленивая инициализация: импорт модуля не читает файл задач)
+_task_manager = None
+_task_manager_lock = threading.Lock()
+
+# Тег записей кэша, вычисленных из задач (дни помечаются тегом "day:ГГГГ-ММ-ДД")
+TASKS_CACHE_TAG = "tasks"
+
+def _invalidate_task_caches(action: str, task: Task, dates: Set[date]):
+    """Инвалидация кэшированных значений, зависящих от задач"""
+    from cache_manager import get_cache_manager
+    cache = get_cache_manager()
+    cache.invalidate(tag=TASKS_CACHE_TAG)
+    for day in dates:
+        cache.invalidate(tag=f"day:{day.isoformat()}")
+
+def get_task_manager() -> TaskManager:
+    """Получение глобального менеджера задач"""
+    global _task_manager
+    with _task_manager_lock:
+        if _task_manager is None:
+            _task_manager = TaskManager()
+            _task_manager.add_change_listener(_invalidate_task_caches)
+        return _task_manager
+
+def __getattr__(name):
+    # Совместимость с `from task_manager import task_manager`
+    if name == "task_manager":
+        return get_task_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
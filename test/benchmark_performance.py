@@ -0,0 +1,575 @@
+# benchmark_performance.py - Замеры производительности слоя данных и кэша
+import os
+import sys
+import json
+import time
+import random
+import bisect
+import shutil
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+# Модули приложения лежат в корне проекта
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+class BenchmarkBlock:
+    """Блок времени без Qt для замеров"""
+
+    def __init__(self, block_id, start_time, minutes=30):
+        self.block_id = block_id
+        self.title = f"Задача {block_id}"
+        self.start_time = start_time
+        self.end_time = start_time + timedelta(minutes=minutes)
+        self.color = "#FF2B43"
+        self.notify = True
+
+    def get_duration_minutes(self):
+        return int((self.end_time - self.start_time).total_seconds() / 60)
+
+
+def print_header(title):
+    print("=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def measure(func, repeat):
+    """Среднее время одного вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark_schedule_formats(blocks_per_day=40, repeat=2000):
+    """Размер и скорость декодирования файлов дня в форматах 2.0 и 3.0"""
+    from data_manager import PremiumDataManager
+
+    print_header(f"ФОРМАТЫ РАСПИСАНИЯ ({blocks_per_day} блоков)")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        day = datetime(2025, 10, 3, 8, 0)
+        blocks = [BenchmarkBlock(i, day + timedelta(minutes=15 * i)) for i in range(blocks_per_day)]
+        results = {}
+
+        for version in ("2.0", "3.0"):
+            manager = PremiumDataManager(os.path.join(temp_dir, version), format_version=version)
+            manager.write_day(blocks, day.date(), create_backup=False)
+            filename = manager.find_day_file(day.date())
+            with open(filename, 'rb') as f:
+                raw = f.read()
+
+            decode_ms = measure(lambda: manager.decode_day(raw), repeat)
+            intervals_ms = measure(lambda: manager.load_day_intervals(day.date()), repeat)
+            results[version] = (len(raw), decode_ms, intervals_ms)
+            print(f"Формат {version}: {len(raw):7d} байт, декодирование {decode_ms:.3f} мс, "
+                  f"интервалы для статистики {intervals_ms:.3f} мс")
+
+        size_ratio = results["2.0"][0] / results["3.0"][0]
+        speed_ratio = results["2.0"][1] / results["3.0"][1]
+        intervals_ratio = results["2.0"][2] / results["3.0"][2]
+        print(f"\nРазмер меньше в {size_ratio:.1f} раз, полное декодирование быстрее в "
+              f"{speed_ratio:.1f} раз, чтение интервалов быстрее в {intervals_ratio:.1f} раз")
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def benchmark_diff_writes(blocks_per_day=40, edits=100):
+    """Запись правки одного блока: журнал изменений против полной перезаписи дня"""
+    from data_manager import PremiumDataManager
+    
+    print_header(f"ЗАПИСЬ ПРАВОК ({blocks_per_day} блоков, {edits} правок)")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        day = datetime(2025, 10, 3, 8, 0)
+        results = {}
+        
+        for mode in ("full", "patch"):
+            manager = PremiumDataManager(os.path.join(temp_dir, mode))
+            if mode == "full":
+                # Каждая правка консолидирует журнал - поведение до журнала изменений
+                manager.MAX_PATCHES_PER_DAY = 0
+            blocks = [BenchmarkBlock(i, day + timedelta(minutes=15 * i)) for i in range(blocks_per_day)]
+            manager.write_day(blocks, day.date())
+            
+            start = time.perf_counter()
+            for edit in range(edits):
+                blocks[edit % blocks_per_day].title = f"Правка {edit}"
+                manager.write_day(blocks, day.date())
+            elapsed_ms = (time.perf_counter() - start) / edits * 1000
+            
+            data_bytes = sum(os.path.getsize(os.path.join(manager.data_dir, f))
+                             for f in os.listdir(manager.data_dir) if f.startswith("schedule_"))
+            backups = os.listdir(manager.backup_dir)
+            backup_bytes = sum(os.path.getsize(os.path.join(manager.backup_dir, f)) for f in backups)
+            # Каждая копия (полная или патч) - одна восстанавливаемая версия дня
+            per_version = backup_bytes / len(backups)
+            results[mode] = (elapsed_ms, data_bytes, per_version)
+            print(f"{mode:6s}: {elapsed_ms:.3f} мс на правку, файлы дня {data_bytes} байт, "
+                  f"версий в копиях {len(backups)}, {per_version:.0f} байт на версию")
+        
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def benchmark_headless_startup(runs=5):
+    """Время запуска пакетной задачи: слой данных без Qt против загрузки PyQt5"""
+    print_header("ЗАПУСК ПАКЕТНОЙ ЗАДАЧИ (импорт слоя данных)")
+    
+    data_layer = "import data_manager, task_manager, cache_manager, localization_system, rollup_store"
+    scenarios = {
+        "без Qt": data_layer,
+        "с PyQt5": "import PyQt5.QtWidgets; " + data_layer
+    }
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "{imports}\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        "print(elapsed, any(m.startswith('PyQt5') for m in sys.modules))\n"
+    )
+    
+    temp_dir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for name, imports in scenarios.items():
+            timings = []
+            qt_loaded = False
+            for _ in range(runs):
+                output = subprocess.run([sys.executable, "-c", script.format(imports=imports)],
+                                        cwd=temp_dir, env=dict(os.environ, PYTHONPATH=PROJECT_ROOT),
+                                        capture_output=True, text=True, check=True).stdout.split()
+                timings.append(float(output[0]))
+                qt_loaded = output[1] == "True"
+            timings.sort()
+            results[name] = timings[len(timings) // 2]
+            print(f"{name:8s}: медиана импорта {results[name]:.1f} мс, PyQt5 загружен: {qt_loaded}")
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def zipf_trace(length, keys, alpha=1.0, seed=42):
+    """Обращения к ключам с распределением Ципфа (малая доля ключей - большая часть запросов)"""
+    rng = random.Random(seed)
+    cumulative = []
+    total = 0.0
+    for rank in range(1, keys + 1):
+        total += 1.0 / rank ** alpha
+        cumulative.append(total)
+    return [f"k{bisect.bisect_left(cumulative, rng.random() * total)}" for _ in range(length)]
+
+
+def scan_trace(length, hot_keys, scan_length, seed=42):
+    """Горячий набор ключей, прерываемый длинными однократными проходами (экспорт, отчеты)"""
+    hot = zipf_trace(length, hot_keys, seed=seed)
+    trace = []
+    scan_number = 0
+    for index, key in enumerate(hot):
+        trace.append(key)
+        if index % (scan_length * 2) == 0:
+            trace.extend(f"scan{scan_number}-{i}" for i in range(scan_length))
+            scan_number += 1
+    return trace
+
+
+class LegacyMemoryCache:
+    """Прежний MemoryCache: вытеснение через min() по всем ключам"""
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._cache = {}
+    
+    def get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        entry[1] = time.time()
+        return entry[0]
+    
+    def set(self, key, value):
+        if len(self._cache) >= self.max_size and key not in self._cache:
+            lru_key = min(self._cache.keys(), key=lambda k: self._cache[k][1])
+            del self._cache[lru_key]
+        self._cache[key] = [value, time.time()]
+
+
+def run_cache_trace(cache, trace):
+    """Прогон трассы "get, при промахе set"; возвращает (доля попаданий, операций в секунду)"""
+    hits = 0
+    start = time.perf_counter()
+    for key in trace:
+        if cache.get(key) is None:
+            cache.set(key, key)
+        else:
+            hits += 1
+    elapsed = time.perf_counter() - start
+    return hits / len(trace) * 100, len(trace) / elapsed
+
+
+def benchmark_cache_policies(capacity=1000, length=200000):
+    """Доля попаданий и скорость политик вытеснения MemoryCache"""
+    from cache_manager import MemoryCache
+    
+    print_header(f"ПОЛИТИКИ ВЫТЕСНЕНИЯ (емкость {capacity})")
+    
+    traces = {
+        "ципф": zipf_trace(length, capacity * 10),
+        "сканы": scan_trace(length // 2, capacity * 2, capacity * 5)
+    }
+    results = {}
+    for trace_name, trace in traces.items():
+        print(f"\nТрасса '{trace_name}': {len(trace)} обращений")
+        candidates = [("legacy", LegacyMemoryCache(capacity))]
+        candidates += [(policy, MemoryCache(capacity, policy=policy)) for policy in ("lru", "lfu", "arc")]
+        for name, cache in candidates:
+            hit_rate, ops = run_cache_trace(cache, trace)
+            results[(trace_name, name)] = (hit_rate, ops)
+            print(f"  {name:7s}: попадания {hit_rate:5.1f}%, {ops:10.0f} операций/с")
+    return results
+
+
+def benchmark_cache_threads(capacity=1000, ops_per_thread=50000, thread_counts=(1, 4, 8)):
+    """Пропускная способность кэша в памяти при обращениях из нескольких потоков"""
+    from cache_manager import MemoryCache, ShardedMemoryCache
+    
+    print_header("МНОГОПОТОЧНЫЙ ДОСТУП К КЭШУ В ПАМЯТИ")
+    
+    traces = [zipf_trace(ops_per_thread, capacity * 4, seed=seed) for seed in range(max(thread_counts))]
+    
+    def worker(cache, trace, barrier):
+        barrier.wait()
+        for key in trace:
+            if cache.get(key) is None:
+                cache.set(key, key)
+    
+    results = {}
+    for threads in thread_counts:
+        for name, cache in (("один замок", MemoryCache(capacity)),
+                            ("16 сегментов", ShardedMemoryCache(capacity, shards=16))):
+            barrier = threading.Barrier(threads + 1)
+            workers = [threading.Thread(target=worker, args=(cache, traces[index], barrier))
+                       for index in range(threads)]
+            for thread in workers:
+                thread.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            
+            ops = threads * ops_per_thread / elapsed
+            results[(threads, name)] = ops
+            print(f"{threads} потоков, {name:12s}: {ops:10.0f} операций/с, "
+                  f"попадания {cache.get_stats()['hit_rate']:.1f}%")
+    
+    # Задержка чтения, пока другой поток обходит весь кэш (cleanup_expired)
+    print()
+    large = 100000
+    for name, cache in (("один замок", MemoryCache(large, default_ttl=3600)),
+                        ("16 сегментов", ShardedMemoryCache(large, default_ttl=3600, shards=16))):
+        for index in range(large):
+            cache.set(f"k{index}", index)
+        stop = threading.Event()
+        
+        def maintenance():
+            while not stop.is_set():
+                cache.cleanup_expired()
+        
+        cleaner = threading.Thread(target=maintenance)
+        cleaner.start()
+        latencies = []
+        for index in range(20000):
+            start = time.perf_counter()
+            cache.get(f"k{index}")
+            latencies.append((time.perf_counter() - start) * 1000)
+        stop.set()
+        cleaner.join()
+        
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+        results[("latency", name)] = (p99, latencies[-1])
+        print(f"Чтение во время очистки, {name:12s}: p99 {p99:.3f} мс, максимум {latencies[-1]:.3f} мс")
+    return results
+
+
+def benchmark_file_cache_writes(existing_files=2000, writes=300):
+    """Запись в файловый кэш при большом числе уже сохраненных файлов"""
+    from cache_manager import FileCache
+    
+    print_header(f"ЗАПИСЬ В ФАЙЛОВЫЙ КЭШ ({existing_files} файлов в каталоге)")
+    
+    class LegacyFileCache(FileCache):
+        """Прежнее поведение: обход и stat() всего каталога при каждой записи"""
+        
+        def set(self, key, value, ttl=None):
+            sum(f.stat().st_size for f in self.cache_dir.glob("*.cache"))
+            return super().set(key, value, ttl)
+    
+    temp_dir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for name, cache_class in (("legacy", LegacyFileCache), ("индекс", FileCache)):
+            cache = cache_class(os.path.join(temp_dir, name), max_size_mb=100)
+            for index in range(existing_files):
+                cache.set(f"warm{index}", {"index": index})
+            
+            elapsed_ms = measure(lambda: cache.set(f"key{time.perf_counter_ns()}", {"x": 1}), writes)
+            results[name] = elapsed_ms
+            print(f"{name:7s}: {elapsed_ms:.3f} мс на запись")
+            cache.close()
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def benchmark_file_cache_backends(entries=2000, repeat=2000):
+    """Файл на ключ против сегментов с дозаписью: скорость и число файлов"""
+    from cache_manager import FileCache, SegmentFileCache
+    
+    print_header(f"ФАЙЛОВЫЙ КЭШ: БЭКЕНДЫ ({entries} записей)")
+    
+    temp_dir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for name, cache_class in (("файлы", FileCache), ("сегменты", SegmentFileCache)):
+            directory = os.path.join(temp_dir, name)
+            cache = cache_class(directory, max_size_mb=100)
+            counter = iter(range(10 ** 9))
+            set_ms = measure(lambda: cache.set(f"key{next(counter) % entries}",
+                                               {"stats": list(range(20))}), entries)
+            rng = random.Random(1)
+            get_ms = measure(lambda: cache.get(f"key{rng.randrange(entries)}"), repeat)
+            cache.close()
+            
+            files = sum(len(names) for _, _, names in os.walk(directory))
+            results[name] = (set_ms, get_ms, files)
+            print(f"{name:9s}: запись {set_ms:.3f} мс, чтение {get_ms:.3f} мс, файлов на диске {files}")
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def benchmark_write_behind(entries=500, keys=50):
+    """Задержка CacheManager.set: синхронная запись на диск против отложенной"""
+    from pathlib import Path
+    from cache_manager import CacheManager
+    
+    print_header(f"ОТЛОЖЕННАЯ ЗАПИСЬ ({entries} вызовов set, {keys} ключей)")
+    
+    temp_dir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for name, write_behind in (("синхронно", False), ("отложенно", True)):
+            manager = CacheManager(memory_cache_size=keys * 2, file_cache_size_mb=100,
+                                   write_behind=write_behind)
+            manager.file_cache.cache_dir = Path(temp_dir) / name
+            counter = iter(range(10 ** 9))
+            set_ms = measure(lambda: manager.set(f"key{next(counter) % keys}",
+                                                 {"stats": list(range(200))}), entries)
+            start = time.perf_counter()
+            manager.flush()
+            flush_ms = (time.perf_counter() - start) * 1000
+            stats = manager.get_stats()['write_behind']
+            manager.close()
+            
+            results[name] = (set_ms, flush_ms, stats)
+            line = f"{name:9s}: set {set_ms:.3f} мс, flush {flush_ms:.1f} мс"
+            if stats:
+                line += (f", записано {stats['written']}, объединено {stats['coalesced']},"
+                         f" синхронно при переполнении {stats['sync_writes']}")
+            print(line)
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def benchmark_expiry(entries=50000, ttl=0.5):
+    """Удаление истекших записей общим потоком по куче сроков"""
+    from cache_manager import ExpiryReaper, MemoryCache
+    
+    print_header(f"ИСТЕЧЕНИЕ ЗАПИСЕЙ ({entries} записей, ttl {ttl} с)")
+    
+    results = {}
+    cache = MemoryCache(max_size=entries * 2)
+    start = time.perf_counter()
+    for index in range(entries):
+        cache.set(f"plain{index}", index)
+    results["set_plain"] = entries / (time.perf_counter() - start)
+    
+    reaper = ExpiryReaper()
+    cache = MemoryCache(max_size=entries * 2, reaper=reaper)
+    start = time.perf_counter()
+    for index in range(entries):
+        cache.set(f"ttl{index}", index, ttl=ttl)
+    results["set_ttl"] = entries / (time.perf_counter() - start)
+    deadline = time.time() + ttl
+    print(f"set без ttl: {results['set_plain']:.0f} операций/с, с ttl: {results['set_ttl']:.0f} операций/с")
+    
+    # Чтения во время удаления: жнец держит блокировку не дольше одной порции
+    latencies = []
+    while cache.get_stats()['size'] and time.time() < deadline + 10:
+        started = time.perf_counter()
+        cache.get("missing")
+        latencies.append((time.perf_counter() - started) * 1000)
+    lag_ms = (time.time() - deadline) * 1000
+    reaper.stop()
+    
+    latencies.sort()
+    results["reclaim_lag_ms"] = lag_ms
+    results["max_read_ms"] = latencies[-1] if latencies else 0.0
+    print(f"Все записи удалены через {lag_ms:.0f} мс после срока "
+          f"(было: до 300 с), максимум чтения {results['max_read_ms']:.3f} мс")
+    return results
+
+
+def benchmark_cached_overhead(repeat=50000):
+    """Накладные расходы декоратора cached на попадание: построение ключа"""
+    import hashlib
+    from cache_manager import CacheManager, cached
+    import cache_manager as cache_module
+    
+    print_header(f"НАКЛАДНЫЕ РАСХОДЫ @cached ({repeat} вызовов)")
+    
+    def legacy_key(*args, **kwargs):
+        # Ключ до изменения: str(args) + str(kwargs) через md5 на каждый вызов
+        args_str = str(args) + str(sorted(kwargs.items()))
+        return f"legacy:{hashlib.md5(args_str.encode()).hexdigest()}"
+    
+    class Stats:
+        def __init__(self):
+            self.history = list(range(100))
+        
+        @cached(ttl=600)
+        def total(self, day, kind="all"):
+            return len(self.history)
+    
+    @cached(ttl=600, key_func=legacy_key)
+    def legacy(day, kind="all"):
+        return day
+    
+    @cached(ttl=600)
+    def typed(day, kind="all"):
+        return day
+    
+    def plain(day, kind="all"):
+        return day
+    
+    manager = CacheManager(memory_cache_size=1000)
+    original = cache_module.get_cache_manager
+    cache_module.get_cache_manager = lambda: manager
+    results = {}
+    try:
+        stats = Stats()
+        cases = (
+            ("без кэша", lambda: plain("2025-10-03", kind="tasks")),
+            ("md5-ключ", lambda: legacy("2025-10-03", kind="tasks")),
+            ("типизированный", lambda: typed("2025-10-03", kind="tasks")),
+            ("метод", lambda: stats.total("2025-10-03", kind="tasks"))
+        )
+        for name, call in cases:
+            call()
+            # Лучший из нескольких прогонов: короткие вызовы чувствительны к шуму
+            results[name] = min(measure(call, repeat // 5) for _ in range(5)) * 1000
+            print(f"{name:15s}: {results[name]:.2f} мкс на вызов")
+    finally:
+        cache_module.get_cache_manager = original
+        manager.close()
+    return results
+
+
+def benchmark_serializers(days=365, repeat=50):
+    """Сериализаторы файлового кэша на годовой сводке из примитивов"""
+    from cache_manager import SerializerRegistry
+    
+    print_header(f"СЕРИАЛИЗАТОРЫ ФАЙЛОВОГО КЭША ({days} дней)")
+    
+    value = {
+        f"2025-{day // 28 % 12 + 1:02d}-{day % 28 + 1:02d}": {
+            "hours": day % 9 + 0.5, "tasks": day % 7, "completed": day % 5,
+            "categories": ["work", "study", "rest"][:day % 3 + 1]
+        }
+        for day in range(days)
+    }
+    results = {}
+    for name in ("pickle", "marshal", "json"):
+        for threshold in (None, 16 * 1024):
+            registry = SerializerRegistry(default=name, compress_threshold=threshold)
+            data = registry.encode("stats:year", value)
+            write_ms = measure(lambda: registry.encode("stats:year", value), repeat)
+            read_ms = measure(lambda: registry.decode(data), repeat)
+            label = f"{name}{'+zlib' if threshold else ''}"
+            results[label] = (write_ms, read_ms, len(data))
+            print(f"{label:13s}: запись {write_ms:.3f} мс, чтение {read_ms:.3f} мс, {len(data) / 1024:.1f} КБ")
+    return results
+
+
+def benchmark_background_executor(background_tasks=200, task_seconds=0.002, workers=4):
+    """Задержка интерактивной задачи за очередью фоновых: одна FIFO-очередь и пул с приоритетами"""
+    import queue
+    import threading
+    from background_executor import PriorityExecutor, TaskPriority
+    
+    print_header(f"ФОНОВЫЕ ЗАДАЧИ ({background_tasks} фоновых по {task_seconds * 1000:.0f} мс)")
+    
+    # Прежний обработчик: один поток, FIFO
+    tasks = queue.Queue()
+    
+    def fifo_worker():
+        while True:
+            func = tasks.get()
+            if func is None:
+                return
+            func()
+    
+    worker = threading.Thread(target=fifo_worker, daemon=True)
+    worker.start()
+    done = threading.Event()
+    for _ in range(background_tasks):
+        tasks.put(lambda: time.sleep(task_seconds))
+    started = time.perf_counter()
+    tasks.put(done.set)
+    done.wait()
+    fifo_ms = (time.perf_counter() - started) * 1000
+    tasks.put(None)
+    worker.join()
+    
+    executor = PriorityExecutor(max_workers=workers)
+    for _ in range(background_tasks):
+        executor.submit(time.sleep, task_seconds, priority=TaskPriority.MAINTENANCE)
+    started = time.perf_counter()
+    executor.submit(lambda: None).result()
+    priority_ms = (time.perf_counter() - started) * 1000
+    executor.shutdown(cancel_pending=True)
+    
+    print(f"FIFO, 1 поток      : {fifo_ms:.1f} мс до интерактивной задачи")
+    print(f"Приоритеты, {workers} потока: {priority_ms:.2f} мс до интерактивной задачи")
+    return fifo_ms, priority_ms
+
+
+def main():
+    print("ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ TIME BLOCKING")
+    benchmark_schedule_formats()
+    benchmark_diff_writes()
+    benchmark_headless_startup()
+    benchmark_cache_policies()
+    benchmark_cache_threads()
+    benchmark_file_cache_writes()
+    benchmark_file_cache_backends()
+    benchmark_write_behind()
+    benchmark_expiry()
+    benchmark_cached_overhead()
+    benchmark_serializers()
+    benchmark_background_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,8 @@ class ProductivityAnalyzer:
     def __init__(self):
         self.cache = get_cache_manager()
     
-    @cached(ttl=300, use_file_cache=True)  # Кэшируем на 5 минут
+    # Кэшируем на 5 минут; изменения задач дня сбрасывают результат по тегам
+    @cached(ttl=300, use_file_cache=True, tags=lambda self, date: {"tasks", f"day:{date}"})
     def analyze_daily_productivity(self, date: str) -> Dict:
         """Анализ продуктивности за день (тяжелая операция)"""
         print(f"Выполняем анализ продуктивности за {date}...")
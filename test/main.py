@@ -17,7 +17,7 @@ from animations import (FadeAnimation, SlideAnimation, NotificationAnimator,
 from modern_widgets import PremiumButton, GlassFrame, GradientLabel, StatisticsCard, NavigationBar
 from time_block import PremiumTimeBlock
 from time_scale import PremiumTimeScale
-from data_manager import PremiumDataManager
+from data_manager import PremiumDataManager, AutoSaveService, ScheduleMigrator, snapshot_blocks
 from notification_manager import PremiumNotificationManager
 from settings import SettingsDialog, get_settings
 
@@ -144,6 +144,24 @@ class MainWindow(QMainWindow):
         
         # Менеджеры
         self.data_manager = PremiumDataManager()
+        self.autosave = None
+        try:
+            from rollup_store import get_rollup_store
+            get_rollup_store().attach(data_manager=self.data_manager)
+        except Exception as e:
+            print(f"Сводки аналитики недоступны: {e}")
+        try:
+            from productivity_stats import get_productivity_stats_service
+            get_productivity_stats_service().attach(data_manager=self.data_manager)
+        except Exception as e:
+            print(f"Статистика продуктивности недоступна: {e}")
+        try:
+            from prefetcher import get_prefetcher
+            self.prefetcher = get_prefetcher()
+            self.prefetcher.attach(data_manager=self.data_manager)
+        except Exception as e:
+            print(f"Предзагрузка дней недоступна: {e}")
+            self.prefetcher = None
         self.notification_manager = PremiumNotificationManager(self)
         
         # Загрузка настроек
@@ -618,11 +636,11 @@ class MainWindow(QMainWindow):
     def add_time_block(self, start_time, end_time, title="Новая задача"):
         """Добавление временного блока с анимацией"""
         block = PremiumTimeBlock(start_time, end_time, title)
-        block.deleted.connect(self.delete_time_block)
-        block.edited.connect(self.update_time_block)
+        self.connect_block(block)
         
         self.time_blocks.append(block)
         self.blocks_layout.addWidget(block)
+        self.mark_day_dirty()
         
         # Показываем блок
         block.show()
@@ -633,6 +651,13 @@ class MainWindow(QMainWindow):
         self.update_stats()
         self.statusBar().showMessage(f"Добавлен блок: {title}")
     
+    def connect_block(self, block):
+        """Подписка на изменения блока: каждая сохраняемая правка помечает день"""
+        block.deleted.connect(self.delete_time_block)
+        block.edited.connect(self.update_time_block)
+        block.time_changed.connect(self.mark_day_dirty)
+        block.color_changed.connect(self.mark_day_dirty)
+    
     def animate_block_appearance(self, block):
         """Анимация появления блока"""
         bouncy_anim = BouncyAnimation(block, duration=600)
@@ -654,14 +679,22 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             self.time_blocks.remove(block)
             block.deleteLater()
+            self.mark_day_dirty()
             self.update_stats()
             self.statusBar().showMessage("Блок удален")
     
     def update_time_block(self, block):
         """Обновление временного блока"""
+        self.mark_day_dirty()
         self.update_stats()
         self.statusBar().showMessage(f"Обновлен блок: {block.title}")
     
+    def mark_day_dirty(self, *args):
+        """Пометка текущего дня как измененного для автосохранения"""
+        if self.autosave is not None:
+            # Фоновый поток получает копию полей, а не живые виджеты
+            self.autosave.mark_dirty(self.current_date, snapshot_blocks(self.time_blocks))
+    
     def new_day(self):
         """Начало нового дня"""
         reply = QMessageBox.question(self, "Новый день", 
@@ -671,6 +704,9 @@ class MainWindow(QMainWindow):
         if reply != QMessageBox.Cancel:
             if reply == QMessageBox.Yes:
                 self.save_current_day()
+            # Сохраненный или отвергнутый день не должен дописаться автосохранением позже
+            if self.autosave is not None:
+                self.autosave.discard(self.current_date)
             
             # Очистка блоков
             for block in self.time_blocks:
@@ -693,7 +729,12 @@ class MainWindow(QMainWindow):
     
     def load_current_day(self):
         """Загрузка текущего дня"""
-        blocks_data = self.data_manager.load_day(self.current_date)
+        if self.prefetcher is not None:
+            blocks_data = self.prefetcher.load_day(self.current_date)
+            # Пока пользователь смотрит день, в фоне готовятся соседние
+            self.prefetcher.view_day(self.current_date)
+        else:
+            blocks_data = self.data_manager.load_day(self.current_date)
         
         for block_data in blocks_data:
             try:
@@ -706,9 +747,12 @@ class MainWindow(QMainWindow):
                     block_data.get("color", "#FF2B43"),
                     block_data.get("notify", True)
                 )
+                # Сохраненный id нужен, чтобы следующее сохранение записало только разницу
+                block.block_id = block_data.get("id", block.block_id)
+                if block_data.get("created_at"):
+                    block.created_at = block_data["created_at"]
                 
-                block.deleted.connect(self.delete_time_block)
-                block.edited.connect(self.update_time_block)
+                self.connect_block(block)
                 
                 self.time_blocks.append(block)
                 self.blocks_layout.addWidget(block)
@@ -789,21 +833,22 @@ class MainWindow(QMainWindow):
     
     def start_services(self):
         """Запуск фоновых сервисов"""
-        # Автосохранение
+        # Автосохранение: правки помечают день, запись откладывается и объединяется
         if self.settings.get("auto_save", True):
-            self.auto_save_timer = QTimer()
-            self.auto_save_timer.timeout.connect(self.auto_save)
-            self.auto_save_timer.start(300000)  # 5 минут
+            try:
+                from config_manager import get_config
+                max_delay = get_config().ui.auto_save_interval
+            except Exception:
+                max_delay = 30
+            self.autosave = AutoSaveService(self.data_manager, max_delay_seconds=max_delay)
+        
+        # Фоновая конвертация файлов дней в текущий формат
+        self.schedule_migrator = ScheduleMigrator(self.data_manager)
+        self.schedule_migrator.start()
         
         # Проверка уведомлений
         self.notification_manager.start()
     
-    def auto_save(self):
-        """Автосохранение"""
-        if self.time_blocks:
-            self.data_manager.save_day(self.time_blocks, self.current_date)
-            self.sys_info_label.setText("Автосохранение выполнено")
-    
     def show_welcome_message(self):
         """Показать приветственное сообщение"""
         NotificationAnimator.show_notification(
@@ -821,6 +866,9 @@ class MainWindow(QMainWindow):
     
     def focus_today(self):
         """Фокусировка на сегодняшнем дне"""
+        # Несохраненные правки покидаемого дня записываются сразу
+        if self.autosave is not None:
+            self.autosave.flush(self.current_date)
         self.current_date = datetime.now().date()
         self.update_date_display()
         self.load_current_day()
@@ -921,8 +969,10 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Обработка закрытия приложения"""
-        if self.time_blocks and self.settings.get("auto_save", True):
-            self.data_manager.save_day(self.time_blocks, self.current_date)
+        if self.autosave is not None:
+            # Открытый день записывается всегда (как раньше), неизмененные блоки не дают записи
+            self.mark_day_dirty()
+            self.autosave.flush()
         
         self.notification_manager.stop()
         
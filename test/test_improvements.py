@@ -7,18 +7,40 @@ import unittest
 import asyncio
 import tempfile
 import os
+import sys
 import json
+import pickle
 import time
+import threading
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 
+from PyQt5.QtCore import Qt
+
+# Модули приложения лежат в корне проекта (в test/ есть устаревшие копии)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # Импорты тестируемых модулей
 from config_manager import ConfigManager, AppConfig, UIConfig
-from cache_manager import CacheManager, cached
+from cache_manager import (
+    CacheManager, CacheRegistry, CacheTagIndex, CacheWarmup, ExpiryReaper, FileCache, LatencyHistogram, MemoryCache, SegmentFileCache,
+    SerializerRegistry, ShardedMemoryCache, cached, estimate_size, instance_token, make_cache_key
+)
+from background_executor import PriorityExecutor, TaskPriority
 from async_notifications import (
     AsyncNotificationManager, Notification, NotificationType, 
     NotificationPriority, NotificationChannel, create_task_reminder
 )
+from data_manager import (
+    AutoSaveService, DataManagerError, PremiumDataManager, ScheduleMigrator, show_message, snapshot_blocks
+)
+from frame_scheduler import FrameScheduler
+from prefetcher import NavigationPrefetcher
+from productivity_stats import ProductivityStatsService
+from rollup_store import RollupStore, cover_range
+from stall_watchdog import StallWatchdog, stall_site
+from task_list_model import TaskListModel
+from task_manager import TaskManager, TaskStatus
 
 class TestConfigManager(unittest.TestCase):
     """Тесты системы конфигурации"""
@@ -183,6 +205,110 @@ class TestCacheManager(unittest.TestCase):
         self.assertEqual(result3, 5)
         self.assertEqual(call_count, 2)  # Функция должна вызваться
     
+    def test_cached_none_result(self):
+        """None кэшируется как обычный результат, negative_ttl задает его срок"""
+        calls = {"plain": 0, "skipped": 0, "short": 0}
+        
+        @cached(ttl=60)
+        def find_missing_plain(x):
+            calls["plain"] += 1
+        
+        @cached(ttl=60, negative_ttl=0)
+        def find_missing_skipped(x):
+            calls["skipped"] += 1
+        
+        @cached(ttl=60, negative_ttl=0.05)
+        def find_missing_short(x):
+            calls["short"] += 1
+        
+        for _ in range(3):
+            self.assertIsNone(find_missing_plain(1))
+            self.assertIsNone(find_missing_skipped(1))
+            self.assertIsNone(find_missing_short(1))
+        time.sleep(0.1)
+        find_missing_short(1)
+        
+        self.assertEqual(calls, {"plain": 1, "skipped": 3, "short": 2})
+    
+    def test_cached_single_flight(self):
+        """Одновременные промахи по одному ключу выполняют функцию один раз"""
+        calls = []
+        barrier = threading.Barrier(8)
+        results = []
+        
+        @cached(ttl=60)
+        def single_flight_load(x):
+            calls.append(x)
+            time.sleep(0.1)
+            return x * 10
+        
+        def worker():
+            barrier.wait()
+            results.append(single_flight_load(4))
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(calls, [4])
+        self.assertEqual(results, [40] * 8)
+    
+    def test_cached_error_is_shared_and_not_cached(self):
+        """Ошибка ведущего вызова получают ожидающие, результат не кэшируется"""
+        calls = []
+        barrier = threading.Barrier(4)
+        errors = []
+        
+        @cached(ttl=60)
+        def failing_load(x):
+            calls.append(x)
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+        
+        def worker():
+            barrier.wait()
+            try:
+                failing_load(1)
+            except RuntimeError as e:
+                errors.append(str(e))
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, ["boom"] * 4)
+        self.assertEqual(len(calls), 1)
+        with self.assertRaises(RuntimeError):
+            failing_load(1)
+        self.assertEqual(len(calls), 2)
+    
+    def test_cached_stale_while_revalidate(self):
+        """Устаревшее значение отдается сразу, обновление идет в фоне"""
+        version = {"value": 1}
+        refreshed = threading.Event()
+        
+        @cached(ttl=0.05, stale_ttl=5)
+        def stale_load():
+            if version["value"] > 1:
+                time.sleep(0.1)
+                refreshed.set()
+            return version["value"]
+        
+        self.assertEqual(stale_load(), 1)
+        version["value"] = 2
+        time.sleep(0.1)
+        
+        start = time.perf_counter()
+        self.assertEqual(stale_load(), 1)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertTrue(refreshed.wait(2))
+        time.sleep(0.05)
+        self.assertEqual(stale_load(), 2)
+    
     def test_cache_statistics(self):
         """Тест статистики кэша"""
         # Добавляем данные
@@ -201,210 +327,2363 @@ class TestCacheManager(unittest.TestCase):
         self.assertEqual(stats['memory_cache']['misses'], 1)
         self.assertAlmostEqual(stats['memory_cache']['hit_rate'], 66.7, places=1)
 
-class TestAsyncNotifications(unittest.TestCase):
-    """Тесты асинхронной системы уведомлений"""
+class TestEvictionPolicies(unittest.TestCase):
+    """Тесты политик вытеснения кэша в памяти"""
     
-    def setUp(self):
-        """Настройка тестов"""
-        self.notification_manager = AsyncNotificationManager()
-        # Останавливаем фоновый процессор для тестов
-        self.notification_manager.running = False
+    def test_lru_evicts_least_recent(self):
+        """LRU вытесняет запись, к которой дольше всего не обращались"""
+        cache = MemoryCache(max_size=3, policy="lru")
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        cache.get("a")
+        cache.set("d", "d")
+        
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a")
+        self.assertEqual(cache.get_stats()['evictions'], 1)
     
-    def test_notification_creation(self):
-        """Тест создания уведомлений"""
-        notification = create_task_reminder(
-            "test_task",
-            "Test Task Title",
-            datetime.now()
-        )
+    def test_lfu_keeps_frequent_entries(self):
+        """LFU сохраняет часто используемые записи"""
+        cache = MemoryCache(max_size=3, policy="lfu")
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        for _ in range(5):
+            cache.get("a")
+            cache.get("b")
+        cache.get("c")
+        cache.get("a")
+        cache.set("d", "d")
         
-        self.assertEqual(notification.type, NotificationType.TASK_REMINDER)
-        self.assertEqual(notification.priority, NotificationPriority.MEDIUM)
-        self.assertEqual(notification.task_id, "test_task")
-        self.assertIn("Test Task Title", notification.message)
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(cache.get("a"), "a")
+        self.assertEqual(cache.get("b"), "b")
     
-    def test_notification_scheduling(self):
-        """Тест планирования уведомлений"""
-        future_time = datetime.now() + timedelta(minutes=5)
-        notification = create_task_reminder(
-            "scheduled_task",
-            "Scheduled Task",
-            future_time
-        )
+    def test_arc_resists_scans(self):
+        """ARC сохраняет горячие записи при однократном проходе по многим ключам"""
+        results = {}
+        for policy in ("lru", "arc"):
+            cache = MemoryCache(max_size=10, policy=policy)
+            for _ in range(3):
+                for key in range(5):
+                    if cache.get(f"hot{key}") is None:
+                        cache.set(f"hot{key}", key)
+            for key in range(50):
+                cache.set(f"scan{key}", key)
+            results[policy] = sum(cache.get(f"hot{key}") is not None for key in range(5))
         
-        # Планируем уведомление
-        self.notification_manager.schedule_notification(notification)
+        self.assertEqual(results["lru"], 0)
+        self.assertEqual(results["arc"], 5)
+    
+    def test_size_limit_and_unknown_policy(self):
+        """Размер кэша не превышает лимит при любой политике"""
+        for policy in ("lru", "lfu", "arc"):
+            cache = MemoryCache(max_size=20, policy=policy)
+            for key in range(500):
+                cache.set(str(key % 70), key)
+                cache.get(str((key * 7) % 70))
+                if key % 11 == 0:
+                    cache.delete(str(key % 70))
+            self.assertLessEqual(cache.get_stats()['size'], 20)
+            self.assertEqual(cache.get_stats()['policy'], policy)
         
-        # Проверяем, что уведомление добавлено в список запланированных
-        self.assertEqual(len(self.notification_manager.scheduled_notifications), 1)
-        self.assertEqual(
-            self.notification_manager.scheduled_notifications[0].id,
-            notification.id
-        )
+        with self.assertRaises(ValueError):
+            MemoryCache(policy="fifo")
+
+class TestShardedMemoryCache(unittest.TestCase):
+    """Тесты сегментированного кэша в памяти"""
     
-    def test_notification_delivery_conditions(self):
-        """Тест условий доставки уведомлений"""
-        # Создаем уведомление с низким приоритетом
-        low_priority_notification = Notification(
-            id="test_low",
-            type=NotificationType.BREAK_SUGGESTION,
-            priority=NotificationPriority.LOW,
-            title="Break Suggestion",
-            message="Time for a break",
-            channels=[NotificationChannel.SYSTEM_TRAY],
-            scheduled_time=datetime.now(),
-            created_at=datetime.now()
-        )
+    def test_same_interface_and_aggregated_stats(self):
+        """Сегментированный кэш ведет себя как обычный и суммирует статистику"""
+        cache = ShardedMemoryCache(max_size=400, shards=8)
+        for key in range(40):
+            cache.set(f"key{key}", key)
+        for key in range(50):
+            cache.get(f"key{key}")
+        self.assertTrue(cache.delete("key0"))
+        self.assertFalse(cache.delete("key0"))
         
-        # Тестируем условия доставки
-        should_deliver = self.notification_manager._should_deliver(low_priority_notification)
-        self.assertIsInstance(should_deliver, bool)
+        stats = cache.get_stats()
+        self.assertEqual(stats['shards'], 8)
+        self.assertEqual(stats['size'], 39)
+        self.assertEqual(stats['hits'], 40)
+        self.assertEqual(stats['misses'], 10)
+        self.assertEqual(sum(len(shard._cache) for shard in cache.shards), 39)
+        self.assertGreater(sum(1 for shard in cache.shards if shard._cache), 1)
+        self.assertEqual(sum(shard.max_size for shard in cache.shards), 400)
     
-    def test_notification_statistics(self):
-        """Тест статистики уведомлений"""
-        # Добавляем несколько уведомлений в историю
-        for i in range(5):
-            notification = create_task_reminder(
-                f"task_{i}",
-                f"Task {i}",
-                datetime.now()
-            )
-            notification.delivered = True
-            self.notification_manager.notification_history.append(notification)
+    def test_concurrent_access(self):
+        """Одновременная работа нескольких потоков не нарушает лимит размера"""
+        import threading
+        cache = ShardedMemoryCache(max_size=100, shards=4, policy="arc")
+        errors = []
         
-        stats = self.notification_manager.get_statistics()
+        def worker(offset):
+            try:
+                for index in range(2000):
+                    key = f"key{(index * 7 + offset) % 300}"
+                    if cache.get(key) is None:
+                        cache.set(key, index)
+            except Exception as e:
+                errors.append(e)
         
-        self.assertEqual(stats['total'], 5)
-        self.assertEqual(stats['delivered'], 5)
-        self.assertEqual(stats['delivery_rate'], 100.0)
-        self.assertIn('by_type', stats)
-        self.assertIn('by_priority', stats)
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['size'], 100)
+        self.assertEqual(stats['hits'] + stats['misses'], 12000)
+    
+    def test_cache_manager_uses_shards(self):
+        """CacheManager создает сегментированный кэш по параметру memory_shards"""
+        manager = CacheManager(memory_cache_size=100, memory_shards=4)
+        manager.set("key", "value", use_file_cache=False)
+        self.assertEqual(manager.get("key", use_file_cache=False), "value")
+        self.assertEqual(manager.get_stats()['memory_cache']['shards'], 4)
 
-class TestIntegration(unittest.TestCase):
-    """Интеграционные тесты"""
+class TestMemoryByteBudget(unittest.TestCase):
+    """Тесты бюджета байтов кэша в памяти"""
+    
+    def test_estimate_size(self):
+        """Оценка размера: буферы за O(1), контейнеры по выборке"""
+        payload = b"x" * 100000
+        self.assertGreaterEqual(estimate_size(payload), 100000)
+        self.assertLess(estimate_size(payload), 100200)
+        self.assertEqual(estimate_size(memoryview(payload)), 100000)
+        self.assertGreaterEqual(estimate_size("y" * 50000), 50000)
+        
+        rows = [{"title": "z" * 100, "minutes": 30} for _ in range(1000)]
+        self.assertGreater(estimate_size(rows), 100 * 1000)
+        self.assertLess(estimate_size(rows), 1000 * 1000)
+    
+    def test_byte_budget_evicts_for_every_policy(self):
+        """Каждая политика вытесняет записи, пока кэш не уложится в бюджет"""
+        for policy in ("lru", "lfu", "arc"):
+            cache = MemoryCache(max_size=1000, policy=policy, max_bytes=20000)
+            for key in range(50):
+                cache.set(f"key{key}", b"x" * 1000)
+            
+            stats = cache.get_stats()
+            self.assertLessEqual(stats['bytes'], 20000, policy)
+            self.assertGreater(stats['evictions'], 0, policy)
+            self.assertEqual(stats['bytes'], sum(entry.size for entry in cache._cache.values()), policy)
+            self.assertIsNotNone(cache.get("key49"), policy)
+    
+    def test_oversized_value_is_not_cached(self):
+        """Значение больше бюджета не кэшируется и заменяет старое значение ключа"""
+        cache = MemoryCache(max_size=10, max_bytes=5000)
+        cache.set("small", b"x" * 100)
+        cache.set("chart", b"x" * 100)
+        cache.set("chart", b"x" * 10000)
+        
+        self.assertIsNone(cache.get("chart"))
+        self.assertIsNotNone(cache.get("small"))
+        self.assertLess(cache.bytes, 5000)
+    
+    def test_custom_sizer(self):
+        """Размер записи можно считать своей функцией"""
+        cache = MemoryCache(max_size=100, max_bytes=10, sizer=lambda value: value["weight"])
+        for key in range(5):
+            cache.set(f"key{key}", {"weight": 4})
+        self.assertEqual(cache.bytes, 8)
+        self.assertEqual(cache.get_stats()['size'], 2)
+    
+    def test_sharded_and_manager_budget(self):
+        """Бюджет делится между сегментами и задается через CacheManager"""
+        cache = ShardedMemoryCache(max_size=1000, shards=4, max_bytes=40000)
+        self.assertEqual([shard.max_bytes for shard in cache.shards], [10000] * 4)
+        for key in range(200):
+            cache.set(f"key{key}", b"x" * 1000)
+        self.assertLessEqual(cache.get_stats()['bytes'], 40000)
+        
+        manager = CacheManager(memory_cache_size=100, memory_shards=4, memory_limit_mb=1)
+        manager.set("key", "value" * 100, use_file_cache=False)
+        stats = manager.get_stats()['memory_cache']
+        self.assertEqual(stats['max_bytes'], 1024 * 1024)
+        self.assertGreater(stats['bytes'], 500)
+
+class TestCacheExpiry(unittest.TestCase):
+    """Тесты удаления истекших записей общим потоком"""
     
     def setUp(self):
-        """Настройка интеграционных тестов"""
-        self.temp_dir = tempfile.mkdtemp()
+        """Настройка тестов"""
+        self.reaper = ExpiryReaper()
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        self.reaper.stop()
+    
+    def wait_for(self, condition, timeout=2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return condition()
+    
+    def test_expired_entries_are_reclaimed_near_deadline(self):
+        """Истекшие записи удаляются без обращений к ним и освобождают байты"""
+        cache = MemoryCache(max_size=1000, reaper=self.reaper)
+        for key in range(300):
+            cache.set(f"short{key}", b"x" * 100, ttl=0.05)
+        cache.set("long", "value", ttl=60)
+        cache.set("forever", "value")
         
-        # Создаем компоненты с временными файлами
-        config_path = os.path.join(self.temp_dir, "integration_config.json")
-        self.config_manager = ConfigManager(config_path)
+        self.assertTrue(self.wait_for(lambda: cache.get_stats()['size'] == 2, timeout=1.0))
+        self.assertLess(cache.bytes, 200)
+        self.assertGreaterEqual(self.reaper.reaped, 300)
+        self.assertEqual(cache.get("long"), "value")
+    
+    def test_overwritten_entry_is_not_reaped(self):
+        """Запись, замененная до истечения старой версии, не удаляется по старому сроку"""
+        cache = MemoryCache(max_size=10, reaper=self.reaper)
+        cache.set("key", "old", ttl=0.05)
+        cache.set("key", "new", ttl=60)
+        time.sleep(0.2)
+        self.assertEqual(cache.get("key"), "new")
+    
+    def test_expiry_heap_is_compacted(self):
+        """Куча сроков не растет при постоянной перезаписи одних ключей"""
+        cache = MemoryCache(max_size=10, reaper=self.reaper)
+        for index in range(5000):
+            cache.set(f"key{index % 10}", index, ttl=60)
+        self.assertLess(len(cache._expiry), 200)
+    
+    def test_one_shared_thread_and_close(self):
+        """Кэши не создают потоков на экземпляр, close снимает их с учета"""
+        def reaper_threads():
+            return sum(1 for thread in threading.enumerate() if thread.name == "CacheExpiryReaper")
         
-        self.cache_manager = CacheManager(memory_cache_size=50, file_cache_size_mb=1)
-        from pathlib import Path
-        self.cache_manager.file_cache.cache_dir = Path(self.temp_dir)
+        before = reaper_threads()
+        caches = [MemoryCache(max_size=10, reaper=self.reaper) for _ in range(20)]
+        for cache in caches:
+            cache.set("key", "value", ttl=0.05)
+        self.assertEqual(reaper_threads(), before + 1)
         
-        self.notification_manager = AsyncNotificationManager()
-        self.notification_manager.running = False
+        caches[0].close()
+        self.assertTrue(self.wait_for(lambda: all(cache.get_stats()['size'] == 0 for cache in caches[1:])))
+        self.assertEqual(caches[0].get_stats()['size'], 1)
+        
+        self.reaper.stop()
+        self.assertEqual(reaper_threads(), before)
+    
+    def test_cache_manager_starts_no_threads(self):
+        """Создание CacheManager не запускает фоновых потоков"""
+        before = set(threading.enumerate())
+        managers = [CacheManager(memory_cache_size=10, file_cache_size_mb=1) for _ in range(10)]
+        self.assertEqual(set(threading.enumerate()) - before, set())
+        for manager in managers:
+            manager.close()
+
+class TestFileCacheIndex(unittest.TestCase):
+    """Тесты индекса файлового кэша"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = FileCache(self.temp_dir, max_size_mb=1)
     
     def tearDown(self):
-        """Очистка после интеграционных тестов"""
+        """Очистка после тестов"""
         import shutil
+        self.cache.close()
         shutil.rmtree(self.temp_dir, ignore_errors=True)
     
-    def test_config_cache_integration(self):
-        """Тест интеграции конфигурации и кэширования"""
-        # Загружаем конфигурацию
-        config = self.config_manager.load_config()
+    def test_writes_do_not_scan_directory(self):
+        """Запись не обходит каталог кэша"""
+        from pathlib import Path
+        with patch.object(Path, 'glob', side_effect=AssertionError("directory scan")):
+            for key in range(50):
+                self.assertTrue(self.cache.set(f"key{key}", "x" * 100))
+            self.assertEqual(self.cache.get("key7"), "x" * 100)
         
-        # Используем настройки кэша из конфигурации
-        cache_enabled = config.data.cache_enabled
-        cache_size = config.data.cache_size_mb
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['entries'], 50)
+        self.assertEqual(stats['size_bytes'],
+                         sum(os.path.getsize(os.path.join(self.temp_dir, f))
+                             for f in os.listdir(self.temp_dir) if f.endswith(".cache")))
+    
+    def test_background_eviction_keeps_recent_entries(self):
+        """Фоновое вытеснение удаляет давно не использовавшиеся файлы"""
+        self.cache.max_size_bytes = 20000
+        for key in range(10):
+            self.cache.set(f"key{key}", "x" * 1000)
+        self.cache.get("key0")
+        for key in range(10, 30):
+            self.cache.set(f"key{key}", "x" * 1000)
+            self.cache.get("key0")
         
-        self.assertTrue(cache_enabled)
-        self.assertGreater(cache_size, 0)
+        deadline = time.time() + 5
+        while self.cache.total_size > 20000 and time.time() < deadline:
+            time.sleep(0.01)
         
-        # Тестируем кэширование с учетом конфигурации
-        if cache_enabled:
-            self.cache_manager.set("config_test", "test_value")
-            value = self.cache_manager.get("config_test")
-            self.assertEqual(value, "test_value")
+        self.assertLessEqual(self.cache.total_size, 20000)
+        self.assertGreater(self.cache.get_stats()['evictions'], 0)
+        self.assertEqual(self.cache.get("key0"), "x" * 1000)
+        self.assertIsNone(self.cache.get("key1"))
     
-    def test_notifications_config_integration(self):
-        """Тест интеграции уведомлений и конфигурации"""
-        # Загружаем конфигурацию
-        config = self.config_manager.load_config()
-        
-        # Проверяем настройки уведомлений
-        notifications_enabled = config.ui.show_notifications
+    def test_index_persisted_between_runs(self):
+        """Индекс сохраняется при закрытии и читается без обхода каталога"""
+        from pathlib import Path
+        for key in range(5):
+            self.cache.set(f"key{key}", key, ttl=60)
+        self.cache.close()
         
-        # Создаем уведомление
-        notification = create_task_reminder(
-            "integration_task",
-            "Integration Test Task",
-            datetime.now()
-        )
+        with patch.object(Path, 'glob', side_effect=AssertionError("directory scan")):
+            reopened = FileCache(self.temp_dir, max_size_mb=1)
+        self.assertEqual(reopened.get_stats()['entries'], 5)
+        self.assertEqual(reopened.total_size, self.cache.total_size)
+        self.assertEqual(reopened.get("key3"), 3)
+        reopened.close()
+    
+    def test_runtime_files_do_not_invalidate_index(self):
+        """Горячие ключи, статистика и теги пишутся мимо каталога записей"""
+        from pathlib import Path
+        self.cache.set("tasks:today", "x", ttl=600)
+        self.cache.close()
+        index_path = Path(self.temp_dir) / FileCache.INDEX_FILE
+        past = time.time() - 60
+        os.utime(index_path, (past, past))
+        os.utime(self.temp_dir, (past, past))
         
-        # Проверяем, что настройки учитываются
-        should_deliver = self.notification_manager._should_deliver(notification)
+        # Запуск, при котором индекс не менялся: при закрытии пишутся только служебные файлы
+        manager = CacheManager(memory_cache_size=10, file_cache_size_mb=1)
+        manager.file_cache.cache_dir = Path(self.temp_dir)
+        self.assertEqual(manager.get("tasks:today"), "x")
+        manager.set("note", "y", use_file_cache=False, tags={"tasks"})
+        manager.invalidate(tag="other")
+        manager.start_stats_snapshots(Path(self.temp_dir) / "state" / "stats.json", 60)
+        manager.close()
+        self.assertTrue((Path(self.temp_dir) / "state" / CacheManager.HOT_SET_FILE).exists())
         
-        if notifications_enabled:
-            # Если уведомления включены, должно доставляться
-            self.assertTrue(should_deliver or notification.priority == NotificationPriority.URGENT)
+        with patch.object(Path, 'glob', side_effect=AssertionError("directory scan")):
+            reopened = FileCache(self.temp_dir, max_size_mb=1)
+        name = reopened._get_file_path("tasks:today").name
+        self.assertIsNotNone(reopened._index[name][2])
+        reopened.close()
+
+class TestSegmentFileCache(unittest.TestCase):
+    """Тесты файлового кэша на сегментах с дозаписью"""
     
-    def test_performance_with_all_components(self):
-        """Тест производительности с всеми компонентами"""
-        start_time = time.time()
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = SegmentFileCache(self.temp_dir, max_size_mb=1, segment_size_mb=0.01)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        self.cache.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def reopen(self):
+        self.cache.close()
+        self.cache = SegmentFileCache(self.temp_dir, max_size_mb=1, segment_size_mb=0.01)
+        return self.cache
+    
+    def test_recovery_keeps_latest_versions(self):
+        """После перезапуска видны последние версии, удаленные ключи не возвращаются"""
+        for key in range(50):
+            self.cache.set(f"key{key}", {"version": 1, "key": key})
+        for key in range(0, 50, 2):
+            self.cache.set(f"key{key}", {"version": 2, "key": key})
+        for key in range(0, 50, 5):
+            self.cache.delete(f"key{key}")
+        self.cache.set("short", "value", ttl=0.05)
+        time.sleep(0.1)
         
-        # Выполняем операции с конфигурацией
-        config = self.config_manager.load_config()
-        self.config_manager.save_config()
+        cache = self.reopen()
+        self.assertIsNone(cache.get("key0"))
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("key2"), {"version": 2, "key": 2})
+        self.assertEqual(cache.get("key3"), {"version": 1, "key": 3})
+        self.assertEqual(cache.get_stats()['entries'], 40)
+        # Сегменты вместо файла на ключ
+        self.assertLess(len(os.listdir(os.path.join(self.temp_dir, "segments"))), 20)
+    
+    def test_torn_write_is_truncated(self):
+        """Оборванная запись в конце сегмента отбрасывается при восстановлении"""
+        self.cache.set("kept", "value")
+        self.cache.set("torn", "x" * 200)
+        self.cache.close()
         
-        # Выполняем операции с кэшем
-        for i in range(10):
-            self.cache_manager.set(f"perf_key_{i}", f"perf_value_{i}")
-            self.cache_manager.get(f"perf_key_{i}")
+        segments_dir = os.path.join(self.temp_dir, "segments")
+        last = os.path.join(segments_dir, sorted(os.listdir(segments_dir))[-1])
+        size = os.path.getsize(last)
+        with open(last, 'r+b') as f:
+            f.truncate(size - 20)
         
-        # Создаем уведомления
-        for i in range(5):
-            notification = create_task_reminder(
-                f"perf_task_{i}",
-                f"Performance Task {i}",
-                datetime.now()
-            )
-            self.notification_manager.schedule_notification(notification)
+        cache = self.reopen()
+        self.assertEqual(cache.get("kept"), "value")
+        self.assertIsNone(cache.get("torn"))
+        cache.set("after", 1)
+        self.assertEqual(self.reopen().get("after"), 1)
+    
+    def test_merge_reclaims_dead_records(self):
+        """Слияние сегментов освобождает место перезаписанных значений"""
+        # Автоматическое слияние в фоне отключено, чтобы проверить явный вызов
+        self.cache.merge_threshold = 2.0
+        for round_number in range(10):
+            for key in range(20):
+                self.cache.set(f"key{key}", "x" * 100 + str(round_number))
+        before = self.cache.get_stats()['disk_bytes']
         
-        end_time = time.time()
-        execution_time = end_time - start_time
+        self.assertGreater(self.cache.merge(), 0)
+        stats = self.cache.get_stats()
+        self.assertLess(stats['disk_bytes'], before / 3)
+        self.assertEqual(self.cache.get("key7"), "x" * 100 + "9")
+        self.assertEqual(self.reopen().get("key19"), "x" * 100 + "9")
+    
+    def test_cache_manager_backend(self):
+        """CacheManager использует сегменты по параметру file_backend"""
+        from pathlib import Path
+        manager = CacheManager(memory_cache_size=10, file_cache_size_mb=1, file_backend="segments")
+        manager.file_cache.cache_dir = Path(self.temp_dir) / "manager"
+        manager.set("key", [1, 2, 3])
+        manager.memory_cache.clear()
+        self.assertEqual(manager.get("key"), [1, 2, 3])
+        manager.file_cache.close()
         
-        # Проверяем, что все операции выполняются быстро
-        self.assertLess(execution_time, 1.0)  # Менее 1 секунды
+        with self.assertRaises(ValueError):
+            CacheManager(file_backend="sqlite")
 
-class TestPerformanceImprovements(unittest.TestCase):
-    """Тесты улучшений производительности"""
+class TestWriteBehind(unittest.TestCase):
+    """Тесты отложенной записи в файловый кэш"""
     
-    def test_caching_performance_improvement(self):
-        """Тест улучшения производительности благодаря кэшированию"""
-        cache_manager = CacheManager()
+    def setUp(self):
+        """Настройка тестов"""
+        from pathlib import Path
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = CacheManager(memory_cache_size=10, file_cache_size_mb=1, write_behind=True)
+        self.manager.file_cache.cache_dir = Path(self.temp_dir)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        self.manager.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_flush_writes_to_disk(self):
+        """После flush значения лежат в файловом кэше"""
+        for key in range(20):
+            self.manager.set(f"key{key}", {"value": key})
+        self.assertTrue(self.manager.flush(timeout=5))
+        self.assertEqual(self.manager.file_cache.get("key7"), {"value": 7})
+        self.assertEqual(self.manager.get_stats()['write_behind']['depth'], 0)
+    
+    def test_pending_value_is_readable(self):
+        """Значение, еще не записанное на диск, читается через CacheManager"""
+        release = threading.Event()
+        original_set = self.manager.file_cache.set
         
-        # Функция с искусственной задержкой
-        @cached(ttl=60)
-        def slow_function(x):
-            time.sleep(0.1)  # Имитируем медленную операцию
-            return x * 2
+        def slow_set(key, value, ttl=None):
+            release.wait(5)
+            return original_set(key, value, ttl)
         
-        # Первый вызов (медленный)
-        start_time = time.time()
-        result1 = slow_function(5)
-        first_call_time = time.time() - start_time
+        self.manager.file_cache.set = slow_set
+        self.manager.set("first", 1)
+        self.manager.set("second", 2)
+        self.manager.memory_cache.clear()
+        self.assertEqual(self.manager.get("second"), 2)
+        release.set()
+        self.assertTrue(self.manager.flush(timeout=5))
+    
+    def test_repeated_writes_are_coalesced(self):
+        """Повторные записи одного ключа в очереди объединяются"""
+        release = threading.Event()
+        original_set = self.manager.file_cache.set
+        writes = []
         
-        # Второй вызов (быстрый, из кэша)
-        start_time = time.time()
-        result2 = slow_function(5)
-        second_call_time = time.time() - start_time
+        def slow_set(key, value, ttl=None):
+            release.wait(5)
+            writes.append(key)
+            return original_set(key, value, ttl)
         
-        # Проверяем результаты
-        self.assertEqual(result1, result2)
-        self.assertEqual(result1, 10)
+        self.manager.file_cache.set = slow_set
+        self.manager.set("blocker", 0)
+        for version in range(50):
+            self.manager.set("hot", version)
+        release.set()
+        self.assertTrue(self.manager.flush(timeout=5))
         
-        # Проверяем улучшение производительности
-        self.assertGreater(first_call_time, 0.05)  # Первый вызов должен быть медленным
-        self.assertLess(second_call_time, 0.01)    # Второй вызов должен быть быстрым
+        self.assertEqual(self.manager.file_cache.get("hot"), 49)
+        self.assertLessEqual(writes.count("hot"), 2)
+        self.assertGreater(self.manager.get_stats()['write_behind']['coalesced'], 40)
+    
+    def test_backpressure_falls_back_to_sync_write(self):
+        """При переполненной очереди запись выполняется в вызывающем потоке"""
+        queue = self.manager.write_queue
+        queue.max_pending = 2
+        queue.block_seconds = 0.01
+        release = threading.Event()
+        original_set = self.manager.file_cache.set
         
-        # Ускорение должно быть значительным
-        speedup = first_call_time / second_call_time
-        self.assertGreater(speedup, 5)  # Минимум 5x ускорение
+        def slow_set(key, value, ttl=None):
+            if threading.current_thread().name == "CacheWriteBehind":
+                release.wait(5)
+            return original_set(key, value, ttl)
+        
+        self.manager.file_cache.set = slow_set
+        for key in range(6):
+            self.manager.set(f"key{key}", key)
+        stats = queue.get_stats()
+        self.assertGreater(stats['backpressure_waits'], 0)
+        self.assertGreater(stats['sync_writes'], 0)
+        self.assertLessEqual(stats['max_depth'], 2)
+        release.set()
+        self.assertTrue(self.manager.flush(timeout=5))
+        self.assertEqual(self.manager.file_cache.get("key5"), 5)
+    
+    def test_delete_cancels_pending_write(self):
+        """Удаление отменяет ожидающую запись и не воскрешается писателем"""
+        release = threading.Event()
+        original_set = self.manager.file_cache.set
+        
+        def slow_set(key, value, ttl=None):
+            release.wait(5)
+            return original_set(key, value, ttl)
+        
+        self.manager.file_cache.set = slow_set
+        self.manager.set("blocker", 0)
+        self.manager.set("doomed", 1)
+        self.assertTrue(self.manager.delete("doomed"))
+        release.set()
+        self.assertTrue(self.manager.flush(timeout=5))
+        self.assertIsNone(self.manager.get("doomed"))
+        self.assertIsNone(self.manager.file_cache.get("doomed"))
+    
+    def test_close_flushes_queue(self):
+        """close дописывает очередь, после остановки запись идет синхронно"""
+        self.manager.set("key", "value")
+        self.manager.close()
+        self.assertEqual(self.manager.file_cache.get("key"), "value")
+        self.manager.set("late", 1)
+        self.assertEqual(self.manager.file_cache.get("late"), 1)
+
+class TestCacheInvalidation(unittest.TestCase):
+    """Тесты пространств имен и инвалидации по тегам"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = self.open_manager()
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        self.manager.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def open_manager(self):
+        from pathlib import Path
+        manager = CacheManager(memory_cache_size=100, file_cache_size_mb=1)
+        manager.file_cache.cache_dir = Path(self.temp_dir)
+        return manager
+    
+    def test_invalidate_tag_in_both_tiers(self):
+        """Инвалидация тега удаляет только его записи из памяти и файлов"""
+        self.manager.set("day1", 1, tags={"tasks", "day:2025-10-03"})
+        self.manager.set("day2", 2, tags={"tasks", "day:2025-10-04"})
+        self.manager.set("other", 3, tags={"notes"})
+        self.manager.set("plain", 4)
+        
+        self.assertEqual(self.manager.invalidate(tag="day:2025-10-03"), 1)
+        self.assertIsNone(self.manager.get("day1"))
+        self.assertEqual(self.manager.get("day2"), 2)
+        
+        self.assertEqual(self.manager.invalidate(tag="tasks"), 1)
+        self.assertIsNone(self.manager.file_cache.get("day2"))
+        self.assertEqual(self.manager.get("other"), 3)
+        self.assertEqual(self.manager.get("plain"), 4)
+        self.assertEqual(self.manager.invalidate(tag="tasks"), 0)
+        
+        with self.assertRaises(ValueError):
+            self.manager.invalidate()
+    
+    def test_clear_cache_only_clears_namespace(self):
+        """clear_cache декорированной функции не трогает чужие записи"""
+        calls = {"first": 0, "second": 0}
+        
+        @cached(ttl=60)
+        def namespaced_first(x):
+            calls["first"] += 1
+            return x
+        
+        @cached(ttl=60)
+        def namespaced_second(x):
+            calls["second"] += 1
+            return x
+        
+        with patch("cache_manager.get_cache_manager", return_value=self.manager):
+            self.manager.set("unrelated", "value")
+            namespaced_first(1)
+            namespaced_second(1)
+            namespaced_first.clear_cache()
+            namespaced_first(1)
+            namespaced_second(1)
+        
+        self.assertEqual(calls, {"first": 2, "second": 1})
+        self.assertEqual(self.manager.get("unrelated"), "value")
+        self.assertTrue(namespaced_first.cache_namespace.endswith("namespaced_first"))
+    
+    def test_invalidation_reaches_previous_session(self):
+        """Записи файлового кэша прошлого запуска отбрасываются после инвалидации их тега"""
+        self.manager.set("stale", "old", tags={"tasks"})
+        self.manager.set("kept", "old", tags={"notes"})
+        self.manager.close()
+        
+        self.manager = self.open_manager()
+        self.manager.invalidate(tag="tasks")
+        self.assertIsNone(self.manager.get("stale"))
+        self.assertEqual(self.manager.get("kept"), "old")
+        
+        self.manager.set("fresh", "new", tags={"tasks"})
+        self.manager.close()
+        self.manager = self.open_manager()
+        self.assertEqual(self.manager.get("fresh"), "new")
+    
+    def test_tag_state_saved_in_maintenance_lane(self):
+        """Серия инвалидаций дает одну фоновую запись состояния тегов"""
+        from pathlib import Path
+        executor = PriorityExecutor(max_workers=1, name="Tags")
+        tags = CacheTagIndex(executor=executor)
+        tags.bind(Path(self.temp_dir))
+        gate = threading.Event()
+        blocker = executor.submit(gate.wait, 5)
+        for day in range(1, 6):
+            tags.pop(f"tag:day:2025-10-0{day}")
+        
+        state_path = Path(self.temp_dir) / "state" / CacheTagIndex.STATE_FILE
+        self.assertFalse(state_path.exists())
+        gate.set()
+        blocker.result(timeout=5)
+        executor.shutdown()
+        self.assertEqual(executor.get_stats()['lanes']['maintenance']['submitted'], 1)
+        with open(state_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)["invalidated"]), 5)
+    
+    def test_old_invalidations_are_pruned(self):
+        """Инвалидации раньше самой старой записи файлового кэша не сохраняются"""
+        from pathlib import Path
+        oldest = [0.0]
+        tags = CacheTagIndex(oldest_entry=lambda: oldest[0])
+        tags.bind(Path(self.temp_dir))
+        tags.pop("tag:old")
+        tags.pop("tag:recent")
+        tags.flush()
+        
+        tags._invalidated["tag:old"] -= 3600
+        oldest[0] = time.time() - 600
+        tags.pop("tag:new")
+        tags.flush()
+        
+        with open(Path(self.temp_dir) / "state" / CacheTagIndex.STATE_FILE, 'r', encoding='utf-8') as f:
+            self.assertEqual(sorted(json.load(f)["invalidated"]), ["tag:new", "tag:recent"])
+    
+    def test_file_index_tracks_write_time(self):
+        """Время записи файлов переживает перезапуск и задает границу для тегов"""
+        from pathlib import Path
+        before = time.time()
+        self.manager.set("first", 1)
+        self.manager.set("second", 2)
+        oldest = self.manager.file_cache.oldest_write_time()
+        self.assertGreaterEqual(oldest, before)
+        self.manager.close()
+        
+        reopened = FileCache(self.temp_dir, max_size_mb=1)
+        self.assertEqual(reopened.oldest_write_time(), oldest)
+        reopened.close()
+    
+    def test_task_changes_invalidate_tasks_tag(self):
+        """Изменение задач инвалидирует тег tasks и теги затронутых дней"""
+        import task_manager
+        from datetime import date
+        
+        self.manager.set("summary", 1, use_file_cache=False, tags={task_manager.TASKS_CACHE_TAG})
+        self.manager.set("day", 2, use_file_cache=False, tags={"day:2025-10-03"})
+        self.manager.set("other_day", 3, use_file_cache=False, tags={"day:2025-10-04"})
+        
+        with patch("cache_manager.get_cache_manager", return_value=self.manager):
+            task_manager._invalidate_task_caches("added", None, {date(2025, 10, 3)})
+        
+        self.assertIsNone(self.manager.get("summary"))
+        self.assertIsNone(self.manager.get("day"))
+        self.assertEqual(self.manager.get("other_day"), 3)
+    
+    def test_prune_drops_evicted_memory_keys(self):
+        """Ключи, вытесненные из памяти, убираются из индекса тегов"""
+        manager = CacheManager(memory_cache_size=10, file_cache_size_mb=1)
+        manager.file_cache.cache_dir = self.manager.file_cache.cache_dir
+        for key in range(30):
+            manager.set(f"key{key}", key, use_file_cache=False, tags={"bulk"})
+        self.assertEqual(len(manager.tags), 30)
+        
+        manager.tags.prune(lambda key: key in manager.memory_cache)
+        self.assertEqual(len(manager.tags), 10)
+        self.assertEqual(manager.invalidate(tag="bulk"), 10)
+        manager.close()
+
+class TestCacheKeys(unittest.TestCase):
+    """Тесты ключей декоратора cached"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.manager = CacheManager(memory_cache_size=100, file_cache_size_mb=1)
+        self.patcher = patch("cache_manager.get_cache_manager", return_value=self.manager)
+        self.patcher.start()
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        self.patcher.stop()
+        self.manager.close()
+    
+    def test_primitive_keys(self):
+        """Примитивные аргументы входят в ключ без хэширования"""
+        self.assertEqual(make_cache_key("ns", (1, "a"), {}, text=False), ("ns", (1, "a")))
+        self.assertEqual(make_cache_key("ns", (1, "a"), {}), "ns:((1, 'a'),)")
+        self.assertEqual(make_cache_key("ns", (1,), {"b": 2, "a": 1}),
+                         make_cache_key("ns", (1,), {"a": 1, "b": 2}))
+        self.assertNotEqual(make_cache_key("ns", (1,), {}, text=False),
+                            make_cache_key("ns", ("1",), {}, text=False))
+        
+        long_key = make_cache_key("ns", ("x" * 1000,), {})
+        self.assertEqual(len(long_key), len("ns:") + 32)
+        # Непримитивные аргументы без structural - прежний ключ через str
+        self.assertTrue(make_cache_key("ns", ([1, 2],), {}, text=False).startswith("ns:"))
+    
+    def test_structural_keys(self):
+        """Словари и множества по содержимому сравниваются только по запросу"""
+        first = ({"b": [1, 2], "a": {3, 4}},)
+        second = ({"a": {4, 3}, "b": [1, 2]},)
+        self.assertEqual(make_cache_key("ns", first, {}, structural=True),
+                         make_cache_key("ns", second, {}, structural=True))
+        self.assertNotEqual(make_cache_key("ns", ({"a": [1, 2]},), {}, structural=True),
+                            make_cache_key("ns", ({"a": [2, 1]},), {}, structural=True))
+        
+        calls = []
+        
+        @cached(ttl=60, structural=True)
+        def summarize(filters):
+            calls.append(filters)
+            return len(filters)
+        
+        summarize({"day": "2025-10-03", "status": "done"})
+        summarize({"status": "done", "day": "2025-10-03"})
+        self.assertEqual(len(calls), 1)
+    
+    def test_methods_are_cached_per_instance(self):
+        """Методы по умолчанию кэшируются отдельно для каждого экземпляра"""
+        class Report:
+            def __init__(self, total):
+                self.total = total
+                self.calls = 0
+            
+            def __repr__(self):
+                return "Report"
+            
+            @cached(ttl=60)
+            def summary(self, scale):
+                self.calls += 1
+                return self.total * scale
+            
+            @cached(ttl=60, method="shared")
+            def title(self, name):
+                self.calls += 1
+                return name.upper()
+        
+        first, second = Report(1), Report(2)
+        self.assertEqual(first.summary(10), 10)
+        self.assertEqual(second.summary(10), 20)
+        self.assertEqual(first.summary(10), 10)
+        self.assertEqual((first.calls, second.calls), (1, 1))
+        
+        first.title("day")
+        second.title("day")
+        self.assertEqual(first.calls + second.calls, 3)
+        
+        with self.assertRaises(ValueError):
+            cached(method="global")
+    
+    def test_instance_tokens_are_not_reused(self):
+        """Новый объект не получает токен (и кэш) удаленного"""
+        import gc
+        
+        class Holder:
+            pass
+        
+        tokens = set()
+        for _ in range(50):
+            holder = Holder()
+            tokens.add(instance_token(holder))
+            self.assertEqual(instance_token(holder), instance_token(holder))
+            del holder
+            gc.collect()
+        self.assertEqual(len(tokens), 50)
+
+class TestCacheMetrics(unittest.TestCase):
+    """Тесты статистики кэша по пространствам имен и задержкам"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        from pathlib import Path
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = CacheManager(memory_cache_size=5, file_cache_size_mb=1)
+        self.manager.file_cache.cache_dir = Path(self.temp_dir)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        self.manager.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_latency_histogram(self):
+        """Перцентили берутся по границам корзин"""
+        histogram = LatencyHistogram()
+        for _ in range(98):
+            histogram.record(0.000004)
+        histogram.record(0.003)
+        histogram.record(0.003)
+        
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 100)
+        self.assertAlmostEqual(snapshot['p50_ms'], 0.005)
+        self.assertAlmostEqual(snapshot['p99_ms'], 3.0)
+        self.assertEqual(snapshot['buckets'], {"le_5us": 98, "le_5000us": 2})
+    
+    def test_namespace_counters(self):
+        """Попадания, промахи, вытеснения и сэкономленное время по функциям"""
+        @cached(ttl=60, use_file_cache=False)
+        def slow_square(x):
+            time.sleep(0.02)
+            return x * x
+        
+        @cached(ttl=60, use_file_cache=False)
+        def fast_double(x):
+            return x * 2
+        
+        with patch("cache_manager.get_cache_manager", return_value=self.manager):
+            slow_square(3)
+            for _ in range(4):
+                slow_square(3)
+            for value in range(10):
+                fast_double(value)
+        
+        namespaces = self.manager.get_stats()['namespaces']
+        slow = namespaces[slow_square.cache_namespace]
+        fast = namespaces[fast_double.cache_namespace]
+        self.assertEqual((slow['hits'], slow['misses']), (4, 1))
+        self.assertAlmostEqual(slow['hit_rate'], 80.0)
+        self.assertGreater(slow['saved_seconds'], 0.06)
+        self.assertGreater(slow['load_seconds'], 0.015)
+        self.assertEqual(fast['misses'], 10)
+        self.assertGreater(fast['evictions'], 0)
+    
+    def test_tier_stats_and_snapshot_file(self):
+        """get_stats содержит задержки и файловый уровень, снимки пишутся в JSON"""
+        self.manager.set("key", {"value": 1})
+        self.manager.memory_cache.clear()
+        self.assertEqual(self.manager.get("key"), {"value": 1})
+        self.manager.get("missing")
+        
+        stats = self.manager.get_stats()
+        self.assertEqual(stats['file_cache']['entries'], 1)
+        self.assertGreater(stats['file_cache']['size_bytes'], 0)
+        self.assertEqual(stats['latency']['file.get']['count'], 2)
+        self.assertEqual(stats['latency']['file.set']['count'], 1)
+        self.assertEqual(stats['namespaces']['default']['hits'], 1)
+        
+        path = os.path.join(self.temp_dir, "stats.json")
+        self.manager.start_stats_snapshots(path, interval=0.05)
+        time.sleep(0.2)
+        with open(path, encoding='utf-8') as f:
+            first = json.load(f)
+        self.assertIn('timestamp', first)
+        self.assertEqual(first['file_cache']['entries'], 1)
+        
+        self.manager.get("key")
+        self.manager.stop_stats_snapshots()
+        with open(path, encoding='utf-8') as f:
+            final = json.load(f)
+        self.assertEqual(final['namespaces']['default']['hits'], 2)
+
+class TestFileCacheSerializers(unittest.TestCase):
+    """Тесты сериализаторов файлового кэша"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.registry = SerializerRegistry(compress_threshold=1024)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_round_trip_and_metadata(self):
+        """Каждый сериализатор восстанавливает значение, заголовок описывает запись"""
+        value = {"day": "2024-01-01", "hours": [1.5, 2.0], "done": True, "note": "задача"}
+        for name in ("pickle", "marshal", "json"):
+            self.registry.register("stats", name)
+            data = self.registry.encode("stats:week", value)
+            self.assertEqual(self.registry.decode(data), value)
+            self.assertEqual(SerializerRegistry.describe(data)['serializer'], name)
+        
+        # Ключи других пространств имен используют сериализатор по умолчанию
+        data = self.registry.encode("other:key", value)
+        self.assertEqual(SerializerRegistry.describe(data)['serializer'], "pickle")
+    
+    def test_fallback_to_pickle(self):
+        """Значение, которое не пишется marshal или JSON, сохраняется через pickle"""
+        self.registry.register("dates", "json")
+        data = self.registry.encode("dates:today", {"at": datetime(2024, 1, 1)})
+        self.assertEqual(SerializerRegistry.describe(data)['serializer'], "pickle")
+        self.assertEqual(self.registry.decode(data), {"at": datetime(2024, 1, 1)})
+        self.assertEqual(self.registry.get_stats()['written']['pickle']['fallbacks'], 1)
+    
+    def test_compression_threshold(self):
+        """Сжимаются только значения больше порога"""
+        small = self.registry.encode("key", "x" * 100)
+        large = self.registry.encode("key", "x" * 10000)
+        self.assertFalse(SerializerRegistry.describe(small)['compressed'])
+        
+        info = SerializerRegistry.describe(large)
+        self.assertTrue(info['compressed'])
+        self.assertLess(info['stored_size'], info['raw_size'])
+        self.assertEqual(self.registry.decode(large), "x" * 10000)
+    
+    def test_out_of_band_buffers(self):
+        """Буферы протокола 5 пишутся после тела pickle и остаются изменяемыми"""
+        value = pickle.PickleBuffer(bytearray(b"abc" * 1000))
+        restored = self.registry.decode(self.registry.encode("key", value))
+        self.assertEqual(bytes(restored), b"abc" * 1000)
+        restored[0] = ord("z")
+    
+    def test_file_backends_and_legacy_files(self):
+        """Оба файловых бэкенда пишут через реестр и читают файлы прежнего формата"""
+        from pathlib import Path
+        self.registry.register("report", "marshal")
+        for backend in (FileCache, SegmentFileCache):
+            cache = backend(cache_dir=os.path.join(self.temp_dir, backend.__name__),
+                            serializers=self.registry)
+            try:
+                cache.set("report:2024", {"total": 42}, ttl=60)
+                self.assertEqual(cache.get("report:2024"), {"total": 42})
+            finally:
+                cache.close()
+        self.assertEqual(self.registry.get_stats()['written']['marshal']['entries'], 2)
+        
+        cache = FileCache(cache_dir=self.temp_dir)
+        legacy_path = cache._get_file_path("legacy")
+        with open(legacy_path, 'wb') as f:
+            pickle.dump({'value': [1, 2], 'created_at': time.time(), 'ttl': None}, f)
+        self.assertEqual(cache.get("legacy"), [1, 2])
+        cache.close()
+        self.assertTrue(Path(legacy_path).exists())
+    
+    def test_cached_serializer_keeps_wrappers(self):
+        """Декоратор выбирает сериализатор, теги и свежесть записи сохраняются"""
+        from pathlib import Path
+        manager = CacheManager(memory_cache_size=5, file_cache_size_mb=1)
+        manager.file_cache.cache_dir = Path(self.temp_dir)
+        calls = []
+        
+        @cached(ttl=60, use_file_cache=True, serializer="json", tags={"reports"})
+        def report(day):
+            calls.append(day)
+            return {"day": day, "hours": 8}
+        
+        try:
+            with patch("cache_manager.get_cache_manager", return_value=manager):
+                report("2024-01-01")
+                manager.memory_cache.clear()
+                self.assertEqual(report("2024-01-01"), {"day": "2024-01-01", "hours": 8})
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(manager.serializers.serializer_for(report.cache_namespace + ":x"), "json")
+                
+                manager.invalidate(tag="reports")
+                report("2024-01-01")
+                self.assertEqual(len(calls), 2)
+            self.assertIn('json', manager.get_stats()['serializers']['written'])
+        finally:
+            manager.close()
+        
+        with self.assertRaises(ValueError):
+            cached(serializer="yaml")
+
+class TestCacheWarmup(unittest.TestCase):
+    """Тесты сохранения горячих ключей и прогрева кэша"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def make_manager(self, **kwargs):
+        from pathlib import Path
+        manager = CacheManager(memory_cache_size=10, file_cache_size_mb=1, **kwargs)
+        manager.file_cache.cache_dir = Path(self.temp_dir)
+        return manager
+    
+    def test_hot_keys_ranking(self):
+        """Частые и недавние обращения важнее редких и давних"""
+        for cache in (MemoryCache(max_size=10), ShardedMemoryCache(max_size=40, shards=4)):
+            for key in ("rare", "frequent", "old"):
+                cache.set(key, key)
+            for _ in range(5):
+                cache.get("frequent")
+                cache.get("old")
+            for shard in getattr(cache, "shards", [cache]):
+                entry = shard._cache.get("old")
+                if entry is not None:
+                    entry.last_accessed -= 7200
+            
+            self.assertEqual([key for key, _ in cache.hot_keys(3)], ["frequent", "old", "rare"])
+            self.assertEqual(len(cache.hot_keys(1)), 1)
+    
+    def test_manifest_and_warmup(self):
+        """Закрытие сохраняет горячие ключи, прогрев загружает их из файлового уровня"""
+        manager = self.make_manager()
+        for index in range(5):
+            manager.set(f"report:{index}", {"index": index})
+        for _ in range(3):
+            manager.get("report:3")
+        manager.set(("memory", "only"), 1, use_file_cache=False)
+        manager.close()
+        
+        restarted = self.make_manager()
+        try:
+            keys = restarted.load_hot_set()
+            self.assertEqual(keys[0], "report:3")
+            self.assertEqual(set(keys), {f"report:{index}" for index in range(5)})
+            
+            warmup = restarted.start_warmup(pause=0)
+            self.assertIsInstance(warmup, CacheWarmup)
+            self.assertTrue(warmup.wait(5))
+            self.assertEqual(warmup.get_stats(), {'state': 'done', 'total': 5, 'loaded': 5, 'missing': 0})
+            self.assertEqual(restarted.get_stats()['namespaces'], {})
+            
+            self.assertEqual(restarted.get("report:3"), {"index": 3})
+            self.assertEqual(restarted.get_stats()['latency']['file.get']['count'], 0)
+        finally:
+            restarted.close()
+    
+    def test_cancel_keeps_remaining_keys(self):
+        """Отмененный прогрев ничего не загружает, непрогретые ключи остаются в списке"""
+        manager = self.make_manager()
+        manager.set("a", 1)
+        manager.set("b", 2)
+        manager.close()
+        
+        restarted = self.make_manager()
+        warmup = restarted.start_warmup(delay=30)
+        warmup.cancel()
+        self.assertTrue(warmup.wait(1))
+        self.assertEqual(warmup.get_stats()['state'], 'cancelled')
+        self.assertEqual(warmup.loaded, 0)
+        restarted.close()
+        
+        self.assertEqual(set(self.make_manager().load_hot_set()), {"a", "b"})
+        self.assertIsNone(self.make_manager(hot_set_size=0).start_warmup(os.path.join(self.temp_dir, "none.json")))
+
+class TestCacheRegistry(unittest.TestCase):
+    """Тесты реестра кэшей с общим бюджетом памяти"""
+    
+    def fill(self, cache, prefix, count, hits=0):
+        for index in range(count):
+            cache.set(f"{prefix}:{index}", b"x" * 1000)
+        for _ in range(hits):
+            cache.get(f"{prefix}:0")
+        for _ in range(count):
+            cache.get(f"{prefix}:missing")
+    
+    def test_trim_least_valuable_first(self):
+        """При превышении бюджета урезается кэш с худшей долей попаданий"""
+        useful = MemoryCache(max_size=100)
+        useless = ShardedMemoryCache(max_size=100, shards=4)
+        self.fill(useful, "useful", 20, hits=100)
+        self.fill(useless, "useless", 20)
+        
+        registry = CacheRegistry(budget_bytes=useful.bytes + useless.bytes // 2)
+        self.assertEqual(registry.register("useful", useful), "useful")
+        self.assertEqual(registry.register("useless", useless), "useless")
+        
+        freed = registry.enforce()
+        self.assertGreaterEqual(freed, useless.bytes)
+        self.assertLessEqual(registry.total_bytes(), registry.budget_bytes)
+        self.assertEqual(len(useful._cache), 20)
+        
+        stats = registry.get_stats()
+        self.assertEqual(stats['enforcements'], 1)
+        self.assertEqual(stats['caches']['useless']['trimmed_bytes'], freed)
+        self.assertEqual(stats['caches']['useful']['entries'], 20)
+        self.assertEqual(registry.enforce(), 0)
+    
+    def test_weight_and_weak_registration(self):
+        """Вес защищает кэш, удаленные кэши выбывают из реестра, имена не совпадают"""
+        registry = CacheRegistry(budget_bytes=15000)
+        first, second = MemoryCache(max_size=100), MemoryCache(max_size=100)
+        self.fill(first, "first", 10)
+        self.fill(second, "second", 10)
+        registry.register("cache", first, weight=10.0)
+        self.assertEqual(registry.register("cache", second), "cache#2")
+        
+        registry.enforce()
+        self.assertEqual(len(first._cache), 10)
+        self.assertLess(len(second._cache), 10)
+        
+        del second
+        import gc
+        gc.collect()
+        self.assertEqual(list(registry.get_stats()['caches']), ["cache"])
+        self.assertEqual(CacheRegistry().enforce(), 0)
+    
+    def test_background_enforcement(self):
+        """Фоновый поток урезает кэши без явного вызова"""
+        cache = MemoryCache(max_size=100)
+        registry = CacheRegistry(budget_bytes=5000)
+        registry.register("cache", cache)
+        registry.start(interval=0.02)
+        try:
+            self.fill(cache, "key", 20)
+            deadline = time.time() + 2
+            while cache.bytes > 5000 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertLessEqual(cache.bytes, 5000)
+        finally:
+            registry.stop()
+
+class TestPriorityExecutor(unittest.TestCase):
+    """Тесты пула фоновых потоков с приоритетами"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.executor = PriorityExecutor(max_workers=1, name="Test")
+        self.gate = threading.Event()
+        # Единственный поток занят, пока тест не откроет gate
+        self.blocker = self.executor.submit(self.gate.wait, 5)
+        deadline = time.time() + 5
+        while not self.blocker.running() and time.time() < deadline:
+            time.sleep(0.001)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        self.gate.set()
+        self.executor.shutdown(cancel_pending=True)
+    
+    def test_priority_order(self):
+        """Интерактивные задачи раньше предзагрузки, предзагрузка раньше обслуживания"""
+        order = []
+        futures = [
+            self.executor.submit(order.append, "maintenance", priority=TaskPriority.MAINTENANCE),
+            self.executor.submit(order.append, "prefetch", priority=TaskPriority.PREFETCH),
+            self.executor.submit(order.append, "interactive"),
+            self.executor.submit(order.append, "interactive-2")
+        ]
+        self.assertEqual(self.executor.get_stats()['lanes']['interactive']['depth'], 2)
+        self.gate.set()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(order, ["interactive", "interactive-2", "prefetch", "maintenance"])
+    
+    def test_cancel_and_queue_timeout(self):
+        """Отмена снимает задачу из очереди, просроченная в очереди задача не запускается"""
+        calls = []
+        cancelled = self.executor.submit(calls.append, 1, priority=TaskPriority.PREFETCH)
+        expired = self.executor.submit(calls.append, 2, timeout=0.01)
+        self.assertTrue(cancelled.cancel())
+        time.sleep(0.05)
+        self.gate.set()
+        
+        with self.assertRaises(TimeoutError):
+            expired.result(timeout=5)
+        self.assertEqual(calls, [])
+        lanes = self.executor.get_stats()['lanes']
+        self.assertEqual((lanes['prefetch']['cancelled'], lanes['prefetch']['depth']), (1, 0))
+        self.assertEqual(lanes['interactive']['expired'], 1)
+    
+    def test_errors_and_metrics(self):
+        """Исключение доходит до Future, задержки и счетчики попадают в статистику"""
+        def fail():
+            raise ValueError("boom")
+        
+        self.gate.set()
+        self.blocker.result(timeout=5)
+        with self.assertLogs("background_executor", level="ERROR"):
+            with self.assertRaises(ValueError):
+                self.executor.submit(fail, task_id="fail").result(timeout=5)
+        self.assertEqual(self.executor.submit(sum, [1, 2]).result(timeout=5), 3)
+        
+        lane = self.executor.get_stats()['lanes']['interactive']
+        self.assertEqual((lane['completed'], lane['failed']), (2, 1))
+        self.assertEqual(lane['run']['count'], 3)
+        self.assertEqual(lane['wait']['count'], 3)
+    
+    def test_parallel_workers_keep_interactive_slot(self):
+        """Фоновые задачи не занимают последний поток пула"""
+        executor = PriorityExecutor(max_workers=3, name="Pool")
+        release = threading.Event()
+        try:
+            background = [executor.submit(release.wait, 5, priority=TaskPriority.MAINTENANCE)
+                          for _ in range(4)]
+            started = time.perf_counter()
+            self.assertEqual(executor.submit(lambda: "ui").result(timeout=1), "ui")
+            self.assertLess(time.perf_counter() - started, 0.5)
+            deadline = time.time() + 5
+            while executor.get_stats()['lanes']['maintenance']['depth'] > 2 and time.time() < deadline:
+                time.sleep(0.001)
+            time.sleep(0.02)
+            self.assertEqual(executor.get_stats()['lanes']['maintenance']['depth'], 2)
+            release.set()
+            for future in background:
+                future.result(timeout=5)
+        finally:
+            release.set()
+            executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+
+class TestAsyncNotifications(unittest.TestCase):
+    """Тесты асинхронной системы уведомлений"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.notification_manager = AsyncNotificationManager()
+        # Останавливаем фоновый процессор для тестов
+        self.notification_manager.running = False
+    
+    def test_notification_creation(self):
+        """Тест создания уведомлений"""
+        notification = create_task_reminder(
+            "test_task",
+            "Test Task Title",
+            datetime.now()
+        )
+        
+        self.assertEqual(notification.type, NotificationType.TASK_REMINDER)
+        self.assertEqual(notification.priority, NotificationPriority.MEDIUM)
+        self.assertEqual(notification.task_id, "test_task")
+        self.assertIn("Test Task Title", notification.message)
+    
+    def test_notification_scheduling(self):
+        """Тест планирования уведомлений"""
+        future_time = datetime.now() + timedelta(minutes=5)
+        notification = create_task_reminder(
+            "scheduled_task",
+            "Scheduled Task",
+            future_time
+        )
+        
+        # Планируем уведомление
+        self.notification_manager.schedule_notification(notification)
+        
+        # Проверяем, что уведомление добавлено в список запланированных
+        self.assertEqual(len(self.notification_manager.scheduled_notifications), 1)
+        self.assertEqual(
+            self.notification_manager.scheduled_notifications[0].id,
+            notification.id
+        )
+    
+    def test_notification_delivery_conditions(self):
+        """Тест условий доставки уведомлений"""
+        # Создаем уведомление с низким приоритетом
+        low_priority_notification = Notification(
+            id="test_low",
+            type=NotificationType.BREAK_SUGGESTION,
+            priority=NotificationPriority.LOW,
+            title="Break Suggestion",
+            message="Time for a break",
+            channels=[NotificationChannel.SYSTEM_TRAY],
+            scheduled_time=datetime.now(),
+            created_at=datetime.now()
+        )
+        
+        # Тестируем условия доставки
+        should_deliver = self.notification_manager._should_deliver(low_priority_notification)
+        self.assertIsInstance(should_deliver, bool)
+    
+    def test_notification_statistics(self):
+        """Тест статистики уведомлений"""
+        # Добавляем несколько уведомлений в историю
+        for i in range(5):
+            notification = create_task_reminder(
+                f"task_{i}",
+                f"Task {i}",
+                datetime.now()
+            )
+            notification.delivered = True
+            self.notification_manager.notification_history.append(notification)
+        
+        stats = self.notification_manager.get_statistics()
+        
+        self.assertEqual(stats['total'], 5)
+        self.assertEqual(stats['delivered'], 5)
+        self.assertEqual(stats['delivery_rate'], 100.0)
+        self.assertIn('by_type', stats)
+        self.assertIn('by_priority', stats)
+
+class TestIntegration(unittest.TestCase):
+    """Интеграционные тесты"""
+    
+    def setUp(self):
+        """Настройка интеграционных тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        
+        # Создаем компоненты с временными файлами
+        config_path = os.path.join(self.temp_dir, "integration_config.json")
+        self.config_manager = ConfigManager(config_path)
+        
+        self.cache_manager = CacheManager(memory_cache_size=50, file_cache_size_mb=1)
+        from pathlib import Path
+        self.cache_manager.file_cache.cache_dir = Path(self.temp_dir)
+        
+        self.notification_manager = AsyncNotificationManager()
+        self.notification_manager.running = False
+    
+    def tearDown(self):
+        """Очистка после интеграционных тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_config_cache_integration(self):
+        """Тест интеграции конфигурации и кэширования"""
+        # Загружаем конфигурацию
+        config = self.config_manager.load_config()
+        
+        # Используем настройки кэша из конфигурации
+        cache_enabled = config.data.cache_enabled
+        cache_size = config.data.cache_size_mb
+        
+        self.assertTrue(cache_enabled)
+        self.assertGreater(cache_size, 0)
+        
+        # Тестируем кэширование с учетом конфигурации
+        if cache_enabled:
+            self.cache_manager.set("config_test", "test_value")
+            value = self.cache_manager.get("config_test")
+            self.assertEqual(value, "test_value")
+    
+    def test_notifications_config_integration(self):
+        """Тест интеграции уведомлений и конфигурации"""
+        # Загружаем конфигурацию
+        config = self.config_manager.load_config()
+        
+        # Проверяем настройки уведомлений
+        notifications_enabled = config.ui.show_notifications
+        
+        # Создаем уведомление
+        notification = create_task_reminder(
+            "integration_task",
+            "Integration Test Task",
+            datetime.now()
+        )
+        
+        # Проверяем, что настройки учитываются
+        should_deliver = self.notification_manager._should_deliver(notification)
+        
+        if notifications_enabled:
+            # Если уведомления включены, должно доставляться
+            self.assertTrue(should_deliver or notification.priority == NotificationPriority.URGENT)
+    
+    def test_performance_with_all_components(self):
+        """Тест производительности с всеми компонентами"""
+        start_time = time.time()
+        
+        # Выполняем операции с конфигурацией
+        config = self.config_manager.load_config()
+        self.config_manager.save_config()
+        
+        # Выполняем операции с кэшем
+        for i in range(10):
+            self.cache_manager.set(f"perf_key_{i}", f"perf_value_{i}")
+            self.cache_manager.get(f"perf_key_{i}")
+        
+        # Создаем уведомления
+        for i in range(5):
+            notification = create_task_reminder(
+                f"perf_task_{i}",
+                f"Performance Task {i}",
+                datetime.now()
+            )
+            self.notification_manager.schedule_notification(notification)
+        
+        end_time = time.time()
+        execution_time = end_time - start_time
+        
+        # Проверяем, что все операции выполняются быстро
+        self.assertLess(execution_time, 1.0)  # Менее 1 секунды
+
+class TestPerformanceImprovements(unittest.TestCase):
+    """Тесты улучшений производительности"""
+    
+    def test_caching_performance_improvement(self):
+        """Тест улучшения производительности благодаря кэшированию"""
+        cache_manager = CacheManager()
+        
+        # Функция с искусственной задержкой
+        @cached(ttl=60)
+        def slow_function(x):
+            time.sleep(0.1)  # Имитируем медленную операцию
+            return x * 2
+        
+        # Первый вызов (медленный)
+        start_time = time.time()
+        result1 = slow_function(5)
+        first_call_time = time.time() - start_time
+        
+        # Второй вызов (быстрый, из кэша)
+        start_time = time.time()
+        result2 = slow_function(5)
+        second_call_time = time.time() - start_time
+        
+        # Проверяем результаты
+        self.assertEqual(result1, result2)
+        self.assertEqual(result1, 10)
+        
+        # Проверяем улучшение производительности
+        self.assertGreater(first_call_time, 0.05)  # Первый вызов должен быть медленным
+        self.assertLess(second_call_time, 0.01)    # Второй вызов должен быть быстрым
+        
+        # Ускорение должно быть значительным
+        speedup = first_call_time / second_call_time
+        self.assertGreater(speedup, 5)  # Минимум 5x ускорение
+
+class TestAutoSaveService(unittest.TestCase):
+    """Тесты отложенного автосохранения"""
+    
+    class RecordingDataManager:
+        """Менеджер данных, запоминающий записи вместо работы с диском"""
+        
+        def __init__(self):
+            self.writes = []
+        
+        def write_day(self, time_blocks, date=None, create_backup=True):
+            self.writes.append((date, list(time_blocks)))
+            return True
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.data_manager = self.RecordingDataManager()
+        self.autosave = AutoSaveService(self.data_manager, debounce_seconds=0.1,
+                                        max_delay_seconds=1.0)
+    
+    def tearDown(self):
+        """Остановка фонового потока"""
+        self.autosave.stop(flush=False)
+    
+    def test_rapid_edits_are_coalesced(self):
+        """Серия правок дает одну запись с последним состоянием"""
+        day = datetime(2025, 10, 3).date()
+        for i in range(20):
+            self.autosave.mark_dirty(day, [f"block_{j}" for j in range(i + 1)])
+        
+        time.sleep(0.4)
+        
+        self.assertEqual(len(self.data_manager.writes), 1)
+        self.assertEqual(len(self.data_manager.writes[0][1]), 20)
+        self.assertFalse(self.autosave.is_dirty(day))
+        self.assertEqual(self.autosave.get_stats()['coalesced_edits'], 19)
+    
+    def test_flush_writes_only_dirty_days(self):
+        """Принудительная запись сохраняет только измененные дни"""
+        self.assertEqual(self.autosave.flush(), 0)
+        
+        day = datetime(2025, 10, 3).date()
+        self.autosave.mark_dirty(day, ["block"])
+        self.assertEqual(self.autosave.flush(), 1)
+        self.assertEqual(self.autosave.flush(), 0)
+        
+        time.sleep(0.2)
+        self.assertEqual(len(self.data_manager.writes), 1)
+    
+    def test_discarded_day_is_not_written(self):
+        """Отвергнутые правки дня не дописываются автосохранением"""
+        day = datetime(2025, 10, 3).date()
+        self.autosave.mark_dirty(day, ["block"])
+        self.assertTrue(self.autosave.discard(day))
+        self.assertFalse(self.autosave.discard(day))
+        
+        time.sleep(0.2)
+        self.assertEqual(self.data_manager.writes, [])
+    
+    def test_snapshots_are_written_off_the_ui_thread(self):
+        """Снимки блоков записываются фоновым потоком без обращения к виджетам"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            data_manager = PremiumDataManager(temp_dir, raise_errors=True)
+            autosave = AutoSaveService(data_manager, debounce_seconds=0.05)
+            day = datetime(2025, 10, 3).date()
+            start = datetime.combine(day, datetime.min.time()).replace(hour=9)
+            autosave.mark_dirty(day, snapshot_blocks([FakeTimeBlock(1, start, 90)]))
+            time.sleep(0.3)
+            autosave.stop(flush=False)
+            
+            self.assertEqual(autosave.get_stats()['saves'], 1)
+            blocks = data_manager.load_day(day)
+            self.assertEqual([(block["id"], block["end_time"]) for block in blocks],
+                             [(1, (start + timedelta(minutes=90)).isoformat())])
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def test_block_colour_and_notify_edits_are_persisted(self):
+        """Смена цвета и переключение уведомлений блока доходят до автосохранения"""
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication([])
+        if not isinstance(app, QApplication):
+            self.skipTest("виджетам нужен QApplication")
+        from time_block import PremiumTimeBlock
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            data_manager = PremiumDataManager(temp_dir, raise_errors=True)
+            autosave = AutoSaveService(data_manager, debounce_seconds=60)
+            day = datetime(2025, 10, 3).date()
+            start = datetime.combine(day, datetime.min.time()).replace(hour=9)
+            block = PremiumTimeBlock(start, start + timedelta(hours=1), "Блок")
+            
+            # Та же подписка, что у окна планировщика (connect_block)
+            mark = lambda *args: autosave.mark_dirty(day, snapshot_blocks([block]))
+            block.edited.connect(mark)
+            block.time_changed.connect(mark)
+            block.color_changed.connect(mark)
+            
+            block.set_color("#00FF00")
+            self.assertEqual(autosave.flush(), 1)
+            block.toggle_notifications()
+            self.assertEqual(autosave.flush(), 1)
+            autosave.stop(flush=False)
+            
+            saved = data_manager.load_day(day)[0]
+            self.assertEqual((saved["color"], saved["notify"]), ("#00FF00", False))
+            block.deleteLater()
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def test_messages_from_worker_threads_are_printed(self):
+        """Сообщение из фонового потока не открывает окно"""
+        with patch("builtins.print") as printed:
+            worker = threading.Thread(target=show_message, args=("warning", "Ошибка", "текст"))
+            worker.start()
+            worker.join()
+        printed.assert_called_once_with("Ошибка: текст")
+
+class TestRollupStore(unittest.TestCase):
+    """Тесты хранилища агрегатов"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "rollups.json")
+        self.executor = PriorityExecutor(max_workers=1, name="Rollups")
+        self.store = RollupStore(self.path, executor=self.executor)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        self.executor.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def make_blocks(self, day, hours):
+        start = datetime.combine(day, datetime.min.time()).replace(hour=9)
+        return [{"start_time": start.isoformat(),
+                 "end_time": (start + timedelta(hours=hours)).isoformat()}]
+    
+    def test_cover_range_uses_coarse_rollups(self):
+        """Диапазон покрывается крупными периодами с дневными краями"""
+        pieces = cover_range(datetime(2024, 12, 30).date(), datetime(2026, 2, 3).date())
+        
+        self.assertIn(("year", "2025"), pieces)
+        self.assertIn(("month", "2026-01"), pieces)
+        self.assertEqual(pieces[0], ("day", "2024-12-30"))
+        self.assertLess(len(pieces), 10)
+    
+    def test_incremental_updates_and_range_query(self):
+        """Повторное сохранение дня заменяет его вклад во все уровни"""
+        start = datetime(2025, 1, 1).date()
+        for offset in range(365):
+            day = start + timedelta(days=offset)
+            self.store.update_day_schedule(day, self.make_blocks(day, 1))
+        
+        day = datetime(2025, 10, 3).date()
+        self.store.update_day_schedule(day, self.make_blocks(day, 3))
+        
+        year = self.store.query(start, datetime(2025, 12, 31).date())
+        self.assertEqual(year["minutes"], 364 * 60 + 180)
+        self.assertEqual(year["blocks"], 365)
+        self.assertEqual(year["pieces_read"], 1)
+        
+        october = self.store.get_record("month", "2025-10")
+        self.assertEqual(october["minutes"], 30 * 60 + 180)
+        
+        # Сводки переживают перезапуск
+        self.store.flush()
+        reloaded = RollupStore(self.path, executor=self.executor)
+        self.assertEqual(reloaded.query(day, day)["minutes"], 180)
+    
+    def test_saves_are_coalesced_in_maintenance_lane(self):
+        """Серия обновлений дает одну фоновую запись, а не запись на каждое"""
+        gate = threading.Event()
+        blocker = self.executor.submit(gate.wait, 5)
+        day = datetime(2025, 10, 3).date()
+        for hours in range(1, 6):
+            self.store.update_day_schedule(day, self.make_blocks(day, hours))
+        
+        self.assertFalse(os.path.exists(self.path))
+        maintenance = self.executor.get_stats()['lanes']['maintenance']
+        self.assertEqual(maintenance['submitted'], 1)
+        
+        gate.set()
+        blocker.result(timeout=5)
+        self.executor.shutdown()
+        self.assertEqual(RollupStore(self.path).query(day, day)["minutes"], 300)
+    
+    def test_missing_rollups_are_backfilled_once(self):
+        """Без файла сводок история дней пересчитывается один раз"""
+        data_manager = PremiumDataManager(os.path.join(self.temp_dir, "data"), raise_errors=True)
+        for day_number in (1, 20):
+            start = datetime(2025, 3, day_number, 9, 0)
+            data_manager.write_day([FakeTimeBlock(1, start, 90)], start.date())
+        
+        self.assertEqual(self.store.pending_sources(), ["schedule", "tasks"])
+        self.store.attach(data_manager=data_manager)
+        # Остановка пула дожидается пересчета и отложенной записи
+        self.executor.shutdown()
+        
+        march = self.store.query(datetime(2025, 3, 1).date(), datetime(2025, 3, 31).date())
+        self.assertEqual(march["minutes"], 180)
+        self.assertEqual(march["active_days"], 2)
+        
+        # История расписания пересчитана и отмечена в файле; задачи еще ждут пересчета
+        reloaded = RollupStore(self.path, executor=self.executor)
+        self.assertEqual(reloaded.pending_sources(), ["tasks"])
+        self.assertIsNone(reloaded.schedule_backfill(data_manager=data_manager))
+
+    def test_saved_and_rebuilt_day_match(self):
+        """Сохраненный и пересчитанный день дают одинаковые сводки"""
+        data_manager = PremiumDataManager(os.path.join(self.temp_dir, "data"), raise_errors=True)
+        # История пуста: пересчет при подключении не должен перекрыть сохранение
+        self.store.backfill(data_manager=data_manager)
+        self.store.attach(data_manager=data_manager)
+
+        # Разные названия: оценка в метаданных дня получает бонус за разнообразие
+        start = datetime(2025, 3, 4, 9, 0)
+        data_manager.write_day([FakeTimeBlock(block_id, start + timedelta(hours=block_id), 45)
+                                for block_id in range(5)], start.date())
+        self.executor.shutdown()
+
+        rebuilt = RollupStore(os.path.join(self.temp_dir, "rebuilt.json"), executor=self.executor)
+        rebuilt.rebuild(start.date(), start.date(), data_manager=data_manager)
+
+        for level, key in (("day", "2025-03-04"), ("month", "2025-03"), ("year", "2025")):
+            self.assertEqual(self.store.get_record(level, key), rebuilt.get_record(level, key))
+        self.assertEqual(self.store.get_record("day", "2025-03-04")["productivity_sum"], 46)
+
+    def test_task_changes_update_rollups(self):
+        """Изменения задач обновляют показатели выполнения"""
+        manager = TaskManager()
+        manager.tasks = []
+        manager.data_file = os.path.join(self.temp_dir, "tasks.json")
+        self.store.attach(task_manager=manager)
+        
+        start = datetime(2025, 10, 3, 10, 0)
+        first = manager.create_task("A", "", start, start + timedelta(hours=1))
+        manager.create_task("B", "", start, start + timedelta(hours=1))
+        manager.complete_task(first.id)
+        
+        stats = self.store.query(start.date(), start.date())
+        self.assertEqual(stats["tasks"], 2)
+        self.assertEqual(stats["completed_tasks"], 1)
+        self.assertEqual(stats["completion_rate"], 50)
+
+class FakeTimeBlock:
+    """Минимальный блок времени для тестов менеджера данных"""
+    
+    def __init__(self, block_id, start_time, minutes=30, title=None):
+        self.block_id = block_id
+        self.title = title or f"Блок {block_id}"
+        self.start_time = start_time
+        self.end_time = start_time + timedelta(minutes=minutes)
+        self.color = "#FF2B43"
+        self.notify = True
+    
+    def get_duration_minutes(self):
+        return int((self.end_time - self.start_time).total_seconds() / 60)
+
+class TestProductivityStatsService(unittest.TestCase):
+    """Тесты сервиса статистики продуктивности"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_manager = PremiumDataManager(self.temp_dir, raise_errors=True)
+        self.task_manager = TaskManager()
+        self.task_manager.tasks = []
+        self.task_manager.data_file = os.path.join(self.temp_dir, "tasks.json")
+        self.service = ProductivityStatsService()
+        self.service.attach(data_manager=self.data_manager, task_manager=self.task_manager)
+        self.first = datetime(2025, 10, 3).date()
+        self.second = datetime(2025, 10, 4).date()
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_stats_from_schedule_and_tasks(self):
+        """Статистика считается из блоков дня и задач"""
+        start = datetime.combine(self.first, datetime.min.time()).replace(hour=9)
+        self.data_manager.save_day([FakeTimeBlock(1, start, 120), FakeTimeBlock(2, start + timedelta(hours=3), 120)],
+                                   self.first)
+        done = self.task_manager.create_task("A", "", start, start + timedelta(hours=1))
+        self.task_manager.create_task("B", "", start, start + timedelta(hours=1))
+        self.task_manager.complete_task(done.id)
+        
+        stats = self.service.get(self.first)
+        self.assertEqual(stats['focus_time'], 240)
+        self.assertAlmostEqual(stats['productivity_score'], 0.5)
+        self.assertEqual((stats['completed_tasks'], stats['total_tasks']), (1, 2))
+        self.assertAlmostEqual(stats['efficiency'], 0.5)
+    
+    def test_memoized_and_invalidated_per_day(self):
+        """Дни считаются один раз, изменения сбрасывают только затронутые дни"""
+        self.service.get_range(self.first, self.second)
+        self.service.get_range(self.first, self.second)
+        self.assertEqual(self.service.computed, 2)
+        # Прошедшие дни хранятся без срока
+        self.assertIsNone(self.service.memo._cache[self.first].ttl)
+        
+        start = datetime.combine(self.second, datetime.min.time()).replace(hour=10)
+        task = self.task_manager.create_task("C", "", start, start + timedelta(hours=1))
+        self.assertEqual(self.service.get(self.first)['total_tasks'], 0)
+        self.assertEqual(self.service.computed, 2)
+        self.assertEqual(self.service.get(self.second)['total_tasks'], 1)
+        self.assertEqual(self.service.computed, 3)
+        
+        # Перенос задачи затрагивает оба дня
+        self.task_manager.update_task(task.id, start_time=start - timedelta(days=1),
+                                      end_time=start - timedelta(days=1) + timedelta(hours=1))
+        self.assertEqual(self.service.get(self.first)['total_tasks'], 1)
+        self.assertEqual(self.service.get(self.second)['total_tasks'], 0)
+        
+        self.data_manager.save_day([FakeTimeBlock(1, start, 60)], self.second)
+        self.assertEqual(self.service.get(self.second)['focus_time'], 60)
+        self.assertEqual(self.service.computed, 6)
+    
+    def test_invalidation_during_compute(self):
+        """Результат расчета, начатого до инвалидации дня, не запоминается"""
+        original = self.service.compute
+        
+        def racing_compute(day):
+            stats = original(day)
+            self.service.invalidate([day])
+            return stats
+        
+        with patch.object(self.service, "compute", side_effect=racing_compute):
+            self.service.get(self.first)
+        self.service.get(self.first)
+        self.assertEqual(self.service.computed, 2)
+        self.assertEqual(self.service.get_stats()['days'], 1)
+    
+    def test_optimizer_counts_schedule_after_attach(self):
+        """Оптимизатор без расписания видит только задачи, после подключения - и блоки"""
+        import performance_optimizer
+        start = datetime.combine(self.first, datetime.min.time()).replace(hour=9)
+        self.data_manager.save_day([FakeTimeBlock(1, start, 240)], self.first)
+        service = ProductivityStatsService(task_manager=self.task_manager)
+        
+        with patch.object(performance_optimizer, "get_productivity_stats_service", return_value=service), \
+             patch.object(performance_optimizer, "get_prefetcher", return_value=NavigationPrefetcher()):
+            optimizer = performance_optimizer.PerformanceOptimizer()
+        self.assertEqual(optimizer.get_productivity_stats(self.first.isoformat())['focus_time'], 0)
+        
+        optimizer.attach_data_manager(self.data_manager)
+        stats = optimizer.get_productivity_stats(self.first.isoformat())
+        self.assertEqual(stats['focus_time'], 240)
+        self.assertAlmostEqual(stats['productivity_score'], 0.5)
+        self.assertIs(optimizer.prefetcher.data_manager, self.data_manager)
+
+class TestNavigationPrefetcher(unittest.TestCase):
+    """Тесты предзагрузки соседних дней"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_manager = PremiumDataManager(self.temp_dir, raise_errors=True)
+        self.stats = ProductivityStatsService(data_manager=self.data_manager)
+        self.executor = PriorityExecutor(max_workers=1, name="Prefetch")
+        self.prefetcher = NavigationPrefetcher(self.data_manager, self.stats, self.executor)
+        self.day = datetime(2025, 10, 15).date()
+        for offset in (-1, 0, 1):
+            day = self.day + timedelta(days=offset)
+            start = datetime.combine(day, datetime.min.time()).replace(hour=9)
+            self.data_manager.save_day([FakeTimeBlock(1, start, 60 * (offset + 2))], day)
+        self.prefetcher.attach(data_manager=self.data_manager)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        self.executor.shutdown(cancel_pending=True)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def wait_idle(self):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            stats = self.prefetcher.get_stats()
+            if not stats['in_flight'] and not stats['queued']:
+                return stats
+            time.sleep(0.005)
+        self.fail("prefetch did not finish")
+    
+    def test_background_load_errors_do_not_reach_ui(self):
+        """Ошибка чтения дня в фоне не показывается пользователю, при переходе к дню - показывается"""
+        messages = []
+        data_manager = PremiumDataManager(self.temp_dir, on_message=lambda *args: messages.append(args))
+        self.prefetcher = NavigationPrefetcher(data_manager, ProductivityStatsService(data_manager=data_manager),
+                                               self.executor)
+        broken = self.day + timedelta(days=1)
+        with open(data_manager.find_day_file(broken), 'wb') as f:
+            f.write(b"TBS3 broken")
+        
+        with self.assertLogs("background_executor", level="ERROR"):
+            self.prefetcher.view_day(self.day)
+            stats = self.wait_idle()
+        self.assertEqual(messages, [])
+        self.assertEqual(stats['failed'], 1)
+        
+        self.assertEqual(self.prefetcher.load_day(broken), [])
+        self.assertEqual(messages[0][0], "warning")
+    
+    def test_neighbours_are_ready_before_navigation(self):
+        """Соседние дни и их статистика загружаются заранее"""
+        self.assertEqual(len(self.prefetcher.load_day(self.day)), 1)
+        self.prefetcher.view_day(self.day)
+        stats = self.wait_idle()
+        self.assertEqual(stats['completed'], 6)
+        
+        following = self.day + timedelta(days=1)
+        self.assertEqual(self.prefetcher.load_day(following)[0]["title"], "Блок 1")
+        computed = self.stats.computed
+        self.assertEqual(self.stats.get(following)['focus_time'], 180)
+        self.assertEqual(self.stats.computed, computed)
+        
+        stats = self.prefetcher.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['useful']), (1, 1, 1))
+        self.assertAlmostEqual(stats['accuracy'], 100 / 6)
+        
+        # Повторный просмотр не планирует уже готовые дни
+        self.prefetcher.view_day(self.day)
+        self.assertEqual(self.wait_idle()['scheduled'], 6)
+    
+    def test_navigation_cancels_stale_work(self):
+        """Переход к другому дню снимает ненужные задачи, одновременно - не больше max_in_flight"""
+        gate = threading.Event()
+        blocker = self.executor.submit(gate.wait, 5)
+        self.prefetcher.view_period(self.day, self.day + timedelta(days=13))
+        stats = self.prefetcher.get_stats()
+        self.assertEqual((stats['in_flight'], stats['queued']), (2, 12))
+        
+        far = self.day + timedelta(days=100)
+        self.prefetcher.view_day(far)
+        gate.set()
+        blocker.result(timeout=5)
+        stats = self.wait_idle()
+        self.assertEqual(stats['cancelled'], 2)
+        self.assertEqual(stats['completed'], 6)
+        self.assertIn(far + timedelta(days=1), self.prefetcher.cache)
+        self.assertNotIn(self.day - timedelta(days=7), self.prefetcher.cache)
+    
+    def test_lookahead_order(self):
+        """Сначала соседние дни, затем остальная неделя; для периода - предыдущий период"""
+        # День читается загрузкой и статистикой - важен порядок первых чтений
+        loaded = []
+        read_day = self.data_manager.read_day
+        self.data_manager.read_day = lambda day: loaded.append(day) or read_day(day)
+        self.prefetcher.max_in_flight = 1
+        
+        # 15.10.2025 - среда: неделя с 13 по 19 октября
+        self.prefetcher.view_day(self.day)
+        self.wait_idle()
+        self.assertEqual([day.day for day in dict.fromkeys(loaded)], [16, 14, 13, 17, 18, 19])
+        
+        # Пять дней с 15 по 19 октября: готовятся 10-14 октября, уже загруженные пропускаются
+        loaded.clear()
+        self.prefetcher.view_period(self.day, self.day + timedelta(days=4))
+        self.wait_idle()
+        self.assertEqual([day.day for day in dict.fromkeys(loaded)], [12, 11, 10])
+    
+    def test_save_drops_prefetched_copy(self):
+        """Сохранение дня сбрасывает его загруженную копию"""
+        self.prefetcher.view_day(self.day)
+        self.wait_idle()
+        previous = self.day - timedelta(days=1)
+        start = datetime.combine(previous, datetime.min.time()).replace(hour=12)
+        self.data_manager.save_day([FakeTimeBlock(7, start, 30), FakeTimeBlock(8, start, 30)], previous)
+        
+        self.assertEqual(len(self.prefetcher.load_day(previous)), 2)
+        self.assertEqual(self.prefetcher.get_stats()['useful'], 0)
+
+class TestStallWatchdog(unittest.TestCase):
+    """Тесты сторожа зависаний главного потока"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.report_path = os.path.join(self.temp_dir, "stalls.json")
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_opt_in_with_coarse_heartbeat(self):
+        """Сторож включается настройкой, отметки по умолчанию - раз в половину минимального порога"""
+        from config_manager import PerformanceConfig
+        self.assertFalse(PerformanceConfig().stall_watchdog)
+        self.assertEqual(StallWatchdog(thresholds_ms=(250, 80)).heartbeat, 0.04)
+    
+    def test_stall_buckets_and_sites(self):
+        """Зависание попадает в корзину наибольшего пройденного порога со своим местом"""
+        watchdog = StallWatchdog(heartbeat_ms=20, main_thread_id=threading.get_ident())
+        watchdog._last_beat = 100.0
+        watchdog.check(now=100.05)
+        self.assertEqual(watchdog.get_report()['stalls'], 0)
+        
+        watchdog.check(now=100.1)
+        self.assertTrue(watchdog.get_report()['stalling_now'])
+        watchdog.beat()
+        watchdog._last_beat = 100.3
+        watchdog.check(now=100.31)
+        
+        report = watchdog.get_report()
+        self.assertEqual(report['histogram'], {"50ms": 0, "250ms": 1, "1000ms": 0})
+        self.assertFalse(report['stalling_now'])
+        site = report['sites'][0]
+        self.assertIn("test_stall_buckets_and_sites", site['site'])
+        self.assertAlmostEqual(site['total_ms'], 280.0)
+        self.assertEqual(report['recent'][0]['threshold_ms'], 250)
+    
+    def test_hang_is_reported_while_ongoing(self):
+        """Зависание дольше верхнего порога попадает в отчет, не дожидаясь конца"""
+        watchdog = StallWatchdog(thresholds_ms=(50, 500), heartbeat_ms=20,
+                                 report_path=self.report_path, main_thread_id=threading.get_ident())
+        watchdog._last_beat = 10.0
+        with self.assertLogs("stall_watchdog", level="WARNING"):
+            watchdog.check(now=11.0)
+        with open(self.report_path, encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertTrue(report['stalling_now'])
+        self.assertEqual(report['stalls'], 0)
+    
+    def test_background_thread_detects_main_thread_stall(self):
+        """Поток сторожа замечает занятый поток и снимает его стек"""
+        watchdog = StallWatchdog(thresholds_ms=(40, 100), heartbeat_ms=5, report_path=self.report_path,
+                                 main_thread_id=threading.get_ident())
+        
+        def busy_handler():
+            time.sleep(0.15)
+        
+        watchdog.start(qt=False)
+        try:
+            for _ in range(10):
+                watchdog.beat()
+                time.sleep(0.005)
+            busy_handler()
+            for _ in range(10):
+                watchdog.beat()
+                time.sleep(0.005)
+        finally:
+            watchdog.stop()
+        
+        with open(self.report_path, encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(report['histogram']['100ms'], 1)
+        self.assertIn("busy_handler", report['sites'][0]['site'])
+        self.assertTrue(any("busy_handler" in entry for entry in report['recent'][0]['stack']))
+        self.assertTrue(stall_site(["/usr/lib/python3/json/encoder.py:1 in encode"]).endswith("encode"))
+
+class TestFrameScheduler(unittest.TestCase):
+    """Тесты общего планировщика обновлений интерфейса"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.scheduler = FrameScheduler(clock=lambda: 0.0)
+        self.calls = []
+    
+    def refresh(self, name):
+        return lambda: self.calls.append(name)
+    
+    def test_due_refreshes_share_one_tick(self):
+        """Обновления с кратными интервалами выполняются в одном такте"""
+        self.scheduler.register("time", self.refresh("time"), 1000)
+        self.scheduler.register("elements", self.refresh("elements"), 3000)
+        
+        self.assertEqual(self.scheduler.tick(now=0.5), 2)
+        self.assertEqual(self.scheduler.next_delay(now=0.5), 0.5)
+        self.assertEqual(self.scheduler.tick(now=1.0), 1)
+        self.assertEqual(self.scheduler.tick(now=2.0), 1)
+        self.assertEqual(self.scheduler.tick(now=3.0), 2)
+        self.assertEqual(self.calls, ["time", "elements", "time", "time", "time", "elements"])
+        self.assertEqual(self.scheduler.get_stats()['ticks'], 4)
+    
+    def test_unchanged_inputs_are_skipped(self):
+        """Обновление с прежними входными данными пропускается, грязное - выполняется"""
+        state = {'value': 1}
+        self.scheduler.register("card", self.refresh("card"), 1000, inputs=lambda: state['value'])
+        
+        self.scheduler.tick(now=0.0)
+        self.scheduler.tick(now=1.0)
+        state['value'] = 2
+        self.scheduler.tick(now=2.0)
+        self.scheduler.mark_dirty("card")
+        self.assertEqual(self.scheduler.next_delay(now=2.0), self.scheduler.min_interval)
+        self.scheduler.tick(now=2.1)
+        
+        self.assertEqual(self.calls, ["card", "card", "card"])
+        stats = self.scheduler.get_stats()['refreshes']['card']
+        self.assertEqual((stats['runs'], stats['skipped']), (3, 1))
+    
+    def test_hidden_refresh_waits_without_busy_ticks(self):
+        """Скрытое грязное обновление ждет срока, а не каждого такта"""
+        visible = {'value': False}
+        self.scheduler.register("tab", self.refresh("tab"), 3000, active=lambda: visible['value'])
+        self.scheduler.register("dirty_only", self.refresh("dirty_only"))
+        
+        self.scheduler.tick(now=0.0)
+        self.assertEqual(self.calls, ["dirty_only"])
+        self.assertEqual(self.scheduler.next_delay(now=0.0), 3.0)
+        
+        visible['value'] = True
+        self.scheduler.tick(now=1.0)
+        self.assertEqual(self.calls, ["dirty_only"])
+        self.scheduler.tick(now=3.0)
+        self.scheduler.mark_dirty("dirty_only")
+        self.scheduler.tick(now=3.1)
+        self.assertEqual(self.calls, ["dirty_only", "tab", "dirty_only"])
+        self.assertEqual(self.scheduler.get_stats()['hidden'], 1)
+
+class TestTaskListModel(unittest.TestCase):
+    """Тесты модели списка задач"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.task_manager = TaskManager()
+        self.task_manager.tasks = []
+        self.task_manager.data_file = os.path.join(self.temp_dir, "tasks.json")
+        self.day = datetime(2025, 10, 3).date()
+        self.model = TaskListModel(self.task_manager, day=self.day)
+        self.events = []
+        for signal in ("rowsInserted", "rowsRemoved", "rowsMoved", "dataChanged", "modelReset"):
+            getattr(self.model, signal).connect(lambda *args, signal=signal: self.events.append(signal))
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        self.model.detach()
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def at(self, hour):
+        return datetime.combine(self.day, datetime.min.time()).replace(hour=hour)
+    
+    def titles(self):
+        return [self.model.task_at(row).title for row in range(self.model.rowCount())]
+    
+    def test_changes_are_applied_row_by_row(self):
+        """Изменения задач вставляют, перемещают и удаляют одну строку"""
+        late = self.task_manager.create_task("Поздняя", "", self.at(15), self.at(16))
+        early = self.task_manager.create_task("Ранняя", "", self.at(9), self.at(10))
+        self.assertEqual(self.titles(), ["Ранняя", "Поздняя"])
+        
+        self.task_manager.update_task(late.id, start_time=self.at(8), end_time=self.at(9))
+        self.assertEqual(self.titles(), ["Поздняя", "Ранняя"])
+        self.task_manager.complete_task(early.id)
+        self.assertIn("[", self.model.data(self.model.index(1)))
+        self.assertEqual(self.model.data(self.model.index(1), Qt.UserRole), early.id)
+        
+        self.task_manager.update_task(early.id, start_time=self.at(9) + timedelta(days=1))
+        self.task_manager.delete_task(late.id)
+        self.task_manager.create_task("Другой день", "", self.at(9) - timedelta(days=1), self.at(10))
+        
+        self.assertEqual(self.model.rowCount(), 0)
+        self.assertEqual(self.events, ["rowsInserted", "rowsInserted", "rowsMoved", "dataChanged",
+                                       "dataChanged", "rowsRemoved", "rowsRemoved"])
+        stats = self.model.get_stats()
+        self.assertEqual((stats['inserted'], stats['moved'], stats['removed'], stats['reloads']), (2, 1, 2, 1))
+    
+    def test_large_list_updates_single_row(self):
+        """В списке из 10 000 задач изменение затрагивает одну строку"""
+        from task_manager import Task, TaskPriority
+        start = self.at(0)
+        self.task_manager.tasks = [
+            Task(f"t{number:05d}", f"Задача {number}", "", start + timedelta(seconds=number),
+                 start + timedelta(seconds=number + 60), TaskPriority.MEDIUM, TaskStatus.PLANNED, start, start)
+            for number in range(10000)
+        ]
+        self.model.reload()
+        self.assertEqual(self.model.rowCount(), 10000)
+        
+        inserted = []
+        self.model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+        self.task_manager.create_task("Новая", "", start + timedelta(seconds=5000, milliseconds=1), self.at(2))
+        self.assertEqual(inserted, [(5001, 5001)])
+        self.assertEqual(self.model.row_of("t09999"), 10000)
+    
+    def test_background_changes_are_queued_to_model_thread(self):
+        """Изменение из фонового потока применяется в потоке модели"""
+        from PyQt5.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication([])
+        worker = threading.Thread(target=self.task_manager.create_task,
+                                  args=("Фон", "", self.at(9), self.at(10)))
+        worker.start()
+        worker.join()
+        self.assertEqual(self.model.rowCount(), 0)
+        app.processEvents()
+        self.assertEqual(self.titles(), ["Фон"])
+
+class TestScheduleFormat(unittest.TestCase):
+    """Тесты формата файлов расписания 3.0"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.day = datetime(2025, 10, 3)
+        self.blocks = [FakeTimeBlock(i, self.day + timedelta(minutes=30 * i)) for i in range(40)]
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_v3_roundtrip_matches_v2(self):
+        """Оба формата читаются в одинаковые данные, 3.0 заметно компактнее"""
+        legacy = PremiumDataManager(self.temp_dir, format_version="2.0")
+        legacy.write_day(self.blocks, self.day.date(), create_backup=False)
+        legacy_file = legacy.find_day_file(self.day.date())
+        expected = legacy.load_day(self.day.date())
+        
+        manager = PremiumDataManager(self.temp_dir)
+        self.assertEqual(manager.load_day(self.day.date()), expected)
+        
+        manager.write_day(self.blocks, self.day.date(), create_backup=False)
+        new_file = manager.find_day_file(self.day.date())
+        self.assertTrue(new_file.endswith(".tbs"))
+        self.assertFalse(os.path.exists(legacy_file))
+        
+        loaded = manager.load_day(self.day.date())
+        self.assertEqual([b["start_time"] for b in loaded], [b["start_time"] for b in expected])
+        self.assertEqual([b["title"] for b in loaded], [b["title"] for b in expected])
+        self.assertLess(os.path.getsize(new_file) * 4, len(json.dumps({"time_blocks": expected}, indent=2)))
+        self.assertEqual(manager.load_day_intervals(self.day.date())[1], (30, 60))
+    
+    def test_background_migration(self):
+        """Мигратор переводит старые файлы в новый формат"""
+        legacy = PremiumDataManager(self.temp_dir, format_version="2.0")
+        for offset in range(3):
+            legacy.write_day(self.blocks, (self.day + timedelta(days=offset)).date())
+        
+        manager = PremiumDataManager(self.temp_dir)
+        migrator = ScheduleMigrator(manager, pause_seconds=0)
+        migrator.start()
+        self.assertTrue(migrator.wait(timeout=5))
+        
+        self.assertEqual(manager.find_legacy_day_files(), [])
+        self.assertEqual(len(manager.load_day(self.day.date())), 40)
+        self.assertEqual(migrator.get_stats()['failed'], 0)
+
+class TestScheduleDiffWrites(unittest.TestCase):
+    """Тесты записи дня структурной разницей (журнал изменений)"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.day = datetime(2025, 10, 3)
+        self.blocks = [FakeTimeBlock(i, self.day + timedelta(minutes=30 * i)) for i in range(40)]
+        self.manager = PremiumDataManager(self.temp_dir)
+        self.manager.write_day(self.blocks, self.day.date())
+        self.base_file = self.manager.find_day_file(self.day.date())
+        self.patch_log = self.manager.get_patch_log_filename(self.day.date())
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_small_edit_appends_patch(self):
+        """Перенос одного блока дописывает патч, не переписывая файл дня"""
+        with open(self.base_file, 'rb') as f:
+            base_before = f.read()
+        
+        self.blocks[5].start_time += timedelta(minutes=10)
+        self.manager.write_day(self.blocks, self.day.date())
+        
+        with open(self.base_file, 'rb') as f:
+            self.assertEqual(f.read(), base_before)
+        self.assertLess(os.path.getsize(self.patch_log) * 2, len(base_before))
+        
+        # Свежий менеджер читает базовый файл + журнал
+        loaded = PremiumDataManager(self.temp_dir).load_day(self.day.date())
+        self.assertEqual(len(loaded), 40)
+        self.assertEqual(loaded[5]["start_time"], self.blocks[5].start_time.isoformat())
+        self.assertEqual(PremiumDataManager(self.temp_dir).load_day_intervals(self.day.date())[5], (160, 180))
+    
+    def test_unchanged_save_skips_write(self):
+        """Повторное сохранение без изменений не трогает файлы"""
+        mtime = os.path.getmtime(self.base_file)
+        self.manager.write_day(self.blocks, self.day.date())
+        PremiumDataManager(self.temp_dir).write_day(self.blocks, self.day.date())
+        
+        self.assertEqual(os.path.getmtime(self.base_file), mtime)
+        self.assertFalse(os.path.exists(self.patch_log))
+    
+    def test_delete_reorder_and_consolidation(self):
+        """Удаление и перестановка блоков переживают консолидацию журнала"""
+        self.manager.MAX_PATCHES_PER_DAY = 3
+        
+        del self.blocks[0]
+        self.manager.write_day(self.blocks, self.day.date())
+        self.blocks[0], self.blocks[1] = self.blocks[1], self.blocks[0]
+        self.manager.write_day(self.blocks, self.day.date())
+        self.blocks.append(FakeTimeBlock(100, self.day + timedelta(hours=21)))
+        self.manager.write_day(self.blocks, self.day.date())
+        expected_ids = [block.block_id for block in self.blocks]
+        self.assertEqual([b["id"] for b in PremiumDataManager(self.temp_dir).load_day(self.day.date())],
+                         expected_ids)
+        
+        # Четвертая правка консолидирует журнал в базовый файл
+        self.blocks[2].title = "Переименован"
+        self.manager.write_day(self.blocks, self.day.date())
+        self.assertFalse(os.path.exists(self.patch_log))
+        
+        loaded = PremiumDataManager(self.temp_dir).load_day(self.day.date())
+        self.assertEqual([b["id"] for b in loaded], expected_ids)
+        self.assertEqual(loaded[2]["title"], "Переименован")
+    
+    def test_torn_patch_record_is_dropped(self):
+        """Оборванная при сбое запись журнала отбрасывается"""
+        self.blocks[1].title = "Сохранено"
+        self.manager.write_day(self.blocks, self.day.date())
+        self.blocks[2].title = "Потеряно при сбое"
+        self.manager.write_day(self.blocks, self.day.date())
+        
+        size = os.path.getsize(self.patch_log)
+        with open(self.patch_log, 'r+b') as f:
+            f.truncate(size - 3)
+        
+        loaded = PremiumDataManager(self.temp_dir).load_day(self.day.date())
+        self.assertEqual(loaded[1]["title"], "Сохранено")
+        self.assertEqual(loaded[2]["title"], "Блок 2")
+        self.assertLess(os.path.getsize(self.patch_log), size - 3)
+    
+    def test_restore_from_patch_backups(self):
+        """Резервные копии хранят патчи и восстанавливают последнюю версию"""
+        for index in range(3):
+            self.blocks[index].title = f"Правка {index}"
+            self.manager.write_day(self.blocks, self.day.date())
+        
+        backups = os.listdir(self.manager.backup_dir)
+        self.assertEqual(len([b for b in backups if b.endswith(".patches")]), 3)
+        self.assertEqual(len([b for b in backups if not b.endswith(".patches")]), 1)
+        
+        messages = []
+        self.manager.on_message = lambda level, title, text: messages.append(level)
+        restored = self.manager.restore_from_backup(self.day.date())
+        self.assertEqual(messages, ["information"])
+        self.assertEqual([b["title"] for b in restored[:3]], ["Правка 0", "Правка 1", "Правка 2"])
+
+class TestHeadlessDataLayer(unittest.TestCase):
+    """Тесты слоя данных без Qt (пакетные задачи)"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.day = datetime(2025, 10, 3)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_data_layer_does_not_import_qt(self):
+        """Импорт и работа слоя данных не загружают PyQt5"""
+        import subprocess
+        script = (
+            "import sys, json\n"
+            "from datetime import date\n"
+            "import data_manager, task_manager, cache_manager, localization_system, rollup_store\n"
+            f"manager = data_manager.PremiumDataManager({self.temp_dir!r}, raise_errors=True)\n"
+            "manager.get_statistics(date(2025, 10, 1), date(2025, 10, 3))\n"
+            "print(json.dumps(sorted(m for m in sys.modules if m.startswith('PyQt5'))))\n"
+        )
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", script], cwd=self.temp_dir,
+                                env=dict(os.environ, PYTHONPATH=project_root),
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
+        # Ленивые глобальные экземпляры не создают файлов при импорте
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "cache")))
+    
+    def test_errors_raise_instead_of_dialogs(self):
+        """В режиме raise_errors ошибки приходят исключением"""
+        manager = PremiumDataManager(self.temp_dir, raise_errors=True)
+        with open(manager.get_day_filename(self.day.date()), 'wb') as f:
+            f.write(b"TBS3 broken")
+        
+        with self.assertRaises(DataManagerError):
+            manager.load_day(self.day.date())
+        
+        messages = []
+        manager = PremiumDataManager(self.temp_dir, on_message=lambda *args: messages.append(args))
+        self.assertEqual(manager.load_day(self.day.date()), [])
+        self.assertEqual(messages[0][0], "warning")
+
+class TestLazyGlobals(unittest.TestCase):
+    """Тесты ленивых глобальных экземпляров"""
+    
+    def test_concurrent_first_access_creates_one_instance(self):
+        """Одновременный первый доступ из нескольких потоков создает один экземпляр"""
+        import task_manager as task_manager_module
+        created = []
+        
+        class SlowTaskManager:
+            def __init__(self):
+                created.append(self)
+                time.sleep(0.05)
+            
+            def add_change_listener(self, callback):
+                pass
+        
+        results = []
+        with patch.object(task_manager_module, "_task_manager", None), \
+             patch.object(task_manager_module, "TaskManager", SlowTaskManager):
+            threads = [threading.Thread(target=lambda: results.append(task_manager_module.get_task_manager()))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(result is created[0] for result in results))
+
+    def test_created_cache_manager_skips_lock(self):
+        """Уже созданный менеджер кэша возвращается без взятия блокировки"""
+        import cache_manager as cache_manager_module
+        manager = object()
+        lock = MagicMock()
+        lock.__enter__.side_effect = AssertionError("lock taken")
+        with patch.object(cache_manager_module, "_cache_manager", manager), \
+             patch.object(cache_manager_module, "_cache_manager_lock", lock):
+            self.assertIs(cache_manager_module.get_cache_manager(), manager)
 
 def run_all_tests():
     """Запуск всех тестов"""
@@ -418,9 +2697,34 @@ def run_all_tests():
     test_classes = [
         TestConfigManager,
         TestCacheManager,
+        TestEvictionPolicies,
+        TestShardedMemoryCache,
+        TestMemoryByteBudget,
+        TestCacheExpiry,
+        TestFileCacheIndex,
+        TestSegmentFileCache,
+        TestWriteBehind,
+        TestCacheInvalidation,
+        TestCacheKeys,
+        TestCacheMetrics,
+        TestFileCacheSerializers,
+        TestCacheWarmup,
+        TestCacheRegistry,
+        TestPriorityExecutor,
         TestAsyncNotifications,
         TestIntegration,
-        TestPerformanceImprovements
+        TestPerformanceImprovements,
+        TestAutoSaveService,
+        TestRollupStore,
+        TestProductivityStatsService,
+        TestNavigationPrefetcher,
+        TestStallWatchdog,
+        TestFrameScheduler,
+        TestTaskListModel,
+        TestScheduleFormat,
+        TestScheduleDiffWrites,
+        TestHeadlessDataLayer,
+        TestLazyGlobals
     ]
     
     for test_class in test_classes:
@@ -317,6 +317,7 @@ class PremiumTimeBlock(QWidget):
         self.notify = not self.notify
         self.notify_indicator.setText("🔔" if self.notify else "🔕")
         self.notify_indicator.setToolTip("Уведомления включены" if self.notify else "Уведомления выключены")
+        self.edited.emit(self)
     
     def toggle_progress_tracking(self):
         """Переключение отслеживания прогресса"""